@@ -0,0 +1,281 @@
+"""
+スクレイピングの受付制御
+Bot全体で同時に実行するスクレイピング数に上限を設け、超えた分はサーバーごとの待ち行列に入れて
+サーバー間で順番に（ラウンドロビンで）実行する。待ち行列が一杯の場合や待ち時間が長すぎる場合は受け付けない
+
+要求元のサーバーと順番待ちの通知先はcontextvarsで受け渡すため、スクレイパーの呼び出し側で設定すれば
+同じコンテキストから作成したタスク（逐次取得・実行中のスクレイピングの共有）にも引き継がれる。
+通知先は元に戻した時点で無効になり、要求が終わった後もタスクが続いていれば通知しない。
+期限切れのキャッシュの再取得のような要求と関係のない処理はcreate_background_taskで引き継がずに開始する
+"""
+
+import asyncio
+import contextvars
+import logging
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Awaitable, Callable, Deque, Dict, Hashable, List, Optional
+import metrics
+import tracing
+from config import SCRAPE_MAX_CONCURRENT, SCRAPE_MAX_QUEUE, SCRAPE_QUEUE_TIMEOUT
+
+logger = logging.getLogger(__name__)
+
+QueueNotifier = Callable[[int], Awaitable[None]]  # 順番（待ち行列での位置、0は実行開始）を受け取るコルーチン関数
+
+_current_guild: contextvars.ContextVar[Optional[int]] = contextvars.ContextVar("admission_guild", default=None)
+_current_notifier: contextvars.ContextVar[Optional[QueueNotifier]] = contextvars.ContextVar("admission_notifier", default=None)
+
+
+class AdmissionRejected(Exception):
+    """待ち行列が一杯、または待ち時間の上限を超えたためスクレイピングを受け付けなかった"""
+
+    def __init__(self, reason: str):
+        super().__init__(f"Scrape admission rejected: {reason}")
+        self.reason = reason
+
+
+def set_guild(guild_id: Optional[int]):
+    """現在のコンテキストの要求元サーバーを設定（コマンドのタスク内で呼ぶ、Noneはバックグラウンド処理）"""
+    _current_guild.set(guild_id)
+
+
+def current_guild() -> Optional[int]:
+    """現在のコンテキストの要求元サーバー（ワーカープロセスへの受け渡し用）"""
+    return _current_guild.get()
+
+
+def current_queue_notifier() -> Optional[QueueNotifier]:
+    """現在のコンテキストの順番待ちの通知先"""
+    return _current_notifier.get()
+
+
+class _ScopedNotifier:
+    """reset_queue_notifierで戻すまでだけ有効な通知先（コンテキストを引き継いだタスクが要求の終了後に通知しないようにする）"""
+
+    def __init__(self, notifier: QueueNotifier):
+        self.notifier = notifier
+        self.active = True
+
+    async def __call__(self, position: int):
+        if self.active:
+            await self.notifier(position)
+
+
+class NotifierToken:
+    """set_queue_notifierの戻り値"""
+
+    def __init__(self, token: contextvars.Token, scoped: Optional[_ScopedNotifier]):
+        self.token = token
+        self.scoped = scoped
+
+
+def set_queue_notifier(notifier: Optional[QueueNotifier]) -> NotifierToken:
+    """順番待ちの通知先を設定（戻り値をreset_queue_notifierに渡して元に戻す）"""
+    scoped = _ScopedNotifier(notifier) if notifier is not None else None
+    return NotifierToken(_current_notifier.set(scoped), scoped)
+
+
+def reset_queue_notifier(token: NotifierToken):
+    """通知先を元に戻し、設定していた通知先を無効にする"""
+    if token.scoped is not None:
+        token.scoped.active = False
+    try:
+        _current_notifier.reset(token.token)
+    except ValueError:
+        # 設定時と異なるコンテキストで戻す場合
+        _current_notifier.set(None)
+
+
+def create_background_task(coro: Awaitable) -> asyncio.Task:
+    """要求元のサーバー・通知先を引き継がずにタスクを作成（要求と関係なく続くバックグラウンド処理用）"""
+    return contextvars.Context().run(asyncio.ensure_future, coro)
+
+
+class _Waiter:
+    """待ち行列の要求"""
+
+    def __init__(self, lane: Hashable):
+        self.lane = lane
+        self.position = 0  # 実行されるまでの順番（1始まり）
+        self.granted = False
+        self.changed = asyncio.Event()  # 順番の変化・実行開始の通知
+
+
+class AdmissionController:
+    """同時実行数の上限とサーバーごとの待ち行列を持つ受付制御"""
+
+    def __init__(self, max_concurrent: int = SCRAPE_MAX_CONCURRENT, max_queue: int = SCRAPE_MAX_QUEUE, queue_timeout: float = SCRAPE_QUEUE_TIMEOUT):
+        """
+        Args:
+            max_concurrent: Bot全体で同時に実行するスクレイピング数
+            max_queue: 待ち行列に入れる要求の上限（超えた要求は受け付けない）
+            queue_timeout: 待ち行列で待つ最大秒数
+        """
+        self.max_concurrent = max(max_concurrent, 1)
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self._lanes: Dict[Hashable, Deque[_Waiter]] = {}
+        self._rotation: Deque[Hashable] = deque()  # 次に実行するサーバーの順
+        # 統計
+        self.admitted = 0
+        self.queued_total = 0
+        self.rejected: Dict[str, int] = {'queue_full': 0, 'timeout': 0}
+
+    @property
+    def queued(self) -> int:
+        return sum(len(waiters) for waiters in self._lanes.values())
+
+    @asynccontextmanager
+    async def slot(self, kind: str) -> AsyncIterator[None]:
+        """実行枠を確保してから処理を行う（kindは計測用の処理の種類）"""
+        await self.acquire(kind)
+        try:
+            yield
+        finally:
+            self.release()
+
+    async def acquire(self, kind: str):
+        """実行枠を確保（空きがなければ待ち行列で順番を待つ）"""
+        if self.active < self.max_concurrent and not self._rotation:
+            self.active += 1
+            self.admitted += 1
+            metrics.ADMISSION_WAIT.observe(0.0, kind=kind)
+            return
+
+        if self.queued >= self.max_queue:
+            self.rejected['queue_full'] += 1
+            metrics.ADMISSION_REJECTED.inc(reason="queue_full")
+            logger.warning(f"Scrape queue full ({self.max_queue}), rejecting {kind} request")
+            raise AdmissionRejected("queue_full")
+
+        lane = _current_guild.get()
+        waiter = _Waiter(lane)
+        self._lanes.setdefault(lane, deque()).append(waiter)
+        if lane not in self._rotation:
+            self._rotation.append(lane)
+        self.queued_total += 1
+        self._update_positions()
+
+        started = time.perf_counter()
+        with tracing.span("admission_wait", kind=kind):
+            await self._wait(waiter)
+        self.admitted += 1
+        metrics.ADMISSION_WAIT.observe(time.perf_counter() - started, kind=kind)
+
+    async def _wait(self, waiter: _Waiter):
+        """実行枠が割り当てられるまで待ち、順番が変わるたびに通知先へ伝える"""
+        notifier = _current_notifier.get()
+        reported = None
+        deadline = time.monotonic() + self.queue_timeout
+        try:
+            while True:
+                waiter.changed.clear()
+                if waiter.granted:
+                    break
+                if notifier is not None and waiter.position != reported:
+                    reported = waiter.position
+                    await self._notify(notifier, reported)
+                    # 通知中に状態が変わっている可能性があるため確認し直す
+                    continue
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.rejected['timeout'] += 1
+                    metrics.ADMISSION_REJECTED.inc(reason="timeout")
+                    logger.warning(f"Scrape queue wait exceeded {self.queue_timeout}s, giving up")
+                    raise AdmissionRejected("timeout")
+                try:
+                    await asyncio.wait_for(waiter.changed.wait(), remaining)
+                except asyncio.TimeoutError:
+                    pass
+            if notifier is not None and reported is not None:
+                await self._notify(notifier, 0)
+        except BaseException:
+            if waiter.granted:
+                # 割り当て後に中断された場合（実行開始の通知中を含む）は枠を返す
+                self.release()
+            else:
+                self._remove(waiter)
+            raise
+
+    async def _notify(self, notifier: QueueNotifier, position: int):
+        try:
+            await notifier(position)
+        except Exception as e:
+            logger.warning(f"Failed to notify queue position: {e}")
+
+    def release(self):
+        """実行枠を返し、待っている要求に割り当てる"""
+        self.active -= 1
+        self._dispatch()
+
+    def _dispatch(self):
+        """空いた枠をサーバーの順に割り当てる"""
+        dispatched = False
+        while self.active < self.max_concurrent and self._rotation:
+            lane = self._rotation.popleft()
+            waiters = self._lanes[lane]
+            waiter = waiters.popleft()
+            if waiters:
+                self._rotation.append(lane)
+            else:
+                del self._lanes[lane]
+            self.active += 1
+            waiter.granted = True
+            waiter.changed.set()
+            dispatched = True
+        if dispatched:
+            self._update_positions()
+
+    def _remove(self, waiter: _Waiter):
+        """待ち行列から要求を取り除く（タイムアウト・キャンセル時）"""
+        waiters = self._lanes.get(waiter.lane)
+        if waiters is None or waiter not in waiters:
+            return
+        waiters.remove(waiter)
+        if not waiters:
+            del self._lanes[waiter.lane]
+            self._rotation.remove(waiter.lane)
+        self._update_positions()
+
+    def _service_order(self) -> List[_Waiter]:
+        """新しい要求が来なかった場合に実行される順（各サーバーから1件ずつ順番に）"""
+        order = []
+        depth = 0
+        while True:
+            added = False
+            for lane in self._rotation:
+                waiters = self._lanes[lane]
+                if depth < len(waiters):
+                    order.append(waiters[depth])
+                    added = True
+            if not added:
+                return order
+            depth += 1
+
+    def _update_positions(self):
+        for position, waiter in enumerate(self._service_order(), 1):
+            if waiter.position != position:
+                waiter.position = position
+                waiter.changed.set()
+
+    def get_stats(self) -> Dict[str, any]:
+        """統計情報"""
+        return {
+            'active': self.active,
+            'max_concurrent': self.max_concurrent,
+            'queued': self.queued,
+            'queued_guilds': len(self._lanes),
+            'admitted': self.admitted,
+            'queued_total': self.queued_total,
+            'rejected': dict(self.rejected)
+        }
+
+
+# Bot全体で共有する受付制御（FANZA・MissAVのスクレイピングで共通）
+scrape_admission = AdmissionController()
+
+metrics.REGISTRY.callback("fanza_bot_scrape_slots_in_use", "Scrapes currently holding an admission slot", "gauge", lambda: [({}, scrape_admission.active)])
+metrics.REGISTRY.callback("fanza_bot_scrape_queue_length", "Scrapes waiting in the admission queue", "gauge", lambda: [({}, scrape_admission.queued)])
@@ -0,0 +1,84 @@
+"""
+ベンチマーク用の固定ページ
+FANZA一覧ページ・MissAV検索結果ページ・MissAV動画ページのHTMLを生成する
+（保存済みのHTMLがあればそちらを優先して使用）
+"""
+
+import os
+from html import escape
+from typing import Optional
+
+FANZA_CARD_TEMPLATE = """
+<div data-e2eid="content-card" class="flex flex-col">
+  <a href="/av/content/?id={cid}">
+    <picture><img alt="{title}" loading="lazy" src="https://pics.dmm.co.jp/digital/video/{cid}/{cid}ps.jpg"></picture>
+  </a>
+  <a data-e2eid="title" href="/av/content/?id={cid}"><span class="hover:underline">{title}</span></a>
+  <div class="flex">{stars}</div>
+  <span data-e2eid="content-price">{price}円</span>
+  <a class="text-gray-500 hover:underline" href="/av/list/?actress={actress_id}">{actress}</a>
+</div>
+"""
+
+MISSAV_ITEM_TEMPLATE = """
+<div class="thumbnail group">
+  <a href="/ja/{code}"><img class="w-full" data-src="https://fourhoi.com/{code}/cover-t.jpg" alt="{title}"></a>
+  <span class="absolute bottom-1 right-1">{duration}</span>
+  <a class="text-secondary" href="/ja/{code}">{title}</a>
+</div>
+"""
+
+
+def _load_saved(saved_dir: Optional[str], name: str) -> Optional[str]:
+    """保存済みのHTMLを読み込む（ない場合はNone）"""
+    if not saved_dir:
+        return None
+    path = os.path.join(saved_dir, name)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        return f.read()
+
+
+def fanza_listing_html(card_count: int, page: int = 1, saved_dir: Optional[str] = None) -> str:
+    """FANZA一覧ページ（ページ番号ごとに異なる品番のカードを生成）"""
+    saved = _load_saved(saved_dir, f"fanza_listing_{page}.html") or _load_saved(saved_dir, "fanza_listing.html")
+    if saved is not None:
+        return saved
+
+    cards = []
+    for i in range(card_count):
+        number = (page - 1) * card_count + i
+        cards.append(FANZA_CARD_TEMPLATE.format(
+            cid=f"bench{number:05d}",
+            title=escape(f"ベンチマーク作品 {number} 高評価サンプルタイトル"),
+            stars='<img src="https://www.dmm.co.jp/icon/star/yellow.svg" alt="">' * (4 + number % 2),
+            price=f"{980 + number % 10 * 100:,}",
+            actress_id=1000 + number % 50,
+            actress=escape(f"女優{number % 50}")
+        ))
+    return f"<!DOCTYPE html><html lang=\"ja\"><head><title>FANZA</title></head><body><main>{''.join(cards)}</main></body></html>"
+
+
+def missav_search_html(query: str, result_count: int, saved_dir: Optional[str] = None) -> str:
+    """MissAV検索結果ページ（タイトルに検索語を含む結果を生成）"""
+    saved = _load_saved(saved_dir, "missav_search.html")
+    if saved is not None:
+        return saved
+
+    items = []
+    for i in range(result_count):
+        items.append(MISSAV_ITEM_TEMPLATE.format(
+            code=f"bench-{i:03d}",
+            title=escape(f"{query} {i}"),
+            duration=f"{1 + i % 3}:{i % 60:02d}:00"
+        ))
+    return f"<!DOCTYPE html><html lang=\"ja\"><head><title>MissAV</title></head><body><div class=\"grid grid-cols-2\">{''.join(items)}</div></body></html>"
+
+
+def missav_video_html(code: str, saved_dir: Optional[str] = None) -> str:
+    """MissAV動画ページ"""
+    saved = _load_saved(saved_dir, "missav_video.html")
+    if saved is not None:
+        return saved
+    return f"<!DOCTYPE html><html lang=\"ja\"><body><video><source src=\"/media/{escape(code)}/playlist.m3u8\"></video></body></html>"
@@ -0,0 +1,83 @@
+"""
+ベンチマーク用の計測
+/procからのプロセスツリーのRSS取得と、PlaywrightのIPC呼び出し回数の記録
+"""
+
+import asyncio
+import os
+from collections import Counter
+from typing import Optional
+from browser_watchdog import process_tree_rss
+
+
+def browser_rss(root_pid: Optional[int] = None) -> int:
+    """子孫プロセス（Playwrightドライバーとブラウザ）のRSS合計（バイト）"""
+    return process_tree_rss(root_pid or os.getpid(), include_root=False)
+
+
+class RSSSampler:
+    """計測中のブラウザRSSを一定間隔で記録し、最大値を保持する"""
+
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self.peak = 0
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self):
+        while True:
+            self.peak = max(self.peak, browser_rss())
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        self.peak = browser_rss()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> int:
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        self.peak = max(self.peak, browser_rss())
+        return self.peak
+
+
+class IPCCounter:
+    """PlaywrightのChannel送信をラップしてプロトコル呼び出し回数をメソッド別に数える"""
+
+    SEND_METHODS = ('send', 'send_return_as_dict', 'send_no_reply')
+
+    def __init__(self):
+        self.calls: Counter = Counter()
+        self._originals = {}
+
+    def install(self):
+        from playwright._impl._connection import Channel
+
+        for name in self.SEND_METHODS:
+            original = getattr(Channel, name, None)
+            if original is None or name in self._originals:
+                continue
+            self._originals[name] = original
+            setattr(Channel, name, self._wrap(original))
+
+    def _wrap(self, original):
+        counter = self.calls
+
+        def wrapper(channel, method, *args, **kwargs):
+            counter[method] += 1
+            return original(channel, method, *args, **kwargs)
+        return wrapper
+
+    def uninstall(self):
+        from playwright._impl._connection import Channel
+
+        for name, original in self._originals.items():
+            setattr(Channel, name, original)
+        self._originals.clear()
+
+    def reset(self):
+        self.calls.clear()
+
+    @property
+    def total(self) -> int:
+        return sum(self.calls.values())
@@ -0,0 +1,172 @@
+"""
+スクレイパーのベンチマーク
+ローカルの固定ページに対してPlaywrightFanzaScraper.scrape_productsと
+MissAVScraper.scrape_search_resultsを実行し、処理時間・1カードあたりの時間・
+ブラウザのRSS・PlaywrightのIPC呼び出し回数をカード数と同時実行数ごとに出力する
+
+使用方法（リポジトリのルートで実行）:
+    python -m benchmarks.run --cards 20,60,120 --concurrency 1,4 --modes playwright,http
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+from typing import Any, Dict, List
+from urllib.parse import quote
+
+
+def parse_int_list(value: str) -> List[int]:
+    return [int(v) for v in value.split(',') if v.strip()]
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="FANZA/MissAVスクレイパーのオフラインベンチマーク")
+    parser.add_argument('--cards', type=parse_int_list, default=[20, 60, 120], help="一覧1ページあたりのカード数（カンマ区切り）")
+    parser.add_argument('--listing-pages', type=int, default=1, help="カードを返す一覧ページ数")
+    parser.add_argument('--concurrency', type=parse_int_list, default=[1, 4], help="同時実行数（カンマ区切り）")
+    parser.add_argument('--modes', default="playwright,http", help="FANZAの取得方式: playwright, http（カンマ区切り）")
+    parser.add_argument('--missav-results', type=parse_int_list, default=[10, 20], help="MissAV検索結果の件数（カンマ区切り）")
+    parser.add_argument('--skip-missav', action='store_true', help="MissAVのベンチマークを省略")
+    parser.add_argument('--iterations', type=int, default=3, help="各条件の繰り返し回数")
+    parser.add_argument('--port', type=int, default=8765, help="固定ページを返すサーバーのポート")
+    parser.add_argument('--saved-dir', default=None, help="保存済みHTMLのディレクトリ（fanza_listing.html, missav_search.html, missav_video.html）")
+    parser.add_argument('--json', dest='json_path', default=None, help="結果をJSONで保存するパス")
+    return parser.parse_args()
+
+
+ARGS = parse_args()
+
+# スクレイパーの設定を読み込む前に、取得先をローカルサーバーに向け永続化・HTTP取得を無効にする
+os.environ['FANZA_BASE_URL'] = f"http://127.0.0.1:{ARGS.port}/av/list/"
+os.environ['CACHE_DB_PATH'] = ""
+os.environ['ENABLE_HTTP_FETCH'] = "false"
+
+from benchmarks.probes import IPCCounter, RSSSampler  # noqa: E402
+from benchmarks.server import FixtureServer  # noqa: E402
+from missav_scraper import MissAVScraper  # noqa: E402
+from playwright_scraper import HttpListingFetcher, PlaywrightFanzaScraper  # noqa: E402
+
+
+async def measure(server: FixtureServer, ipc: IPCCounter, run_once) -> Dict[str, float]:
+    """1回分の処理時間・RSSの最大値・IPC回数・返したカード数を計測"""
+    server.reset_counters()
+    ipc.reset()
+    sampler = RSSSampler()
+    sampler.start()
+    started = time.perf_counter()
+    found = await run_once()
+    wall = time.perf_counter() - started
+    peak_rss = await sampler.stop()
+    return {
+        'wall': wall,
+        'ms_per_card': wall * 1000 / server.cards_served if server.cards_served else 0.0,
+        'rss_mb': peak_rss / (1024 * 1024),
+        'ipc_calls': ipc.total,
+        'requests': server.request_count,
+        'found': found
+    }
+
+
+def summarize(name: str, params: Dict[str, Any], runs: List[Dict[str, float]]) -> Dict[str, Any]:
+    """繰り返し計測の中央値（RSSは最大値）をまとめる"""
+    return {
+        'benchmark': name,
+        **params,
+        'wall_s': statistics.median(r['wall'] for r in runs),
+        'ms_per_card': statistics.median(r['ms_per_card'] for r in runs),
+        'peak_rss_mb': max(r['rss_mb'] for r in runs),
+        'ipc_calls': statistics.median(r['ipc_calls'] for r in runs),
+        'requests': statistics.median(r['requests'] for r in runs),
+        'found': statistics.median(r['found'] for r in runs)
+    }
+
+
+async def bench_fanza(server: FixtureServer, ipc: IPCCounter, mode: str, cards: int, concurrency: int) -> Dict[str, Any]:
+    server.card_count = cards
+    server.listing_pages = ARGS.listing_pages
+    scraper = PlaywrightFanzaScraper()
+    if mode == 'http':
+        scraper.http_fetcher = HttpListingFetcher()
+    try:
+        # ブラウザ起動とページプールの準備は計測に含めない
+        if mode != 'http':
+            await scraper.warm_up()
+
+        async def run_once():
+            results = await asyncio.gather(*[
+                scraper.scrape_products(f"{server.base_url}/av/list/?sort=review_rank&key=bench{i}")
+                for i in range(concurrency)
+            ])
+            return sum(len(products) for products in results)
+
+        runs = [await measure(server, ipc, run_once) for _ in range(ARGS.iterations)]
+    finally:
+        await scraper.close()
+    return summarize('fanza', {'mode': mode, 'cards': cards, 'concurrency': concurrency}, runs)
+
+
+async def bench_missav(server: FixtureServer, ipc: IPCCounter, results: int, concurrency: int) -> Dict[str, Any]:
+    server.result_count = results
+    scraper = MissAVScraper()
+    try:
+        await scraper._get_context()
+
+        async def run_once():
+            titles = [f"ベンチマーク作品 {i}" for i in range(concurrency)]
+            found = await asyncio.gather(*[
+                scraper.scrape_search_results(f"{server.base_url}/ja/search/{quote(title)}", title)
+                for title in titles
+            ])
+            return sum(len(videos) for videos in found)
+
+        runs = [await measure(server, ipc, run_once) for _ in range(ARGS.iterations)]
+    finally:
+        await scraper.close()
+    return summarize('missav', {'mode': 'playwright', 'cards': results, 'concurrency': concurrency}, runs)
+
+
+def print_table(rows: List[Dict[str, Any]]):
+    header = f"{'benchmark':<8} {'mode':<10} {'cards':>5} {'conc':>4} {'wall(s)':>8} {'ms/card':>8} {'rss(MB)':>8} {'ipc':>6} {'req':>4} {'found':>5}"
+    print(header)
+    print('-' * len(header))
+    for row in rows:
+        print(
+            f"{row['benchmark']:<8} {row['mode']:<10} {row['cards']:>5} {row['concurrency']:>4} "
+            f"{row['wall_s']:>8.3f} {row['ms_per_card']:>8.2f} {row['peak_rss_mb']:>8.1f} "
+            f"{row['ipc_calls']:>6.0f} {row['requests']:>4.0f} {row['found']:>5.0f}"
+        )
+
+
+async def main():
+    server = FixtureServer(port=ARGS.port, saved_dir=ARGS.saved_dir)
+    ipc = IPCCounter()
+    ipc.install()
+    await server.start()
+    rows = []
+    try:
+        for mode in [m.strip() for m in ARGS.modes.split(',') if m.strip()]:
+            if mode == 'http' and not HttpListingFetcher.is_available():
+                print("Skipping http mode: aiohttp/lxml is not installed")
+                continue
+            for cards in ARGS.cards:
+                for concurrency in ARGS.concurrency:
+                    rows.append(await bench_fanza(server, ipc, mode, cards, concurrency))
+        if not ARGS.skip_missav:
+            for results in ARGS.missav_results:
+                for concurrency in ARGS.concurrency:
+                    rows.append(await bench_missav(server, ipc, results, concurrency))
+    finally:
+        await server.stop()
+        ipc.uninstall()
+
+    print_table(rows)
+    if ARGS.json_path:
+        with open(ARGS.json_path, 'w', encoding='utf-8') as f:
+            json.dump(rows, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
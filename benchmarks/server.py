@@ -0,0 +1,64 @@
+"""
+ベンチマーク用のローカルHTTPサーバー
+固定ページを返し、リクエスト数と返したカード数を記録する
+"""
+
+from typing import Optional
+from aiohttp import web
+from benchmarks.fixtures import fanza_listing_html, missav_search_html, missav_video_html
+
+
+class FixtureServer:
+    """FANZA一覧・MissAV検索・MissAV動画ページを返すサーバー"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 8765, saved_dir: Optional[str] = None):
+        self.host = host
+        self.port = port
+        self.saved_dir = saved_dir
+        # シナリオごとに変更する設定
+        self.card_count = 20  # 一覧1ページあたりのカード数
+        self.listing_pages = 1  # カードを返すページ数（以降のページは空）
+        self.result_count = 20  # MissAV検索結果の件数
+        # 統計
+        self.request_count = 0
+        self.cards_served = 0
+        self._runner: Optional[web.AppRunner] = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def reset_counters(self):
+        self.request_count = 0
+        self.cards_served = 0
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get('/av/list/', self._fanza_listing)
+        app.router.add_get('/ja/search/{query}', self._missav_search)
+        app.router.add_get('/ja/{code}', self._missav_video)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+
+    async def stop(self):
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def _fanza_listing(self, request: web.Request) -> web.Response:
+        self.request_count += 1
+        page = int(request.query.get('page', '1'))
+        card_count = self.card_count if page <= self.listing_pages else 0
+        self.cards_served += card_count
+        return web.Response(text=fanza_listing_html(card_count, page, self.saved_dir), content_type='text/html')
+
+    async def _missav_search(self, request: web.Request) -> web.Response:
+        self.request_count += 1
+        self.cards_served += self.result_count
+        html_text = missav_search_html(request.match_info['query'], self.result_count, self.saved_dir)
+        return web.Response(text=html_text, content_type='text/html')
+
+    async def _missav_video(self, request: web.Request) -> web.Response:
+        self.request_count += 1
+        return web.Response(text=missav_video_html(request.match_info['code'], self.saved_dir), content_type='text/html')
@@ -7,19 +7,34 @@ import logging
 import random
 import platform
 import re
-from datetime import datetime, timedelta
-from typing import Dict, List, Optional
-from playwright_scraper import FanzaScraper  # Playwright版を使用
+import sys
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+from playwright_scraper import FanzaScraper, extract_content_id  # Playwright版を使用
 from missav_scraper import MissAVScraper  # MissAV検索機能
+from scraper_client import ScraperWorkerPool, RemoteFanzaScraper, RemoteMissAVScraper
+from browser_watchdog import BrowserWatchdog, reap_orphaned_browsers
+from cache_store import close_default_store
+from embed_delivery import EmbedDelivery
+from fanza_query import FanzaQuery
+from prefetcher import PrefetchScheduler
+import sharding
+from rate_limiter import RateLimiter
+import admission
+import metrics
+import tracing
 from config import (
-    DISCORD_TOKEN, COMMAND_PREFIX, RATE_LIMIT_DURATION,
-    LOG_LEVEL, LOG_FORMAT, SALE_TYPES, get_sale_url,
+    DISCORD_TOKEN, COMMAND_PREFIX, RATE_LIMIT_COST_CACHED, RATE_LIMIT_COST_SCRAPE,
+    LOG_LEVEL, LOG_FORMAT, SALE_TYPES,
     ITEMS_PER_PAGE, MAX_DISPLAY_PAGES, DISABLE_RATE_LIMIT, BOT_VERSION,
-    SORT_OPTIONS, RELEASE_OPTIONS
+    SORT_OPTIONS, RELEASE_OPTIONS, ENABLE_PREFETCH, ENABLE_BROWSER_WATCHDOG, REAP_ORPHANED_BROWSERS,
+    ENABLE_SHARDING, SCRAPER_WORKER
 )
 
 # ログ設定
 logging.basicConfig(level=LOG_LEVEL, format=LOG_FORMAT)
+tracing.install_log_record_factory()
 logger = logging.getLogger(__name__)
 
 # Intentsの設定
@@ -28,18 +43,48 @@ intents.message_content = True
 intents.guilds = True
 intents.messages = True
 
-# Botインスタンスの作成
-bot = commands.Bot(command_prefix=COMMAND_PREFIX, intents=intents)
+# Botインスタンスの作成（シャード構成ではAutoShardedBotでシャードごとにゲートウェイへ接続）
+BotBase = commands.AutoShardedBot if ENABLE_SHARDING else commands.Bot
 
-# スクレイパーとレート制限管理
-scraper = FanzaScraper()
-missav_scraper = MissAVScraper()
-user_last_command: Dict[int, datetime] = {}
+
+class FanzaBot(BotBase):
+    async def close(self):
+        """終了時の処理（ブラウザ・定期処理は作成したイベントループで扱う必要があるため、bot.runのループが閉じる前に片付ける）"""
+        if not self.is_closed():
+            await cleanup()
+        await super().close()
+
+
+bot = FanzaBot(command_prefix=COMMAND_PREFIX, intents=intents, **sharding.bot_options())
+sharding.register_shard_metrics(bot)
+status_tasks: Dict[Optional[int], asyncio.Task] = {}  # シャードID（非シャード構成はNone）別のステータス更新タスク
+
+# スクレイパーとレート制限管理（SCRAPER_WORKERではワーカープロセスのスクレイパーを呼び出す）
+if SCRAPER_WORKER:
+    scraper_workers: Optional[ScraperWorkerPool] = ScraperWorkerPool()
+    scraper = RemoteFanzaScraper(scraper_workers)
+    missav_scraper = RemoteMissAVScraper(scraper_workers)
+else:
+    scraper_workers = None
+    scraper = FanzaScraper()
+    missav_scraper = MissAVScraper()
+rate_limiter = RateLimiter()
 
 
 async def search_missav_for_product(product: dict, force_refresh: bool = False) -> Optional[str]:
-    """FANZA商品のタイトルでMissAVを検索してURLを取得"""
+    """FANZA商品のタイトルでMissAVを検索してURLを取得（品番の対応記録があれば検索しない）"""
+    started = time.perf_counter()
+    result = "error"
     try:
+        # 品番で過去の検索結果を参照
+        content_id = product.get('content_id') or extract_content_id(product.get('url', ''))
+        if content_id and not force_refresh:
+            with tracing.span("missav_cid_lookup"):
+                found, missav_url = await missav_scraper.lookup_content_id(content_id)
+            if found:
+                result = "cid_hit"
+                return missav_url
+        
         # タイトルから不要な部分を削除して検索クエリを作成
         title = product['title']
         # 【】や（）内の情報を削除
@@ -50,21 +95,56 @@ async def search_missav_for_product(product: dict, force_refresh: bool = False)
         title = ' '.join(title.split())
         
         if not title:
+            result = "skipped"
             return None
         
         # MissAVで検索
-        videos = await missav_scraper.search_videos(title, force_refresh=force_refresh)
-        
-        if videos and len(videos) > 0:
-            # 最も関連性の高い動画のURLを返す
-            return videos[0].get('url')
-        
+        with tracing.span("missav_search"):
+            videos = await missav_scraper.search_videos(title, force_refresh=force_refresh)
+        
+        # 最も関連性の高い動画のURL（見つからなかった場合も品番で記録）
+        missav_url = videos[0].get('url') if videos else None
+        if content_id:
+            await missav_scraper.remember_content_id(content_id, missav_url)
+        result = "found" if missav_url else "not_found"
+        return missav_url
+        
+    except admission.AdmissionRejected as e:
+        result = "rejected"
+        logger.warning(f"MissAV search for product skipped: {e}")
     except Exception as e:
         logger.error(f"Error searching MissAV for product: {e}")
+    finally:
+        metrics.MISSAV_ENRICH_DURATION.observe(time.perf_counter() - started, result=result)
     
     return None
 
 
+# よく使われる検索条件の先読み
+prefetcher = PrefetchScheduler(scraper, enrich=search_missav_for_product)
+
+# ブラウザのメモリ・応答の監視（必要に応じて起動し直す、ワーカープロセスではワーカー側で監視）
+browser_watchdog = None if SCRAPER_WORKER else BrowserWatchdog({"fanza": scraper.playwright_scraper, "missav": missav_scraper})
+
+
+def format_worker_status(status: Dict[str, any]) -> str:
+    """スクレイピングのワーカープロセスの状態の表示テキストを作成"""
+    state = f"🟢 PID {status['pid']}・実行中{status['in_flight']}件" if status['connected'] else "🔴 未接続"
+    return f"{status['name']}: {state}・担当{status['share'] * 100:.0f}%・再起動{status['restarts']}回・タイムアウト{status['timeouts']}回"
+
+
+def format_data_age(fetched_at: Optional[datetime]) -> str:
+    """データの取得時刻から経過時間の表示テキストを作成"""
+    if not fetched_at:
+        return "たった今"
+    minutes = int((datetime.now() - fetched_at).total_seconds() // 60)
+    if minutes < 1:
+        return "たった今"
+    if minutes < 60:
+        return f"{minutes}分前"
+    return f"{minutes // 60}時間{minutes % 60}分前"
+
+
 class FanzaEmbed(discord.Embed):
     """FANZA商品表示用のカスタムEmbed"""
     def __init__(self, product: dict):
@@ -104,10 +184,13 @@ class FanzaEmbed(discord.Embed):
 
 class PaginationView(View):
     """ページネーション用のView"""
-    def __init__(self, products: List[dict], interaction: discord.Interaction, timeout: float = 180):
+    def __init__(self, products: List[dict], interaction: discord.Interaction, timeout: float = 180, force_refresh: bool = False):
         super().__init__(timeout=timeout)
         self.products = products
         self.interaction = interaction
+        self.force_refresh = force_refresh
+        self.message: Optional[discord.Message] = None  # リストを表示しているメッセージ
+        self._missav_tasks: Dict[int, asyncio.Task] = {}  # 商品ごとのMissAV検索タスク
         self.current_page = 0
         self.items_per_page = ITEMS_PER_PAGE  # configから読み込み
         self.total_pages = (len(products) - 1) // self.items_per_page + 1
@@ -121,6 +204,57 @@ class PaginationView(View):
         # 初期ボタン状態を設定
         self._update_buttons()
     
+    def add_products(self, products: List[dict]) -> bool:
+        """取得できた商品を末尾に追加（ページ数が変わった場合はTrue）"""
+        capacity = self.max_pages * self.items_per_page - len(self.products)
+        if capacity <= 0 or not products:
+            return False
+        self.products.extend(products[:capacity])
+        total_pages = (len(self.products) - 1) // self.items_per_page + 1
+        changed = total_pages != self.total_pages
+        self.total_pages = total_pages
+        self._update_buttons()
+        return changed
+    
+    def _page_products(self, page: int) -> List[dict]:
+        start_idx = page * self.items_per_page
+        return self.products[start_idx:start_idx + self.items_per_page]
+    
+    def _enrich_page(self, page: int) -> List[asyncio.Task]:
+        """指定ページの商品のうち未検索のものについてMissAV検索を開始"""
+        tasks = []
+        for product in self._page_products(page):
+            task = self._missav_tasks.get(id(product))
+            if task is None:
+                task = asyncio.create_task(self._add_missav_url(product))
+                self._missav_tasks[id(product)] = task
+            tasks.append(task)
+        return tasks
+    
+    async def _add_missav_url(self, product: dict):
+        missav_url = await search_missav_for_product(product, force_refresh=self.force_refresh)
+        if missav_url:
+            product['missav_url'] = missav_url
+    
+    async def load_current_page(self):
+        """表示中のページのMissAV URLを取得し、次のページはバックグラウンドで先読みする"""
+        page = self.current_page
+        # ボタン操作から呼ばれた場合もMissAV検索をこのサーバーの待ち行列で受け付ける
+        admission.set_guild(self.interaction.guild_id)
+        tasks = [task for task in self._enrich_page(page) if not task.done()]
+        if page + 1 < self.total_pages:
+            self._enrich_page(page + 1)
+        if not tasks:
+            return
+        
+        await asyncio.gather(*tasks, return_exceptions=True)
+        # 取得中に別のページへ移動していなければ表示を更新
+        if self.message is not None and self.current_page == page and not self.is_finished():
+            try:
+                await self.message.edit(embed=self.create_embed(), view=self)
+            except discord.HTTPException as e:
+                logger.warning(f"Failed to update list with MissAV URLs: {e}")
+    
     def _update_buttons(self):
         """ページに応じてボタンの有効/無効を切り替え"""
         # childrenからボタンを取得して更新
@@ -182,6 +316,8 @@ class PaginationView(View):
         self._update_buttons()
         embed = self.create_embed()
         await interaction.response.edit_message(embed=embed, view=self)
+        # MissAV URLは表示したページの分だけ取得
+        await self.load_current_page()
     
     @discord.ui.button(label="次へ ▶", style=discord.ButtonStyle.primary)
     async def next_button(self, interaction: discord.Interaction, button: Button):
@@ -193,6 +329,8 @@ class PaginationView(View):
         self._update_buttons()
         embed = self.create_embed()
         await interaction.response.edit_message(embed=embed, view=self)
+        # MissAV URLは表示したページの分だけ取得
+        await self.load_current_page()
     
     @discord.ui.button(label="🗑️ 閉じる", style=discord.ButtonStyle.danger)
     async def close_button(self, interaction: discord.Interaction, button: Button):
@@ -210,7 +348,10 @@ class PaginationView(View):
             item.disabled = True
         
         try:
-            await self.interaction.edit_original_response(view=self)
+            if self.message is not None:
+                await self.message.edit(view=self)
+            else:
+                await self.interaction.edit_original_response(view=self)
         except discord.NotFound:
             logger.warning("Interaction message not found on timeout.")
         except discord.HTTPException as e:
@@ -219,8 +360,8 @@ class PaginationView(View):
             logger.error(f"Unexpected error on timeout: {e}")
 
 
-async def setup_bot_profile():
-    """BOTのプロフィールとステータスを設定"""
+async def setup_bot_profile(shard_id: Optional[int] = None):
+    """BOTのプロフィールとステータスを設定（シャード構成ではシャードごとに設定）"""
     try:
         # BOTのアクティビティステータスを設定
         activity = discord.Activity(
@@ -229,21 +370,28 @@ async def setup_bot_profile():
         )
         
         # BOTのステータスを設定（オンライン状態）
-        await bot.change_presence(
-            status=discord.Status.online,
-            activity=activity
-        )
+        await change_presence(activity, shard_id)
         
-        logger.info("Bot profile and status configured successfully")
+        logger.info(f"Bot profile and status configured successfully (shard: {shard_id})")
         
-        # 動的ステータス更新を開始
-        asyncio.create_task(dynamic_status_updater())
+        # 動的ステータス更新を開始（再接続で呼ばれた場合は実行中のものを使い続ける）
+        task = status_tasks.get(shard_id)
+        if task is None or task.done():
+            status_tasks[shard_id] = asyncio.create_task(dynamic_status_updater(shard_id))
         
     except Exception as e:
         logger.error(f"Error setting bot profile: {e}")
 
 
-async def dynamic_status_updater():
+async def change_presence(activity: discord.Activity, shard_id: Optional[int] = None):
+    """ステータスを変更（シャードIDを指定した場合はそのシャードのみ）"""
+    if shard_id is None:
+        await bot.change_presence(status=discord.Status.online, activity=activity)
+    else:
+        await bot.change_presence(status=discord.Status.online, activity=activity, shard_id=shard_id)
+
+
+async def dynamic_status_updater(shard_id: Optional[int] = None):
     """BOTのステータスを動的に更新"""
     # テンプレートベースのステータスメッセージ定義
     status_message_definitions = [
@@ -276,12 +424,9 @@ async def dynamic_status_updater():
                 name=message
             )
             
-            await bot.change_presence(
-                status=discord.Status.online,
-                activity=activity
-            )
+            await change_presence(activity, shard_id)
             
-            logger.debug(f"Updated bot status: {message}")
+            logger.debug(f"Updated bot status (shard: {shard_id}): {message}")
             
             # 60秒待機
             await asyncio.sleep(60)
@@ -299,14 +444,38 @@ async def on_ready():
     # 起動時間を記録
     bot.start_time = datetime.now()
     
-    # BOTのプロフィール設定
-    await setup_bot_profile()
+    # BOTのプロフィール設定（シャード構成ではon_shard_readyでシャードごとに設定）
+    if not ENABLE_SHARDING:
+        await setup_bot_profile()
+    
+    # ワーカープロセスの状態確認を開始（終了していれば起動し直す）
+    if scraper_workers is not None:
+        scraper_workers.start()
+    
+    # ページプールを事前に準備（初回コマンドのページ作成待ちを回避）
+    asyncio.create_task(scraper.warm_up())
+    
+    # よく使われる検索条件の先読みを開始
+    if ENABLE_PREFETCH:
+        prefetcher.start()
+    
+    # ブラウザの監視を開始
+    if ENABLE_BROWSER_WATCHDOG and browser_watchdog is not None:
+        browser_watchdog.start()
+    
+    # メトリクスのエンドポイントを公開（METRICS_PORT設定時のみ）
+    try:
+        await metrics.start_metrics_server()
+    except Exception as e:
+        logger.error(f"Failed to start metrics endpoint: {e}")
     
     # スラッシュコマンドを同期
     try:
-        # グローバル同期
-        synced = await bot.tree.sync()
-        logger.info(f'Synced {len(synced)} global slash commands')
+        # グローバル同期（シャードを複数のプロセスで分担する場合はシャード0の担当プロセスのみ）
+        shard_ids = getattr(bot, 'shard_ids', None)
+        if not shard_ids or 0 in shard_ids:
+            synced = await bot.tree.sync()
+            logger.info(f'Synced {len(synced)} global slash commands')
         
         # 各ギルドでも同期
         for guild in bot.guilds:
@@ -320,6 +489,26 @@ async def on_ready():
         logger.error(f'Failed to sync slash commands: {e}')
 
 
+@bot.event
+async def on_shard_ready(shard_id: int):
+    """シャードの接続完了時の処理（AutoShardedBotのみ）"""
+    logger.info(f'Shard {shard_id} is ready')
+    metrics.SHARD_EVENTS.inc(shard=shard_id, event="ready")
+    await setup_bot_profile(shard_id)
+
+
+@bot.event
+async def on_shard_disconnect(shard_id: int):
+    logger.warning(f'Shard {shard_id} disconnected')
+    metrics.SHARD_EVENTS.inc(shard=shard_id, event="disconnect")
+
+
+@bot.event
+async def on_shard_resumed(shard_id: int):
+    logger.info(f'Shard {shard_id} resumed')
+    metrics.SHARD_EVENTS.inc(shard=shard_id, event="resumed")
+
+
 @bot.event
 async def on_command_error(ctx, error):
     """コマンドエラー時の処理"""
@@ -342,24 +531,45 @@ def check_nsfw_channel():
     return commands.check(predicate)
 
 
-def check_rate_limit():
-    """レート制限をチェックするデコレータ"""
+def fanza_request_cost(query: Optional[FanzaQuery] = None, force_refresh: bool = False) -> float:
+    """検索条件のキャッシュ有無からレート制限のコストを決める（期限切れでも猶予期間内ならキャッシュ扱い）"""
+    if force_refresh or scraper.get_cache_remaining(query=query) is None:
+        return RATE_LIMIT_COST_SCRAPE
+    return RATE_LIMIT_COST_CACHED
+
+
+def missav_request_cost(title: str, force_refresh: bool = False) -> float:
+    """MissAV検索のキャッシュ有無からレート制限のコストを決める"""
+    if force_refresh or not missav_scraper.is_search_cached(title):
+        return RATE_LIMIT_COST_SCRAPE
+    return RATE_LIMIT_COST_CACHED
+
+
+def acquire_rate_limit(user_id: int, guild_id: Optional[int], cost: float) -> Optional[str]:
+    """レート制限のトークンを消費し、制限された場合は利用者向けのメッセージを返す"""
+    retry_after, scope = rate_limiter.acquire(user_id, guild_id, cost)
+    if scope is None:
+        return None
+    metrics.RATE_LIMITED.inc(scope=scope)
+    seconds = max(int(retry_after + 0.999), 1)
+    if scope == "guild":
+        return f"このサーバーでの利用が集中しています。あと{seconds}秒お待ちください。"
+    if scope == "global":
+        return f"Bot全体の利用が集中しています。あと{seconds}秒お待ちください。"
+    return f"レート制限中です。あと{seconds}秒お待ちください。"
+
+
+def check_rate_limit(cost: Callable[[commands.Context], float] = lambda ctx: RATE_LIMIT_COST_SCRAPE):
+    """レート制限をチェックするデコレータ（costはコマンドのコストを返す関数）"""
     async def predicate(ctx):
         # 開発環境でレート制限が無効の場合はスキップ
         if DISABLE_RATE_LIMIT:
             return True
-            
-        user_id = ctx.author.id
-        now = datetime.now()
-        
-        if user_id in user_last_command:
-            time_since_last = now - user_last_command[user_id]
-            if time_since_last < timedelta(seconds=RATE_LIMIT_DURATION):
-                remaining = RATE_LIMIT_DURATION - time_since_last.total_seconds()
-                await ctx.send(f"レート制限中です。あと{remaining:.0f}秒お待ちください。")
-                return False
         
-        user_last_command[user_id] = now
+        message = acquire_rate_limit(ctx.author.id, ctx.guild.id if ctx.guild else None, cost(ctx))
+        if message:
+            await ctx.send(message)
+            return False
         return True
     return commands.check(predicate)
 
@@ -375,41 +585,50 @@ async def check_nsfw_interaction(interaction: discord.Interaction) -> bool:
     return True
 
 
-async def check_rate_limit_interaction(interaction: discord.Interaction) -> bool:
-    """インタラクション用レート制限チェック"""
+async def check_rate_limit_interaction(interaction: discord.Interaction, cost: float = RATE_LIMIT_COST_SCRAPE) -> bool:
+    """インタラクション用レート制限チェック（costはキャッシュの有無に応じたコマンドのコスト）"""
     # 開発環境でレート制限が無効の場合はスキップ
     if DISABLE_RATE_LIMIT:
         return True
-        
-    user_id = interaction.user.id
-    now = datetime.now()
-    
-    if user_id in user_last_command:
-        time_since_last = now - user_last_command[user_id]
-        if time_since_last < timedelta(seconds=RATE_LIMIT_DURATION):
-            remaining = RATE_LIMIT_DURATION - time_since_last.total_seconds()
-            # interaction.responseが既に使われている場合はfollowupを使用
-            if interaction.response.is_done():
-                await interaction.followup.send(
-                    f"レート制限中です。あと{remaining:.0f}秒お待ちください。", 
-                    ephemeral=True
-                )
-            else:
-                await interaction.response.send_message(
-                    f"レート制限中です。あと{remaining:.0f}秒お待ちください。", 
-                    ephemeral=True
-                )
-            return False
     
-    user_last_command[user_id] = now
+    message = acquire_rate_limit(interaction.user.id, interaction.guild_id, cost)
+    if message:
+        # interaction.responseが既に使われている場合はfollowupを使用
+        if interaction.response.is_done():
+            await interaction.followup.send(message, ephemeral=True)
+        else:
+            await interaction.response.send_message(message, ephemeral=True)
+        return False
     return True
 
 
+def make_queue_notifier(interaction: discord.Interaction) -> admission.QueueNotifier:
+    """スクレイピングの順番待ちを応答保留中のメッセージに表示する通知先を作成"""
+    async def notify(position: int):
+        if position:
+            content = f"⏳ 混雑しているため順番待ちです（あと{position}番目）"
+        else:
+            content = "🔍 順番が来ました。取得しています..."
+        await interaction.edit_original_response(content=content)
+    return notify
+
+
+async def send_busy_message(interaction: discord.Interaction):
+    """混雑でスクレイピングを受け付けられなかったことを伝える"""
+    try:
+        await interaction.followup.send("⏳ 現在混雑しているため取得できませんでした。しばらく時間をおいてから再試行してください。", ephemeral=True)
+    except discord.HTTPException as e:
+        logger.error(f"Failed to send busy message: {e}")
+
+
 @bot.command(name='fanza_search')
 @check_nsfw_channel()
-@check_rate_limit()
+@check_rate_limit(lambda ctx: fanza_request_cost())
 async def fanza_search(ctx):
     """FANZAの高評価作品を表示"""
+    started = time.perf_counter()
+    # スクレイピングはこのサーバーの待ち行列で受け付ける
+    admission.set_guild(ctx.guild.id if ctx.guild else None)
     try:
         # 処理中メッセージ
         processing_msg = await ctx.send("商品情報を取得中... 🔍")
@@ -423,7 +642,7 @@ async def fanza_search(ctx):
         
         # 各商品についてMissAVで検索（非同期で並列実行）
         async def add_missav_url(product):
-            missav_url = await search_missav_for_product(product, force_refresh=force_refresh)
+            missav_url = await search_missav_for_product(product)
             if missav_url:
                 product['missav_url'] = missav_url
             return product
@@ -432,6 +651,9 @@ async def fanza_search(ctx):
         products_to_search = products[:5]
         products[:5] = await asyncio.gather(*[add_missav_url(product) for product in products_to_search])
         
+        # データの取得時刻（キャッシュの場合は元の取得時刻）
+        fetched_at = scraper.get_cache_timestamp()
+        
         # 処理中メッセージを削除
         await processing_msg.delete()
         
@@ -442,26 +664,32 @@ async def fanza_search(ctx):
             color=discord.Color.gold(),
             timestamp=datetime.now()
         )
-        await ctx.send(embed=header_embed)
+        embeds = [header_embed]
         
         # 各商品を表示
         for i, product in enumerate(products, 1):
             embed = FanzaEmbed(product)
             embed.title = f"{i}. {embed.title}"
-            await ctx.send(embed=embed)
-            await asyncio.sleep(0.5)  # 連続投稿を避けるため少し待機
+            embeds.append(embed)
         
         # フッターメッセージ
         footer_embed = discord.Embed(
             description="※価格は変動する可能性があります",
             color=discord.Color.greyple()
         )
-        footer_embed.set_footer(text=f"取得時刻: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-        await ctx.send(embed=footer_embed)
+        footer_embed.set_footer(text=f"取得時刻: {(fetched_at or datetime.now()).strftime('%Y-%m-%d %H:%M:%S')}")
+        embeds.append(footer_embed)
+        
+        # ヘッダー・商品・フッターをまとめて送信
+        await EmbedDelivery(ctx.send).send(embeds)
         
+    except admission.AdmissionRejected:
+        await ctx.send("⏳ 現在混雑しているため取得できませんでした。しばらくしてから再試行してください。")
     except Exception as e:
         logger.error(f"Error in fanza_search command: {e}")
         await ctx.send("エラーが発生しました。管理者にお問い合わせください。")
+    finally:
+        metrics.COMMAND_DURATION.observe(time.perf_counter() - started, command="fanza_search", mode="prefix")
 
 
 # スラッシュコマンド定義
@@ -516,45 +744,31 @@ async def slash_fanza_search(interaction: discord.Interaction, mode: str = "rati
     if not await check_nsfw_interaction(interaction):
         return
     
+    started = time.perf_counter()
+    # インタラクションIDを相関IDとして処理の各段階を記録
+    trace = tracing.begin_trace("fanza_search", trace_id=str(interaction.id), mode=mode, user_id=interaction.user.id, guild_id=interaction.guild_id)
+    # スクレイピング・MissAV検索はこのサーバーの待ち行列で受け付ける
+    admission.set_guild(interaction.guild_id)
     try:
         # 処理中メッセージ（defer で3秒の猶予を確保）
-        await interaction.response.defer()
-        
-        # レート制限チェック（defer後に実行）
-        if not await check_rate_limit_interaction(interaction):
-            return
-        
-        # セールタイプ、メディアタイプ、ソート、キーワード、リリースフィルターに応じたURLを生成
-        media_param = None if media_type == "all" else media_type
-        url = get_sale_url(
-            sale_type=sale_type, 
-            media_type=media_param, 
-            sort_type=sort_type, 
-            keyword=keyword, 
+        with tracing.span("defer"):
+            await interaction.response.defer()
+        
+        # セールタイプ、メディアタイプ、ソート、キーワード、リリースフィルターを正規化した検索条件
+        query = FanzaQuery(
+            sale_type=sale_type,
+            media_type=media_type,
+            sort_type=sort_type,
+            keyword=keyword,
             release_filter=release_filter
         )
+        url = query.url
         
-        # 商品情報を取得
-        products = await scraper.get_high_rated_products(url=url, force_refresh=force_refresh)
-        
-        if not products:
-            media_text = {
-                "all": "商品",
-                "2d": "2D動画", 
-                "vr": "VR作品"
-            }.get(media_type, "商品")
-            await interaction.followup.send(f"❌ 評価4.0以上の{media_text}が見つかりませんでした。", ephemeral=True)
-            return
-        
-        # 各商品についてMissAVで検索（非同期で並列実行）
-        async def add_missav_url(product):
-            missav_url = await search_missav_for_product(product, force_refresh=force_refresh)
-            if missav_url:
-                product['missav_url'] = missav_url
-            return product
-        
-        # 並列でMissAV検索を実行
-        products = await asyncio.gather(*[add_missav_url(product) for product in products])
+        # レート制限チェック（defer後に実行、キャッシュから返せる検索は低コスト）
+        with tracing.span("rate_check"):
+            if not await check_rate_limit_interaction(interaction, fanza_request_cost(query, force_refresh)):
+                return
+        prefetcher.record(query)
         
         # セールタイプとメディアタイプの表示名を取得
         sale_type_name = SALE_TYPES.get(sale_type, {}).get("name", "🎯 全てのセール")
@@ -569,56 +783,157 @@ async def slash_fanza_search(interaction: discord.Interaction, mode: str = "rati
             "vr": "VR作品"
         }.get(media_type, "作品")
         
-        # モードに応じて処理
-        import random
+        def build_header_embed() -> discord.Embed:
+            """モードと現在の取得件数に応じたヘッダーを作成"""
+            if mode == "random":
+                title = f"🎲 FANZA {media_emoji} {media_text} ランダム - {sale_type_name}"
+                description = f"ランダムに選ばれた高評価{media_text}です ({count}件)"
+            elif mode == "list":
+                title = f"📋 FANZA {media_emoji} {media_text}リスト - {sale_type_name}"
+                description = f"高評価{media_text}一覧 ({len(products)}件)"
+            else:
+                title = f"{media_emoji} FANZA 高評価{media_text}TOP{count} - {sale_type_name}"
+                description = f"評価4.0以上の{media_text}です (表示: {min(count, len(products))}件)"
+            
+            header_embed = discord.Embed(
+                title=title,
+                description=description,
+                color=discord.Color.gold(),
+                timestamp=datetime.now()
+            )
+            
+            # 検索URLを追加
+            header_embed.add_field(
+                name="🔗 検索URL",
+                value=f"[FANZAで直接確認する]({url})",
+                inline=False
+            )
+            
+            # データの鮮度を表示（期限切れキャッシュを返した場合も分かるように）
+            header_embed.add_field(
+                name="🕒 データ取得",
+                value=format_data_age(scraper.get_cache_timestamp(query=query)),
+                inline=False
+            )
+            return header_embed
+        
+        def build_product_embed(index: int, product: dict) -> discord.Embed:
+            embed = FanzaEmbed(product)
+            embed.title = f"{index}. {embed.title}"
+            return embed
+        
+        async def send_products(selected: List[dict]) -> EmbedDelivery:
+            """ヘッダーと商品のEmbedをまとめて表示（追記するMissAV欄の分の文字数を確保して分割）"""
+            delivery = EmbedDelivery(lambda **kwargs: interaction.followup.send(wait=True, **kwargs), headroom=100)
+            with tracing.span("build_embeds"):
+                embeds = [build_header_embed()] + [build_product_embed(i, product) for i, product in enumerate(selected, 1)]
+            await delivery.send(embeds)
+            return delivery
+        
+        def top_products() -> List[dict]:
+            return sorted(products, key=lambda x: x['rating'], reverse=True)[:count]
+        
+        # 商品情報を取得できた順に受け取り、表示に必要な件数が揃った時点で表示を始める
+        products = []
+        list_view = None
+        first_page_task = None
+        header_message = None
+        delivery = None
+        shown: List[dict] = []  # 取得完了前に表示した商品（評価順モード）
+        # 混雑で待ち行列に入った場合は応答保留中のメッセージで順番を知らせる
+        notifier_token = admission.set_queue_notifier(make_queue_notifier(interaction))
+        stream = scraper.stream_high_rated_products(query=query, force_refresh=force_refresh)
+        try:
+            async for batch in stream:
+                products.extend(sorted(batch, key=lambda x: x['rating'], reverse=True))
+                
+                if mode == "list":
+                    if list_view is None and len(products) >= ITEMS_PER_PAGE:
+                        # 1ページ分揃った時点でリストを表示し、以降は追加分でページを増やす
+                        with tracing.span("discord_send"):
+                            header_message = await interaction.followup.send(embed=build_header_embed(), wait=True)
+                            list_view = PaginationView(list(products), interaction, force_refresh=force_refresh)
+                            list_view.message = await interaction.followup.send(embed=list_view.create_embed(), view=list_view, wait=True)
+                        # 残りの取得を待たずに表示中のページのMissAV検索を始める
+                        first_page_task = asyncio.create_task(list_view.load_current_page())
+                    elif list_view is not None and list_view.add_products(batch):
+                        with tracing.span("discord_edit"):
+                            await list_view.message.edit(embed=list_view.create_embed(), view=list_view)
+                elif mode != "random" and len(products) >= count:
+                    if query.sort_type == "review_rank":
+                        # 評価の高い順で取得している場合は先頭から揃うため、表示件数が揃えば残りの取得を待たない
+                        break
+                    if delivery is None:
+                        # 他の並び順では後のページにより評価の高い商品がありうるため、揃った時点の上位を先に表示し、
+                        # 全件の取得後に上位が入れ替わった分を差し替える
+                        shown = top_products()
+                        delivery = await send_products(shown)
+        finally:
+            await stream.aclose()
+            admission.reset_queue_notifier(notifier_token)
+        
+        if not products:
+            media_text = {
+                "all": "商品",
+                "2d": "2D動画", 
+                "vr": "VR作品"
+            }.get(media_type, "商品")
+            await interaction.followup.send(f"❌ 評価4.0以上の{media_text}が見つかりませんでした。", ephemeral=True)
+            return
+        
+        if mode == "list":
+            if list_view is None:
+                # 1ページに満たない件数で取得が終わった場合
+                with tracing.span("discord_send"):
+                    await interaction.followup.send(embed=build_header_embed())
+                    list_view = PaginationView(products, interaction, force_refresh=force_refresh)
+                    list_view.message = await interaction.followup.send(embed=list_view.create_embed(), view=list_view, wait=True)
+            else:
+                # 最終的な件数でヘッダーを更新
+                with tracing.span("discord_edit"):
+                    await header_message.edit(embed=build_header_embed())
+            
+            # MissAV URLは表示中のページ分だけ取得し、取得でき次第リストを更新
+            if first_page_task is not None:
+                await first_page_task
+            await list_view.load_current_page()
+            return
         
         if mode == "random":
-            # ランダムモード: 商品をシャッフルして指定件数選択
+            # ランダムモード: 全件から指定件数を選ぶため、取得の完了後に表示する
             products = random.sample(products, min(count, len(products)))
-            title = f"🎲 FANZA {media_emoji} {media_text} ランダム - {sale_type_name}"
-            description = f"ランダムに選ばれた高評価{media_text}です ({count}件)"
-        elif mode == "list":
-            # リストモード: 簡易表示
-            title = f"📋 FANZA {media_emoji} {media_text}リスト - {sale_type_name}"
-            description = f"高評価{media_text}一覧 ({len(products)}件)"
         else:
             # 評価順モード（デフォルト）- 指定件数のみ表示
-            title = f"{media_emoji} FANZA 高評価{media_text}TOP{count} - {sale_type_name}"
-            description = f"評価4.0以上の{media_text}です (表示: {count}件 / 全{len(products)}件)"
-            products = products[:count]  # 評価順とランダムモードは指定件数に制限
-        
-        # ヘッダーメッセージ
-        header_embed = discord.Embed(
-            title=title,
-            description=description,
-            color=discord.Color.gold(),
-            timestamp=datetime.now()
-        )
-        
-        # 検索URLを追加
-        header_embed.add_field(
-            name="🔗 検索URL",
-            value=f"[FANZAで直接確認する]({url})",
-            inline=False
-        )
-        
-        await interaction.followup.send(embed=header_embed)
+            products = top_products()
         
-        # モードに応じた表示
-        if mode == "list":
-            # リスト形式: ページネーション付きで表示
-            view = PaginationView(products, interaction)
-            embed = view.create_embed()
-            await interaction.followup.send(embed=embed, view=view)
+        # 通常形式: ヘッダーと商品のEmbedを表示し、MissAV URLは取得でき次第追記する
+        if delivery is None:
+            delivery = await send_products(products)
         else:
-            # 通常形式: 個別のEmbedで表示
-            for i, product in enumerate(products, 1):
-                embed = FanzaEmbed(product)
-                embed.title = f"{i}. {embed.title}"
-                await interaction.followup.send(embed=embed)
-                await asyncio.sleep(0.5)
-        
+            replacements = {
+                index: build_product_embed(index, product)
+                for index, (product, previous) in enumerate(zip(products, shown), 1)
+                if product is not previous
+            }
+            if replacements:
+                await delivery.replace(replacements)
+        
+        # MissAV URLを全件分検索してから、URLが見つかった商品を含むメッセージを1回ずつ編集する
+        missav_urls = await asyncio.gather(*[
+            search_missav_for_product(product, force_refresh=force_refresh)
+            for product in products
+        ])
+        replacements = {}
+        for index, (product, missav_url) in enumerate(zip(products, missav_urls), 1):
+            if missav_url:
+                product['missav_url'] = missav_url
+                # 0番目はヘッダーのため、商品の番号がそのままEmbedの位置になる
+                replacements[index] = build_product_embed(index, product)
+        if replacements:
+            await delivery.replace(replacements)
         
+    except admission.AdmissionRejected:
+        await send_busy_message(interaction)
     except Exception as e:
         logger.error(f"Error in slash fanza_search command: {e}")
         try:
@@ -629,6 +944,9 @@ async def slash_fanza_search(interaction: discord.Interaction, mode: str = "rati
             logger.error(f"Failed to send error message: {e}")
         except Exception as e:
             logger.error(f"Unexpected error sending error message: {e}")
+    finally:
+        metrics.COMMAND_DURATION.observe(time.perf_counter() - started, command="fanza_search", mode=mode)
+        trace.finish()
 
 
 
@@ -677,7 +995,7 @@ async def slash_help(interaction: discord.Interaction):
     # 使用条件
     embed.add_field(
         name="⚠️ 使用条件",
-        value="• **NSFWチャンネル**でのみ使用可能\n• **5分に1回**のレート制限あり\n• 18歳未満の使用は禁止",
+        value="• **NSFWチャンネル**でのみ使用可能\n• 新規取得は**30秒に1回**程度のレート制限あり（キャッシュ済みの検索は連続利用可）\n• 18歳未満の使用は禁止",
         inline=False
     )
     
@@ -714,7 +1032,7 @@ async def help_fanza(ctx):
     )
     embed.add_field(
         name="使用条件",
-        value="• NSFWチャンネルでのみ使用可能\n• 5分に1回のレート制限あり",
+        value="• NSFWチャンネルでのみ使用可能\n• 新規取得は30秒に1回程度のレート制限あり（キャッシュ済みの検索は連続利用可）",
         inline=False
     )
     embed.set_footer(text="FANZA Bot v2.0 - スラッシュコマンド対応")
@@ -740,6 +1058,25 @@ async def sync_commands(ctx):
         logger.error(f"Manual sync error: {e}")
 
 
+@bot.command(name='workers')
+@commands.is_owner()
+async def scraper_workers_command(ctx, count: Optional[int] = None):
+    """スクレイピングのワーカーの状態を表示し、数を指定した場合は増減する（オーナー専用）"""
+    if scraper_workers is None:
+        await ctx.send("ℹ️ Scraper workers are disabled (SCRAPER_WORKER=false)")
+        return
+    if count is not None:
+        try:
+            await scraper_workers.resize(count)
+        except ValueError as e:
+            await ctx.send(f"❌ Resize failed: {e}")
+            return
+        await ctx.send(f"✅ Scraper workers resized to {len(scraper_workers)}")
+    lines = [format_worker_status(status) for status in scraper_workers.get_status()]
+    lines.append(f"代替ワーカーへの振り分け: {scraper_workers.failovers}回")
+    await ctx.send("\n".join(lines))
+
+
 @bot.tree.command(name="bot_info", description="🤖 BOTの詳細情報とステータスを表示")
 async def bot_info(interaction: discord.Interaction):
     """BOTの情報を表示（コマンドボタン付き）"""
@@ -841,7 +1178,7 @@ class BotInfoView(View):
         )
         embed.add_field(
             name="⚠️ 使用条件",
-            value="• NSFWチャンネルでのみ使用可能\n• レート制限: 5分に1回",
+            value="• NSFWチャンネルでのみ使用可能\n• レート制限: 新規取得は30秒に1回程度（キャッシュ済みは連続利用可）",
             inline=False
         )
         await interaction.response.send_message(embed=embed, ephemeral=True)
@@ -862,18 +1199,38 @@ class BotInfoView(View):
         current_time = datetime.now()
         uptime = current_time - interaction.client.start_time if hasattr(interaction.client, 'start_time') else "不明"
         
-        # より正確な機能状況チェック
-        try:
-            # BOTが正常に動作しているかの基本チェック
-            bot_healthy = not interaction.client.is_closed()
-            scraping_status = "🟢 利用可能" if bot_healthy else "🔴 停止中"
-            cache_status = "🟢 利用可能" if bot_healthy else "🔴 停止中"
-            # コマンド同期ステータスをより正確に表現
-            commands_status = "🟢 ローカル登録済み" if interaction.client.tree else "🟡 未登録"
-        except Exception:
-            scraping_status = "🟡 確認中"
-            cache_status = "🟡 確認中"
-            commands_status = "🟡 確認中"
+        # 計測値から機能状況を判定（/metricsと同じ値）
+        if scraper_workers is not None:
+            # スクレイピング・受付制御はワーカープロセスで計測（最後の状態確認の値の合計）
+            scrape_stats = scraper_workers.get_scrape_stats()
+            scrape_errors = scrape_stats['errors']
+        else:
+            scrape_stats = metrics.SCRAPE_DURATION.summary(source="fanza")
+            scrape_errors = metrics.SCRAPE_ERRORS.value(source="fanza")
+        if interaction.client.is_closed():
+            scraping_status = "🔴 停止中"
+        elif scrape_stats['count'] and scrape_errors / scrape_stats['count'] > 0.2:
+            scraping_status = f"🟡 エラー多発 ({scrape_errors:.0f}/{scrape_stats['count']}回)"
+        else:
+            scraping_status = f"🟢 利用可能 (平均{scrape_stats['avg']:.1f}秒 / {scrape_stats['count']}回)"
+        
+        def format_hit_rate(cache_name: str) -> str:
+            hit_rate = scraper_workers.cache_hit_rate(cache_name) if scraper_workers is not None else metrics.cache_hit_rate(cache_name)
+            return "未使用" if hit_rate is None else f"ヒット率{hit_rate * 100:.0f}%"
+        cache_status = f"🟢 一覧: {format_hit_rate('listing')} / MissAV: {format_hit_rate('missav')}"
+        commands_status = "🟢 ローカル登録済み" if interaction.client.tree else "🟡 未登録"
+        
+        browsers = metrics.browser_stats()
+        browser_text = " / ".join(
+            f"{name}: {stats['browsers']}ブラウザ・{stats['pages']}ページ" for name, stats in browsers.items()
+        ) or "未起動"
+        command_stats = metrics.COMMAND_DURATION.summary(command="fanza_search")
+        enrich_stats = metrics.MISSAV_ENRICH_DURATION.summary()
+        send_stats = metrics.DISCORD_SEND_DURATION.summary()
+        if scraper_workers is not None:
+            admission_stats = scraper_workers.get_admission_stats()
+        else:
+            admission_stats = admission.scrape_admission.get_stats()
         
         embed = discord.Embed(
             title="📊 BOTステータス",
@@ -881,9 +1238,13 @@ class BotInfoView(View):
             color=discord.Color.orange(),
             timestamp=current_time
         )
+        connection_text = f"• **稼働サーバー**: {guild_count:,}個\n• **総ユーザー数**: {total_members}\n• **接続状態**: 🟢 オンライン\n• **稼働時間**: {uptime}"
+        if ENABLE_SHARDING:
+            client = interaction.client
+            connection_text += f"\n• **シャード**: {sharding.format_shard_ids(client.shard_ids or [])} / 全{client.shard_count}（このサーバーは{interaction.guild.shard_id if interaction.guild else 0}番）"
         embed.add_field(
             name="🌐 接続情報",
-            value=f"• **稼働サーバー**: {guild_count:,}個\n• **総ユーザー数**: {total_members}\n• **接続状態**: 🟢 オンライン\n• **稼働時間**: {uptime}",
+            value=connection_text,
             inline=False
         )
         embed.add_field(
@@ -893,7 +1254,14 @@ class BotInfoView(View):
         )
         embed.add_field(
             name="📊 監視項目",
-            value="• **応答性**: リアルタイム監視中\n• **リソース**: 設計上最適化を考慮\n• **Discord API**: 接続状況良好",
+            value=(
+                f"• **検索コマンド**: 中央値{command_stats['p50']:g}秒以下 / 95%が{command_stats['p95']:g}秒以下 ({command_stats['count']}回)\n"
+                f"• **MissAV検索**: 平均{enrich_stats['avg']:.1f}秒 ({enrich_stats['count']}件)\n"
+                f"• **Discord API**: 送信平均{send_stats['avg'] * 1000:.0f}ms ({send_stats['count']}回)\n"
+                f"• **ブラウザ**: {browser_text}\n"
+                f"• **スクレイピング枠**: {admission_stats['active']}/{admission_stats['max_concurrent']}使用中・{admission_stats['queued']}件待ち"
+                + ''.join(f"\n• **ワーカー** {format_worker_status(status)}" for status in (scraper_workers.get_status() if scraper_workers is not None else []))
+            ),
             inline=False
         )
         embed.set_footer(text="最終確認時刻")
@@ -912,20 +1280,26 @@ async def missav_search(interaction: discord.Interaction, title: str, force_refr
     if not await check_nsfw_interaction(interaction):
         return
     
-    # レート制限チェック
-    if not await check_rate_limit_interaction(interaction):
-        return
-    
     if not title or len(title.strip()) < 2:
         await interaction.response.send_message("❌ 検索タイトルは2文字以上で入力してください。", ephemeral=True)
         return
     
+    # レート制限チェック（キャッシュから返せる検索は低コスト）
+    if not await check_rate_limit_interaction(interaction, missav_request_cost(title.strip(), force_refresh)):
+        return
+    
+    started = time.perf_counter()
+    admission.set_guild(interaction.guild_id)
     try:
         # 処理中メッセージ
         await interaction.response.defer()
         
-        # MissAVで動画を検索
-        videos = await missav_scraper.search_videos(title.strip(), force_refresh=force_refresh)
+        # MissAVで動画を検索（混雑時は順番を知らせる）
+        notifier_token = admission.set_queue_notifier(make_queue_notifier(interaction))
+        try:
+            videos = await missav_scraper.search_videos(title.strip(), force_refresh=force_refresh)
+        finally:
+            admission.reset_queue_notifier(notifier_token)
         
         if not videos:
             await interaction.followup.send(f"❌ 「{title}」に関連する動画が見つかりませんでした。", ephemeral=True)
@@ -941,7 +1315,7 @@ async def missav_search(interaction: discord.Interaction, title: str, force_refr
             color=discord.Color.purple(),
             timestamp=datetime.now()
         )
-        await interaction.followup.send(embed=header_embed)
+        embeds = [header_embed]
         
         # 各動画の情報を表示
         for i, video in enumerate(videos, 1):
@@ -964,9 +1338,7 @@ async def missav_search(interaction: discord.Interaction, title: str, force_refr
                 embed.set_image(url=video['thumbnail'])
             
             embed.set_footer(text="MissAV検索結果")
-            
-            await interaction.followup.send(embed=embed)
-            await asyncio.sleep(0.5)
+            embeds.append(embed)
         
         # フッターメッセージ
         footer_embed = discord.Embed(
@@ -974,23 +1346,57 @@ async def missav_search(interaction: discord.Interaction, title: str, force_refr
             color=discord.Color.greyple()
         )
         footer_embed.set_footer(text=f"検索時刻: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-        await interaction.followup.send(embed=footer_embed)
+        embeds.append(footer_embed)
+        
+        # ヘッダー・動画・フッターをまとめて送信
+        await EmbedDelivery(interaction.followup.send).send(embeds)
         
+    except admission.AdmissionRejected:
+        await send_busy_message(interaction)
     except Exception as e:
         logger.error(f"Error in missav_search command: {e}")
         try:
             await interaction.followup.send("❌ 検索中にエラーが発生しました。しばらく時間をおいてから再試行してください。", ephemeral=True)
         except:
             logger.error("Failed to send error message")
+    finally:
+        metrics.COMMAND_DURATION.observe(time.perf_counter() - started, command="missav_search", mode="search")
+
+
+async def stop_background_services():
+    """Botのイベントループで動いている定期処理を停止"""
+    try:
+        await prefetcher.stop()
+    except Exception as e:
+        logger.error(f"Error stopping prefetcher: {e}")
+    if browser_watchdog is not None:
+        try:
+            await browser_watchdog.stop()
+        except Exception as e:
+            logger.error(f"Error stopping browser watchdog: {e}")
+    try:
+        await metrics.stop_metrics_server()
+    except Exception as e:
+        logger.error(f"Error stopping metrics endpoint: {e}")
 
 
 async def cleanup():
-    """クリーンアップ処理"""
+    """クリーンアップ処理（Botの終了時にBotのイベントループで実行）"""
+    await stop_background_services()
     try:
         await scraper.close()
         logger.info("Scraper resources cleaned up")
     except Exception as e:
         logger.error(f"Error during cleanup: {e}")
+    try:
+        await missav_scraper.close()
+        logger.info("MissAV scraper resources cleaned up")
+    except Exception as e:
+        logger.error(f"Error during MissAV cleanup: {e}")
+    try:
+        close_default_store()
+    except Exception as e:
+        logger.error(f"Error closing cache store: {e}")
 
 def main():
     """メイン実行関数"""
@@ -998,18 +1404,32 @@ def main():
         logger.error("Discord token not found! Please set DISCORD_TOKEN in .env file")
         return
     
+    # シャードを複数のプロセスで分担する場合は子プロセスを起動して監視する
+    if sharding.should_run_shard_processes():
+        sys.exit(sharding.run_shard_processes())
+    
+    # 前回のプロセスが残したブラウザを終了させる（ブラウザの起動前に実行）
+    if REAP_ORPHANED_BROWSERS:
+        try:
+            reaped = reap_orphaned_browsers()
+            if reaped:
+                logger.info(f"Reaped {reaped} orphaned browser processes")
+        except Exception as e:
+            logger.error(f"Failed to reap orphaned browsers: {e}")
+    
+    failed = False
     try:
         bot.run(DISCORD_TOKEN)
     except KeyboardInterrupt:
         logger.info("Bot shutdown requested")
     except Exception as e:
+        failed = True
         logger.error(f"Failed to run bot: {e}")
-    finally:
-        # クリーンアップ処理を実行
-        try:
-            asyncio.run(cleanup())
-        except Exception as e:
-            logger.error(f"Cleanup failed: {e}")
+    # クリーンアップ処理はbot.runの終了前にFanzaBot.closeで実行済み
+    
+    # 異常終了を終了コードで伝える（シャードの監視プロセスは0を正常な停止として扱い、起動し直さない）
+    if failed:
+        sys.exit(1)
 
 
 if __name__ == "__main__":
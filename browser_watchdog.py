@@ -0,0 +1,372 @@
+"""
+ブラウザの監視と再起動
+スクレイパーごとにPlaywrightドライバー配下のプロセスツリーのメモリ使用量（RSS）・開いているページ数・
+簡単なページ遷移の応答時間を定期的に計測し、しきい値を超えた場合や一定回数スクレイピングした場合は
+実行中のページの完了を待ってからブラウザを起動し直す
+起動したブラウザ・ドライバーのPIDをプロセスごとのファイルに記録し、起動時には終了したプロセスが残したもののみを終了させる
+"""
+
+import asyncio
+import glob
+import json
+import logging
+import os
+import signal
+import tempfile
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+import metrics
+from config import (
+    BROWSER_WATCHDOG_INTERVAL, BROWSER_MAX_RSS_MB, BROWSER_MAX_PAGES, BROWSER_RECYCLE_AFTER_SCRAPES,
+    BROWSER_PROBE_TIMEOUT, BROWSER_DRAIN_TIMEOUT, BROWSER_CLOSE_TIMEOUT, BROWSER_PID_DIR
+)
+
+logger = logging.getLogger(__name__)
+
+PROBE_URL = "data:text/html,<title>probe</title>"
+
+
+def _read_ppid(pid: int) -> Optional[int]:
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            # commに空白や括弧が含まれる場合があるため最後の')'以降を解析
+            return int(f.read().rsplit(')', 1)[1].split()[1])
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+def _read_start_time(pid: int) -> Optional[int]:
+    """プロセスの起動時刻（起動からのクロック数、PIDが再利用された別のプロセスとの区別に使う）"""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            return int(f.read().rsplit(')', 1)[1].split()[19])
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+def _process_tree() -> Dict[int, List[int]]:
+    """親PID→子PIDの一覧"""
+    children: Dict[int, List[int]] = {}
+    try:
+        entries = os.listdir('/proc')
+    except OSError:
+        return children
+    for entry in entries:
+        if entry.isdigit():
+            ppid = _read_ppid(int(entry))
+            if ppid is not None:
+                children.setdefault(ppid, []).append(int(entry))
+    return children
+
+
+def descendant_pids(root_pid: int, tree: Optional[Dict[int, List[int]]] = None) -> List[int]:
+    """指定プロセスの子孫プロセスのPID一覧"""
+    children = tree if tree is not None else _process_tree()
+    result = []
+    stack = [root_pid]
+    while stack:
+        for child in children.get(stack.pop(), []):
+            result.append(child)
+            stack.append(child)
+    return result
+
+
+def process_rss(pid: int) -> int:
+    """プロセスのRSS（バイト、取得できない場合は0）"""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return 0
+
+
+def process_tree_rss(root_pid: int, include_root: bool = True) -> int:
+    """プロセスとその子孫のRSS合計（バイト）"""
+    pids = descendant_pids(root_pid)
+    if include_root:
+        pids.append(root_pid)
+    return sum(process_rss(pid) for pid in pids)
+
+
+def playwright_driver_pid(playwright) -> Optional[int]:
+    """Playwrightドライバー（ブラウザの親プロセス）のPID
+
+    公開APIがないため内部の接続オブジェクトから取得する（取得できない場合はNone）
+    """
+    try:
+        return playwright._impl_obj._connection._transport._proc.pid
+    except AttributeError:
+        return None
+
+
+def _signal_processes(pids: Iterable[int], sig: int):
+    for pid in pids:
+        try:
+            os.kill(pid, sig)
+        except (ProcessLookupError, PermissionError):
+            pass
+
+
+def _wait_for_exit(pids: List[int], grace: float):
+    deadline = time.monotonic() + grace
+    while time.monotonic() < deadline:
+        if not any(os.path.exists(f"/proc/{pid}") for pid in pids):
+            return
+        time.sleep(0.1)
+
+
+def kill_browser_processes(driver_pid: Optional[int]):
+    """ドライバー配下のブラウザプロセスを強制終了（応答しないブラウザを閉じられなかった場合）"""
+    if driver_pid is None:
+        return
+    pids = descendant_pids(driver_pid)
+    if pids:
+        logger.warning(f"Killing {len(pids)} unresponsive browser processes under driver {driver_pid}")
+        _signal_processes(pids, signal.SIGKILL)
+
+
+def _pid_dir() -> str:
+    if BROWSER_PID_DIR:
+        return BROWSER_PID_DIR
+    uid = os.getuid() if hasattr(os, 'getuid') else 0
+    return os.path.join(tempfile.gettempdir(), f"fanza-bot-browsers-{uid}")
+
+
+def _pid_file(owner_pid: int) -> str:
+    return os.path.join(_pid_dir(), f"{owner_pid}.json")
+
+
+def _read_pid_file(path: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_pid_file(path: str, record: Dict[str, Any]):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'w') as f:
+        json.dump(record, f)
+    os.replace(temp_path, path)
+
+
+def _is_same_process(pid: int, start_time: Optional[int]) -> bool:
+    """記録したプロセスがまだ動いているか（同じPIDの別のプロセスは除く）"""
+    return start_time is not None and _read_start_time(pid) == start_time
+
+
+def record_browser_processes(name: str, driver_pid: Optional[int]):
+    """起動したブラウザ（nameはスクレイパーの名前）のドライバーと配下のプロセスを記録
+
+    このプロセスが後片付けをせずに終了した場合に、次の起動時のreap_orphaned_browsersで終了させる対象になる
+    """
+    if driver_pid is None or not os.path.isdir('/proc'):
+        return
+    path = _pid_file(os.getpid())
+    record = _read_pid_file(path) or {}
+    record['owner'] = [os.getpid(), _read_start_time(os.getpid())]
+    pids = [driver_pid] + descendant_pids(driver_pid)
+    record.setdefault('browsers', {})[name] = [[pid, _read_start_time(pid)] for pid in pids]
+    try:
+        _write_pid_file(path, record)
+    except OSError as e:
+        logger.warning(f"Failed to record browser processes: {e}")
+
+
+def forget_browser_processes(name: str):
+    """終了したブラウザの記録を削除（記録がなくなればファイルも削除）"""
+    path = _pid_file(os.getpid())
+    record = _read_pid_file(path)
+    if not record:
+        return
+    record.get('browsers', {}).pop(name, None)
+    try:
+        if record.get('browsers'):
+            _write_pid_file(path, record)
+        else:
+            os.remove(path)
+    except OSError as e:
+        logger.warning(f"Failed to update browser process record: {e}")
+
+
+def reap_orphaned_browsers(grace: float = 2.0) -> int:
+    """前回のプロセスが残したPlaywrightのブラウザ・ドライバーを終了させる
+
+    record_browser_processesで記録したプロセスのうち、記録したプロセス（Bot・ワーカー）が既に終了しているものを対象とする
+    （子孫プロセスも含む）。動作中の他のインスタンスや他のPlaywrightのアプリのプロセスは対象外
+
+    Returns:
+        終了させたプロセス数
+    """
+    if not os.path.isdir('/proc'):
+        return 0
+
+    tree = _process_tree()
+    targets = set()
+    stale_files: List[str] = []
+    for path in glob.glob(os.path.join(_pid_dir(), "*.json")):
+        record = _read_pid_file(path)
+        if record is None:
+            continue
+        owner_pid, owner_start = record.get('owner') or (None, None)
+        if owner_pid is not None and _is_same_process(owner_pid, owner_start):
+            continue
+        stale_files.append(path)
+        for processes in record.get('browsers', {}).values():
+            for pid, start_time in processes:
+                if _is_same_process(pid, start_time):
+                    targets.add(pid)
+                    targets.update(descendant_pids(pid, tree))
+
+    if targets:
+        logger.warning(f"Reaping {len(targets)} orphaned Playwright browser processes")
+        pids = sorted(targets)
+        _signal_processes(pids, signal.SIGTERM)
+        _wait_for_exit(pids, grace)
+        _signal_processes(pids, signal.SIGKILL)
+    for path in stale_files:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+    return len(targets)
+
+
+async def wait_until_drained(in_flight: Callable[[], int], timeout: float = BROWSER_DRAIN_TIMEOUT) -> bool:
+    """実行中のページがなくなるまで待つ（タイムアウトした場合はFalse）"""
+    deadline = time.monotonic() + timeout
+    while in_flight() > 0:
+        if time.monotonic() >= deadline:
+            return False
+        await asyncio.sleep(0.1)
+    return True
+
+
+async def close_browser(browser, driver_pid: Optional[int], timeout: float = BROWSER_CLOSE_TIMEOUT):
+    """ブラウザを閉じる（応答しない場合はプロセスを強制終了）"""
+    try:
+        await asyncio.wait_for(browser.close(), timeout)
+    except Exception as e:
+        logger.warning(f"Failed to close browser cleanly: {e}")
+        kill_browser_processes(driver_pid)
+
+
+class BrowserWatchdog:
+    """スクレイパーのブラウザを監視し、必要に応じて起動し直す
+
+    監視対象は以下を持つスクレイパー:
+        get_browser_stats() / browser_driver_pid() / active_context() /
+        scrapes_since_launch / recycle_browser(reason)
+    """
+
+    def __init__(self, targets: Dict[str, Any], interval: float = BROWSER_WATCHDOG_INTERVAL, max_rss_mb: float = BROWSER_MAX_RSS_MB, max_pages: int = BROWSER_MAX_PAGES, recycle_after: int = BROWSER_RECYCLE_AFTER_SCRAPES, probe_timeout: float = BROWSER_PROBE_TIMEOUT):
+        """
+        Args:
+            targets: 名前→監視するスクレイパー
+            interval: 計測する間隔（秒）
+            max_rss_mb: ドライバー配下のプロセスツリーのRSSの上限（MB、0で無効）
+            max_pages: 開いているページ数の上限（閉じ忘れたページの検出、0で無効）
+            recycle_after: ブラウザを起動し直すまでのスクレイピング回数（0で無効）
+            probe_timeout: 応答確認のページ遷移のタイムアウト（秒）
+        """
+        self.targets = targets
+        self.interval = interval
+        self.max_rss = max_rss_mb * 1024 * 1024
+        self.max_pages = max_pages
+        self.recycle_after = recycle_after
+        self.probe_timeout = probe_timeout
+        self._task: Optional[asyncio.Task] = None
+        self.last_samples: Dict[str, Dict[str, Any]] = {}
+
+    def start(self):
+        """監視ループを開始"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+            logger.info(f"Browser watchdog started (interval={self.interval}s)")
+
+    async def stop(self):
+        """監視ループを停止"""
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            for name, target in self.targets.items():
+                try:
+                    await self.check(name, target)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.error(f"Browser watchdog check failed for {name}: {e}")
+
+    async def probe(self, target) -> Optional[float]:
+        """空のページへの遷移にかかった秒数（応答しない・失敗した場合はNone）"""
+        context = target.active_context()
+        if context is None:
+            return None
+        started = time.perf_counter()
+        page = None
+        try:
+            page = await asyncio.wait_for(context.new_page(), self.probe_timeout)
+            await asyncio.wait_for(page.goto(PROBE_URL), self.probe_timeout)
+            return time.perf_counter() - started
+        except Exception as e:
+            logger.warning(f"Browser probe failed: {e!r}")
+            return None
+        finally:
+            if page is not None:
+                try:
+                    await asyncio.wait_for(page.close(), self.probe_timeout)
+                except Exception:
+                    pass
+
+    async def check(self, name: str, target) -> Optional[str]:
+        """ブラウザを計測し、起動し直した場合はその理由を返す"""
+        stats = target.get_browser_stats()
+        if not stats.get('browsers'):
+            self.last_samples.pop(name, None)
+            return None
+
+        driver_pid = target.browser_driver_pid()
+        rss = process_tree_rss(driver_pid) if driver_pid else 0
+        probe_time = await self.probe(target)
+        sample = {
+            'rss_mb': round(rss / (1024 * 1024), 1),
+            'pages': stats.get('pages', 0),
+            'probe': None if probe_time is None else round(probe_time, 3),
+            'scrapes': target.scrapes_since_launch
+        }
+        self.last_samples[name] = sample
+        metrics.BROWSER_RSS.set(rss, source=name)
+        if probe_time is not None:
+            metrics.BROWSER_PROBE_DURATION.observe(probe_time, source=name)
+
+        reason = None
+        if probe_time is None:
+            reason = "unresponsive"
+        elif self.max_rss and rss > self.max_rss:
+            reason = "rss"
+        elif self.max_pages and sample['pages'] > self.max_pages:
+            reason = "pages"
+        elif self.recycle_after and target.scrapes_since_launch >= self.recycle_after:
+            reason = "scrapes"
+        if reason is None:
+            return None
+
+        logger.warning(f"Recycling {name} browser ({reason}): {sample}")
+        if await target.recycle_browser(reason):
+            metrics.BROWSER_RECYCLES.inc(source=name, reason=reason)
+            return reason
+        return None
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """直近の計測値"""
+        return dict(self.last_samples)
@@ -0,0 +1,120 @@
+"""
+SQLiteを使ったキャッシュの永続化ストア
+再起動後もキャッシュを引き継ぐため、TTLCacheへの書き込みをそのまま保存し、
+未ロードのキーは必要になった時点で読み込む
+"""
+
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+from typing import Any, Optional, Tuple
+from config import CACHE_DB_PATH
+
+logger = logging.getLogger(__name__)
+
+
+class SQLiteCacheStore:
+    """名前空間とキーで値を保存するSQLiteストア（値はJSONで保存）"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        # 読み書きはスレッドプールで実行するため、接続へのアクセスを直列化する
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS cache (
+                    namespace TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    fetched_at REAL NOT NULL,
+                    expires_at REAL NOT NULL,
+                    PRIMARY KEY (namespace, key)
+                )"""
+            )
+            # 起動時に期限切れの行を削除
+            self._conn.execute("DELETE FROM cache WHERE expires_at <= ?", (time.time(),))
+            self._conn.commit()
+            logger.info(f"Opened cache store: {self.path}")
+        return self._conn
+
+    def _load_sync(self, namespace: str, key: str) -> Optional[Tuple[Any, float, float]]:
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT value, fetched_at, expires_at FROM cache WHERE namespace = ? AND key = ? AND expires_at > ?",
+                (namespace, key, time.time())
+            ).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0]), row[1], row[2]
+
+    def _save_sync(self, namespace: str, key: str, value: Any, fetched_at: float, expires_at: float):
+        payload = json.dumps(value, ensure_ascii=False)
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO cache (namespace, key, value, fetched_at, expires_at) VALUES (?, ?, ?, ?, ?)",
+                (namespace, key, payload, fetched_at, expires_at)
+            )
+            conn.commit()
+
+    def _delete_sync(self, namespace: str, key: str):
+        with self._lock:
+            conn = self._connect()
+            conn.execute("DELETE FROM cache WHERE namespace = ? AND key = ?", (namespace, key))
+            conn.commit()
+
+    async def load(self, namespace: str, key: str) -> Optional[Tuple[Any, float, float]]:
+        """値・取得時刻・削除時刻（UNIX時間）を読み込む（期限切れ・未保存の場合はNone）"""
+        try:
+            return await asyncio.to_thread(self._load_sync, namespace, key)
+        except Exception as e:
+            logger.error(f"Failed to load cache entry {namespace}/{key}: {e}")
+            return None
+
+    async def save(self, namespace: str, key: str, value: Any, fetched_at: float, expires_at: float):
+        """値を保存（同じキーは上書き）"""
+        try:
+            await asyncio.to_thread(self._save_sync, namespace, key, value, fetched_at, expires_at)
+        except Exception as e:
+            logger.error(f"Failed to save cache entry {namespace}/{key}: {e}")
+
+    async def delete(self, namespace: str, key: str):
+        """値を削除"""
+        try:
+            await asyncio.to_thread(self._delete_sync, namespace, key)
+        except Exception as e:
+            logger.error(f"Failed to delete cache entry {namespace}/{key}: {e}")
+
+    def close(self):
+        """接続を閉じる"""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+_default_store: Optional[SQLiteCacheStore] = None
+
+
+def get_default_store() -> Optional[SQLiteCacheStore]:
+    """設定されたパスの共有ストアを取得（CACHE_DB_PATH未設定の場合はNone）"""
+    global _default_store
+    if not CACHE_DB_PATH:
+        return None
+    if _default_store is None:
+        _default_store = SQLiteCacheStore(CACHE_DB_PATH)
+    return _default_store
+
+
+def close_default_store():
+    """共有ストアを閉じる"""
+    if _default_store is not None:
+        _default_store.close()
@@ -8,7 +8,7 @@ DISCORD_TOKEN = os.getenv("DISCORD_TOKEN")
 COMMAND_PREFIX = "!"
 
 # FANZAスクレイピング設定
-FANZA_BASE_URL = "https://video.dmm.co.jp/av/list/"
+FANZA_BASE_URL = os.getenv("FANZA_BASE_URL", "https://video.dmm.co.jp/av/list/")  # ローカルの検証用サーバーに向ける場合に変更
 FANZA_SORT = "review_rank"
 
 # ソート設定
@@ -95,44 +95,6 @@ SALE_TYPES = {
 # デフォルトの検索URL（セールフィルターなし）
 FANZA_SALE_URL = f"{FANZA_BASE_URL}?sort={FANZA_SORT}"
 
-def get_sale_url(sale_type: str = "none", media_type: str = None, sort_type: str = "review_rank", keyword: str = None, release_filter: str = None) -> str:
-    """セールタイプ、メディアタイプ、ソート、キーワード、リリースフィルターに応じたURLを生成"""
-    if sale_type not in SALE_TYPES:
-        sale_type = "none"
-    
-    keys = SALE_TYPES[sale_type]["keys"]
-    
-    # キーワードまたはセールキーが存在する場合のみkeyパラメータを追加
-    key_parts = []
-    if keyword and keyword.strip():
-        key_parts.append(keyword.strip())
-    if keys:
-        key_parts.append('|'.join(keys))
-    
-    # ソートタイプの確認
-    sort_value = SORT_OPTIONS.get(sort_type, {}).get("value", FANZA_SORT)
-    
-    # ベースURL構築
-    url = f"{FANZA_BASE_URL}?sort={sort_value}"
-    
-    # keyパラメータがある場合のみ追加
-    if key_parts:
-        key_param = '+'.join(key_parts)
-        url += f"&key={key_param}"
-    
-    # media_typeパラメータを追加
-    if media_type == "2d":
-        url += "&media_type=2d"
-    elif media_type == "vr":
-        url += "&media_type=vr"
-    
-    # リリースフィルターパラメータを追加
-    if release_filter and release_filter != "all":
-        release_value = RELEASE_OPTIONS.get(release_filter, {}).get("value")
-        if release_value:
-            url += f"&release={release_value}"
-    
-    return url
 MIN_RATING = 4.0
 MAX_ITEMS = 50  # キャッシュする最大商品数（10ページ × 5件）
 # 表示設定
@@ -141,9 +103,115 @@ MAX_DISPLAY_PAGES = 10  # リスト形式での最大ページ数
 
 # キャッシュ設定
 CACHE_DURATION = 3600  # 1時間（秒）
+CACHE_STALE_GRACE = int(os.getenv("CACHE_STALE_GRACE", "1800"))  # 期限切れ後も即座に返して裏で再取得する猶予（秒、0で無効）
+LISTING_CACHE_MAX_ENTRIES = 256  # 検索結果キャッシュの最大件数
+LISTING_CACHE_MAX_BYTES = 32 * 1024 * 1024  # 検索結果キャッシュのおおよその上限（32MB）
+CACHE_SWEEP_INTERVAL = 300  # 期限切れエントリを削除する間隔（秒）
+CACHE_DB_PATH = os.getenv("CACHE_DB_PATH", "")  # キャッシュを永続化するSQLiteファイル（未設定の場合はメモリのみ）
 
-# レート制限設定
-RATE_LIMIT_DURATION = 30  # 30秒
+# スクレイピング設定
+USE_BULK_EXTRACTION = os.getenv("USE_BULK_EXTRACTION", "true").lower() == "true"  # 商品カードを1回のpage.evaluateで一括抽出
+ENABLE_HTTP_FETCH = os.getenv("ENABLE_HTTP_FETCH", "false").lower() == "true"  # ブラウザを使わずHTTPで一覧ページを取得（カードがなければPlaywrightで再取得）
+HTTP_FETCH_TIMEOUT = 15  # HTTP取得のタイムアウト（秒）
+HTTP_FETCH_MAX_CONNECTIONS = 8  # HTTP取得の同時接続数の上限
+
+# 一覧ページの巡回設定
+MAX_LISTING_PAGES = 5  # 件数が足りない場合に巡回する最大ページ数
+LISTING_PAGE_CONCURRENCY = 3  # 2ページ目以降を同時に取得するページ数
+
+# ページプール設定
+PAGE_POOL_MIN_SIZE = int(os.getenv("PAGE_POOL_MIN_SIZE", "1"))  # 事前に作成しておくページ数
+PAGE_POOL_MAX_SIZE = int(os.getenv("PAGE_POOL_MAX_SIZE", "4"))  # 同時に開けるタブの上限
+PAGE_POOL_MAX_USES = 20  # 1ページを作り直すまでのナビゲーション回数
+
+# リソースブロック設定（スクレイピングに不要なリクエストを中断）
+ENABLE_RESOURCE_BLOCKING = os.getenv("ENABLE_RESOURCE_BLOCKING", "true").lower() == "true"
+BLOCKED_RESOURCE_TYPES = ["image", "media", "font", "stylesheet"]
+BLOCKED_URL_PATTERNS = [
+    "google-analytics.com",
+    "googletagmanager.com",
+    "googlesyndication.com",
+    "doubleclick.net",
+    "adservice.google",
+    "facebook.net",
+    "connect.facebook",
+    "criteo",
+    "clarity.ms",
+    "hotjar",
+    "yjtag",
+    "yahoo-analytics",
+    "ad-stir",
+    "tracking"
+]
+
+# 先読み設定（よく使われる検索条件をキャッシュの期限切れ前に再取得）
+ENABLE_PREFETCH = os.getenv("ENABLE_PREFETCH", "true").lower() == "true"
+PREFETCH_TOP_K = int(os.getenv("PREFETCH_TOP_K", "5"))  # 先読みする検索条件の数（利用頻度の上位）
+PREFETCH_LEAD_TIME = 300  # 有効期限の何秒前から再取得するか
+PREFETCH_JITTER = 120  # 再取得の開始を分散させる最大遅延（秒）
+PREFETCH_CHECK_INTERVAL = 60  # 期限を確認する間隔（秒）
+PREFETCH_CONCURRENCY = 1  # 同時に先読みする検索条件の数（ブラウザの占有を抑える）
+PREFETCH_ENRICH_COUNT = 5  # 先読み時にMissAVを検索する上位商品数
+PREFETCH_USAGE_HALF_LIFE = 6 * 3600  # 利用回数を半減させる時間（秒、最近の利用を重視）
+PREFETCH_MAX_TRACKED = 200  # 利用回数を記録する検索条件の上限
+
+# シャード設定（サーバー数が多い場合にゲートウェイ接続を分割）
+ENABLE_SHARDING = os.getenv("ENABLE_SHARDING", "false").lower() == "true"  # AutoShardedBotで起動
+SHARD_COUNT = int(os.getenv("SHARD_COUNT", "0"))  # 全体のシャード数（0でDiscordの推奨数）
+SHARD_IDS = os.getenv("SHARD_IDS", "")  # このプロセスが担当するシャード（例: "0-3,8"、空で全て）
+SHARD_PROCESSES = int(os.getenv("SHARD_PROCESSES", "1"))  # 担当シャードを分割して起動するローカルプロセス数
+
+# メトリクス設定
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))  # Prometheus形式の/metricsを公開するポート（0で無効）
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")  # /metricsを公開するアドレス
+
+# ブラウザの監視（メモリ・ページ数・応答を定期的に確認し、必要に応じて起動し直す）
+ENABLE_BROWSER_WATCHDOG = os.getenv("ENABLE_BROWSER_WATCHDOG", "true").lower() == "true"
+BROWSER_WATCHDOG_INTERVAL = 60  # 計測する間隔（秒）
+BROWSER_MAX_RSS_MB = float(os.getenv("BROWSER_MAX_RSS_MB", "1024"))  # ブラウザのプロセスツリーのRSSの上限（MB、0で無効）
+BROWSER_MAX_PAGES = 32  # 開いているページ数の上限（閉じ忘れたページの検出、0で無効）
+BROWSER_RECYCLE_AFTER_SCRAPES = int(os.getenv("BROWSER_RECYCLE_AFTER_SCRAPES", "500"))  # 起動し直すまでのページ取得回数（0で無効）
+BROWSER_PROBE_TIMEOUT = 10  # 応答確認のページ遷移のタイムアウト（秒）
+BROWSER_DRAIN_TIMEOUT = 60  # 起動し直す前に実行中のページの完了を待つ最大秒数
+BROWSER_CLOSE_TIMEOUT = 10  # ブラウザを閉じる処理のタイムアウト（超えた場合はプロセスを強制終了）
+REAP_ORPHANED_BROWSERS = os.getenv("REAP_ORPHANED_BROWSERS", "true").lower() == "true"  # 起動時に前回のプロセスが残したブラウザを終了
+BROWSER_PID_DIR = os.getenv("BROWSER_PID_DIR", "")  # 起動したブラウザのPIDを記録するディレクトリ（空の場合は一時ディレクトリ、終了させる対象の判定に使用）
+
+# スクレイピングの受付制御（Bot全体の同時実行数とサーバー間で公平な待ち行列）
+SCRAPE_MAX_CONCURRENT = int(os.getenv("SCRAPE_MAX_CONCURRENT", "4"))  # 同時に実行するスクレイピング数（FANZA・MissAV合計）
+SCRAPE_MAX_QUEUE = int(os.getenv("SCRAPE_MAX_QUEUE", "50"))  # 待ち行列の上限（超えた要求は混雑として断る）
+SCRAPE_QUEUE_TIMEOUT = 120  # 待ち行列で待つ最大秒数
+
+# スクレイピングの別プロセス化（ブラウザ・HTML解析をBotのイベントループから切り離す）
+SCRAPER_WORKER = os.getenv("SCRAPER_WORKER", "false").lower() == "true"  # スクレイパーをワーカープロセスで実行し、Unixソケット経由で呼び出す
+SCRAPER_WORKERS = int(os.getenv("SCRAPER_WORKERS", "1"))  # 起動するワーカー数（検索条件・タイトルごとにコンシステントハッシュで振り分け）
+SCRAPER_WORKER_SOCKET = os.getenv("SCRAPER_WORKER_SOCKET", "")  # ワーカーのソケットのパス（カンマ区切りでワーカーごと、空の場合は一時ディレクトリに作成）
+SCRAPER_WORKER_SPAWN = os.getenv("SCRAPER_WORKER_SPAWN", "true").lower() == "true"  # Botがワーカーを起動する（falseの場合はSCRAPER_WORKER_SOCKETの各ワーカーに接続）
+SCRAPER_WORKER_METRICS_PORT = int(os.getenv("SCRAPER_WORKER_METRICS_PORT", "0"))  # ワーカーの/metricsを公開するポート（ワーカーごとに連番、0で無効）
+WORKER_REQUEST_TIMEOUT = 180  # 応答・途中経過が届かない場合に失敗とみなす秒数（待ち行列の待ち時間を含む）
+WORKER_START_TIMEOUT = 30  # ワーカーの起動・接続を待つ最大秒数
+WORKER_HEALTH_INTERVAL = 30  # ワーカーの状態を確認する間隔（秒）
+WORKER_HEALTH_TIMEOUT = 10  # 状態確認の応答を待つ最大秒数
+WORKER_MAX_TIMEOUTS = 3  # 連続してタイムアウトした場合にワーカーを起動し直す回数
+WORKER_RESTART_BACKOFF = 5  # ワーカーの起動に失敗した場合に次に試すまでの秒数（失敗が続くと最大60秒まで倍増）
+WORKER_MESSAGE_LIMIT = 16 * 1024 * 1024  # 1メッセージ（1行のJSON）の最大バイト数
+WORKER_VIRTUAL_NODES = 100  # ハッシュリング上の1ワーカーあたりの仮想ノード数（多いほど担当の偏りが小さい）
+WORKER_DRAIN_TIMEOUT = 60  # ワーカーを減らす際に実行中の要求の完了を待つ最大秒数
+
+# トレース設定
+SLOW_COMMAND_THRESHOLD = float(os.getenv("SLOW_COMMAND_THRESHOLD", "10"))  # 段階別の内訳をログに出力するコマンド処理時間（秒）
+
+# レート制限設定（トークンバケット: 容量までは連続して実行でき、1秒あたりの補充量で回復する）
+RATE_LIMIT_COST_CACHED = 1  # キャッシュから返せる要求のコスト
+RATE_LIMIT_COST_SCRAPE = 6  # スクレイピングが必要な要求のコスト
+RATE_LIMIT_USER_CAPACITY = float(os.getenv("RATE_LIMIT_USER_CAPACITY", "12"))  # ユーザーごと（新規取得2回分）
+RATE_LIMIT_USER_REFILL = float(os.getenv("RATE_LIMIT_USER_REFILL", "0.2"))  # 新規取得は30秒に1回相当
+RATE_LIMIT_GUILD_CAPACITY = float(os.getenv("RATE_LIMIT_GUILD_CAPACITY", "36"))  # サーバーごと
+RATE_LIMIT_GUILD_REFILL = float(os.getenv("RATE_LIMIT_GUILD_REFILL", "0.5"))
+RATE_LIMIT_GLOBAL_CAPACITY = float(os.getenv("RATE_LIMIT_GLOBAL_CAPACITY", "120"))  # Bot全体
+RATE_LIMIT_GLOBAL_REFILL = float(os.getenv("RATE_LIMIT_GLOBAL_REFILL", "2"))
+RATE_LIMIT_IDLE_TTL = 600  # この秒数使われず満杯に戻ったバケットを削除
+RATE_LIMIT_MAX_BUCKETS = 10000  # ユーザー・サーバーそれぞれで保持するバケット数の上限
 DISABLE_RATE_LIMIT = os.getenv("DISABLE_RATE_LIMIT", "false").lower() == "true"  # 開発環境でのレート制限無効化
 
 # ユーザーエージェント
@@ -151,7 +219,7 @@ USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTM
 
 # ログ設定
 LOG_LEVEL = "INFO"
-LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - [%(trace_id)s] %(message)s"  # trace_idはコマンドの相関ID（tracing.install_log_record_factoryで全てのログレコードに付与）
 
 # Bot バージョン
 BOT_VERSION = "2.2.0"
\ No newline at end of file
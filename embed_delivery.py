@@ -0,0 +1,89 @@
+"""
+Embedの一括送信
+Discordの上限（1メッセージ10件・合計6000文字）の範囲で複数のEmbedを1メッセージにまとめて送信し、
+送信後に個別のEmbedを差し替えられるよう、Embedとメッセージの対応を保持する
+"""
+
+import logging
+from typing import Awaitable, Callable, Dict, List, Optional
+import discord
+import metrics
+import tracing
+
+logger = logging.getLogger(__name__)
+
+MAX_EMBEDS_PER_MESSAGE = 10
+MAX_EMBED_CHARS_PER_MESSAGE = 6000
+
+
+def pack_embeds(embeds: List[discord.Embed], headroom: int = 0) -> List[List[int]]:
+    """上限内に収まるようEmbedをメッセージ単位に分割し、各メッセージのEmbed番号を返す
+
+    Args:
+        embeds: 送信するEmbed
+        headroom: 送信後の差し替えで増える可能性のある1件あたりの文字数
+    """
+    batches: List[List[int]] = []
+    current: List[int] = []
+    current_chars = 0
+    for index, embed in enumerate(embeds):
+        chars = len(embed) + headroom
+        if current and (len(current) >= MAX_EMBEDS_PER_MESSAGE or current_chars + chars > MAX_EMBED_CHARS_PER_MESSAGE):
+            batches.append(current)
+            current, current_chars = [], 0
+        current.append(index)
+        current_chars += chars
+    if current:
+        batches.append(current)
+    return batches
+
+
+class EmbedDelivery:
+    """Embedをまとめて送信し、送信済みのEmbedを後から差し替える"""
+
+    def __init__(self, send: Callable[..., Awaitable[Optional[discord.Message]]], headroom: int = 0):
+        """
+        Args:
+            send: embeds引数を受け取り送信したメッセージを返すコルーチン関数
+                  （followupの場合はwait=Trueを指定したもの）
+            headroom: 差し替え用に1件あたり確保しておく文字数
+        """
+        self._send = send
+        self.headroom = headroom
+        self.embeds: List[discord.Embed] = []
+        self.messages: List[Optional[discord.Message]] = []
+        self._batches: List[List[int]] = []
+        self._batch_of: List[int] = []  # Embed番号 -> メッセージ番号
+
+    async def send(self, embeds: List[discord.Embed]):
+        """Embedをまとめて送信"""
+        for batch in pack_embeds(embeds, self.headroom):
+            offset = len(self.embeds)
+            self.embeds.extend(embeds[i] for i in batch)
+            self._batch_of.extend([len(self._batches)] * len(batch))
+            self._batches.append([offset + n for n in range(len(batch))])
+            with metrics.DISCORD_SEND_DURATION.time(operation="send"), tracing.span("discord_send", embeds=len(batch)):
+                message = await self._send(embeds=[embeds[i] for i in batch])
+            self.messages.append(message)
+
+    async def replace(self, replacements: Dict[int, discord.Embed]):
+        """送信済みのEmbedをまとめて差し替え、差し替えたEmbedを含むメッセージを1回ずつ再描画
+
+        Args:
+            replacements: Embed番号 -> 差し替えるEmbed
+        """
+        for index, embed in replacements.items():
+            self.embeds[index] = embed
+        for batch_index in sorted({self._batch_of[index] for index in replacements}):
+            message = self.messages[batch_index]
+            if message is None:
+                continue
+            batch_embeds = [self.embeds[i] for i in self._batches[batch_index]]
+            if sum(len(e) for e in batch_embeds) > MAX_EMBED_CHARS_PER_MESSAGE:
+                logger.warning("Skipped embed update exceeding the per-message character limit")
+                continue
+            try:
+                with metrics.DISCORD_SEND_DURATION.time(operation="edit"), tracing.span("discord_edit"):
+                    await message.edit(embeds=batch_embeds)
+            except discord.HTTPException as e:
+                logger.warning(f"Failed to update embed message: {e}")
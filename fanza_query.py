@@ -0,0 +1,85 @@
+"""
+FANZA検索条件の値オブジェクト
+入力値を整え、検索URLと安定したキャッシュキーを生成する
+"""
+
+import hashlib
+import unicodedata
+from dataclasses import dataclass
+from functools import cached_property
+from typing import Optional
+from urllib.parse import quote
+from config import FANZA_BASE_URL, FANZA_SORT, SALE_TYPES, SORT_OPTIONS, RELEASE_OPTIONS
+
+
+def encode_term(value: str) -> str:
+    """URLに含める値を符号化（キーワード・セールキーなど全ての値で共通、区切りの'|'・'+'は含めない）"""
+    return quote(value, safe='')
+
+
+def trim_keyword(keyword: Optional[str]) -> Optional[str]:
+    """キーワードの前後の空白を除き、連続する空白を1つにまとめる（検索URLには入力どおりの表記を使う）"""
+    if not keyword:
+        return None
+    return ' '.join(keyword.split()) or None
+
+
+def normalize_keyword(keyword: Optional[str]) -> Optional[str]:
+    """キーワードを正規化（全角英数・全角空白の統一、空白の圧縮、小文字化）"""
+    if not keyword:
+        return None
+    keyword = ' '.join(unicodedata.normalize('NFKC', keyword).split()).lower()
+    return keyword or None
+
+
+@dataclass(frozen=True)
+class FanzaQuery:
+    """FANZA検索条件（ハッシュ可能、表記ゆれを吸収したキャッシュキーはcache_keyで取得）"""
+    sale_type: str = "none"
+    media_type: Optional[str] = None  # None（全て）/ "2d" / "vr"
+    sort_type: str = FANZA_SORT
+    keyword: Optional[str] = None
+    release_filter: Optional[str] = None  # None（全期間）/ "latest" / "recent"
+
+    def __post_init__(self):
+        # 未知の値はデフォルトに寄せ、同じ意味の条件が同じオブジェクトになるようにする
+        object.__setattr__(self, 'sale_type', self.sale_type if self.sale_type in SALE_TYPES else "none")
+        object.__setattr__(self, 'media_type', self.media_type if self.media_type in ("2d", "vr") else None)
+        object.__setattr__(self, 'sort_type', self.sort_type if self.sort_type in SORT_OPTIONS else FANZA_SORT)
+        # キーワードはFANZAの検索に入力どおり渡し、正規化はキャッシュキーにのみ使う
+        object.__setattr__(self, 'keyword', trim_keyword(self.keyword))
+        release_value = RELEASE_OPTIONS.get(self.release_filter, {}).get("value") if self.release_filter else None
+        object.__setattr__(self, 'release_filter', release_value)
+
+    @cached_property
+    def url(self) -> str:
+        """検索URL"""
+        url = f"{FANZA_BASE_URL}?sort={encode_term(SORT_OPTIONS[self.sort_type]['value'])}"
+
+        # キーワードまたはセールキーが存在する場合のみkeyパラメータを追加（'+'で条件を並べ、'|'でセールキーのいずれか）
+        key_parts = []
+        if self.keyword:
+            key_parts.append(encode_term(self.keyword))
+        sale_keys = SALE_TYPES[self.sale_type]["keys"]
+        if sale_keys:
+            key_parts.append('|'.join(encode_term(key) for key in sale_keys))
+        if key_parts:
+            url += f"&key={'+'.join(key_parts)}"
+
+        if self.media_type:
+            url += f"&media_type={encode_term(self.media_type)}"
+        if self.release_filter:
+            url += f"&release={encode_term(self.release_filter)}"
+        return url
+
+    @cached_property
+    def cache_key(self) -> str:
+        """正規化済みの条件から生成する安定したキャッシュキー（キーワードの全角・半角、大文字・小文字の違いは同じキー）"""
+        canonical = '|'.join([
+            self.sale_type,
+            self.media_type or '',
+            self.sort_type,
+            normalize_keyword(self.keyword) or '',
+            self.release_filter or ''
+        ])
+        return hashlib.md5(canonical.encode('utf-8')).hexdigest()
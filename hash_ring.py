@@ -0,0 +1,86 @@
+"""
+コンシステントハッシュ
+キーを仮想ノード付きのハッシュリングでノードに割り当てる
+ノードを追加・削除しても担当が変わるキーはおおよそ1/ノード数に抑えられる（ノードごとのキャッシュを使い続けられる）
+"""
+
+import bisect
+import hashlib
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+
+def _hash(value: str) -> int:
+    """プロセスをまたいで安定したハッシュ値（組み込みのhashは起動ごとに変わるため使わない）"""
+    return int.from_bytes(hashlib.md5(value.encode('utf-8')).digest()[:8], 'big')
+
+
+class HashRing:
+    """仮想ノード付きのハッシュリング"""
+
+    def __init__(self, nodes: Iterable[str] = (), virtual_nodes: int = 100):
+        """
+        Args:
+            nodes: 初期のノード名
+            virtual_nodes: 1ノードあたりのリング上の点の数（多いほど担当の偏りが小さい）
+        """
+        self.virtual_nodes = virtual_nodes
+        self._ring: List[Tuple[int, str]] = []
+        self._nodes: Set[str] = set()
+        for node in nodes:
+            self.add(node)
+
+    @property
+    def nodes(self) -> List[str]:
+        return sorted(self._nodes)
+
+    def __len__(self) -> int:
+        return len(self._nodes)
+
+    def __contains__(self, node: str) -> bool:
+        return node in self._nodes
+
+    def add(self, node: str):
+        """ノードを追加"""
+        if node in self._nodes:
+            return
+        self._nodes.add(node)
+        for index in range(self.virtual_nodes):
+            bisect.insort(self._ring, (_hash(f"{node}#{index}"), node))
+
+    def remove(self, node: str):
+        """ノードを削除（担当していたキーはリング上の次のノードに移る）"""
+        if node not in self._nodes:
+            return
+        self._nodes.discard(node)
+        self._ring = [point for point in self._ring if point[1] != node]
+
+    def get(self, key: str) -> Optional[str]:
+        """キーを担当するノード（ノードがない場合はNone）"""
+        return next(self.iter_nodes(key), None)
+
+    def iter_nodes(self, key: str) -> Iterator[str]:
+        """キーを担当するノードから順に、リング上の異なるノードを返す（担当ノードが使えない場合の代わり）"""
+        if not self._ring:
+            return
+        start = bisect.bisect(self._ring, (_hash(key),))
+        seen: Set[str] = set()
+        for offset in range(len(self._ring)):
+            node = self._ring[(start + offset) % len(self._ring)][1]
+            if node not in seen:
+                seen.add(node)
+                yield node
+                if len(seen) == len(self._nodes):
+                    return
+
+    def shares(self) -> Dict[str, float]:
+        """ノードごとの担当するハッシュ空間の割合"""
+        shares = {node: 0.0 for node in self._nodes}
+        if not self._ring:
+            return shares
+        space = 1 << 64
+        previous = self._ring[-1][0] - space
+        for point, node in self._ring:
+            # 前の点の直後からこの点までがこのノードの担当
+            shares[node] += (point - previous) / space
+            previous = point
+        return shares
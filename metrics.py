@@ -0,0 +1,339 @@
+"""
+Botの計測値（カウンター・ゲージ・ヒストグラム）
+Prometheusのテキスト形式で出力し、必要に応じてローカルのHTTPエンドポイントで公開する
+キャッシュとブラウザの状態は登録したオブジェクトから出力時に読み取る
+"""
+
+import logging
+import time
+import weakref
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from config import METRICS_HOST, METRICS_PORT
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0)
+
+LabelKey = Tuple[str, ...]
+Sample = Tuple[str, Dict[str, str], float]  # (メトリクス名, ラベル, 値)
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_sample(name: str, labels: Dict[str, str], value: float) -> str:
+    if labels:
+        label_text = ','.join(f'{key}="{_escape(str(val))}"' for key, val in labels.items())
+        name = f"{name}{{{label_text}}}"
+    if value == float('inf'):
+        return f"{name} +Inf"
+    return f"{name} {value}"
+
+
+class Metric(ABC):
+    """ラベル付きメトリクスの基底クラス"""
+    metric_type = "untyped"
+
+    def __init__(self, name: str, help_text: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+
+    def _key(self, labels: Dict[str, Any]) -> LabelKey:
+        unknown = set(labels) - set(self.labelnames)
+        if unknown:
+            raise ValueError(f"Unknown labels for {self.name}: {sorted(unknown)}")
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def _labels(self, key: LabelKey) -> Dict[str, str]:
+        return dict(zip(self.labelnames, key))
+
+    def _matches(self, key: LabelKey, labels: Dict[str, Any]) -> bool:
+        """指定したラベルだけで絞り込む（省略したラベルは全ての値を対象とする）"""
+        return all(key[self.labelnames.index(name)] == str(value) for name, value in labels.items())
+
+    @abstractmethod
+    def samples(self) -> List[Sample]:
+        """出力するサンプルの一覧"""
+
+
+class Counter(Metric):
+    """増加のみの値"""
+    metric_type = "counter"
+
+    def __init__(self, name: str, help_text: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, help_text, labelnames)
+        self._values: Dict[LabelKey, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        """指定したラベルに一致する値の合計"""
+        return sum(v for key, v in self._values.items() if self._matches(key, labels))
+
+    def samples(self) -> List[Sample]:
+        return [(self.name, self._labels(key), value) for key, value in self._values.items()]
+
+
+class Gauge(Metric):
+    """増減する値"""
+    metric_type = "gauge"
+
+    def __init__(self, name: str, help_text: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, help_text, labelnames)
+        self._values: Dict[LabelKey, float] = {}
+
+    def set(self, value: float, **labels):
+        self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def value(self, **labels) -> float:
+        """指定したラベルに一致する値の合計"""
+        return sum(v for key, v in self._values.items() if self._matches(key, labels))
+
+    def samples(self) -> List[Sample]:
+        return [(self.name, self._labels(key), value) for key, value in self._values.items()]
+
+
+class Histogram(Metric):
+    """値の分布（累積バケット・合計・件数）"""
+    metric_type = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames: Iterable[str] = (), buckets: Iterable[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._counts: Dict[LabelKey, List[int]] = {}  # バケットごとの件数（非累積、末尾は+Inf）
+        self._sums: Dict[LabelKey, float] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        counts = self._counts.setdefault(key, [0] * (len(self.buckets) + 1))
+        index = next((i for i, bound in enumerate(self.buckets) if value <= bound), len(self.buckets))
+        counts[index] += 1
+        self._sums[key] = self._sums.get(key, 0.0) + value
+
+    @contextmanager
+    def time(self, **labels) -> Iterator[None]:
+        """ブロックの処理時間（秒）を記録"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def summary(self, **labels) -> Dict[str, float]:
+        """指定したラベルに一致する系列をまとめた件数・平均・推定パーセンタイル"""
+        merged = [0] * (len(self.buckets) + 1)
+        total = 0.0
+        for key, counts in self._counts.items():
+            if self._matches(key, labels):
+                merged = [a + b for a, b in zip(merged, counts)]
+                total += self._sums[key]
+        count = sum(merged)
+        return {
+            'count': count,
+            'sum': total,
+            'avg': total / count if count else 0.0,
+            'p50': self._quantile(merged, count, 0.5),
+            'p95': self._quantile(merged, count, 0.95)
+        }
+
+    def _quantile(self, counts: List[int], count: int, q: float) -> float:
+        """バケットの上限値からパーセンタイルを推定"""
+        if not count:
+            return 0.0
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets, counts):
+            cumulative += bucket_count
+            if cumulative >= q * count:
+                return bound
+        return float('inf')
+
+    def samples(self) -> List[Sample]:
+        samples = []
+        for key, counts in self._counts.items():
+            labels = self._labels(key)
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                samples.append((f"{self.name}_bucket", {**labels, 'le': f"{bound:g}"}, cumulative))
+            samples.append((f"{self.name}_bucket", {**labels, 'le': "+Inf"}, cumulative + counts[-1]))
+            samples.append((f"{self.name}_sum", labels, self._sums[key]))
+            samples.append((f"{self.name}_count", labels, cumulative + counts[-1]))
+        return samples
+
+
+class CallbackMetric(Metric):
+    """出力時に関数から値を読み取るメトリクス（既存の統計をそのまま公開する）"""
+
+    def __init__(self, name: str, help_text: str, metric_type: str, collect: Callable[[], Iterable[Tuple[Dict[str, str], float]]]):
+        super().__init__(name, help_text)
+        self.metric_type = metric_type
+        self._collect = collect
+
+    def samples(self) -> List[Sample]:
+        try:
+            return [(self.name, labels, value) for labels, value in self._collect()]
+        except Exception as e:
+            logger.error(f"Failed to collect metric {self.name}: {e}")
+            return []
+
+
+class MetricsRegistry:
+    """メトリクスの登録とテキスト形式での出力"""
+
+    def __init__(self):
+        self._metrics: List[Metric] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, help_text: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self.register(Counter(name, help_text, labelnames))
+
+    def gauge(self, name: str, help_text: str, labelnames: Iterable[str] = ()) -> Gauge:
+        return self.register(Gauge(name, help_text, labelnames))
+
+    def histogram(self, name: str, help_text: str, labelnames: Iterable[str] = (), buckets: Iterable[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help_text, labelnames, buckets))
+
+    def callback(self, name: str, help_text: str, metric_type: str, collect: Callable[[], Iterable[Tuple[Dict[str, str], float]]]) -> CallbackMetric:
+        return self.register(CallbackMetric(name, help_text, metric_type, collect))
+
+    def render(self) -> str:
+        """Prometheusのテキスト形式で出力"""
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help_text}")
+            lines.append(f"# TYPE {metric.name} {metric.metric_type}")
+            lines.extend(_format_sample(name, labels, value) for name, labels, value in metric.samples())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = MetricsRegistry()
+
+# 監視対象（出力時に統計を読み取る。破棄されたオブジェクトは自動的に対象外）
+_caches: "weakref.WeakSet" = weakref.WeakSet()
+_browser_sources: "weakref.WeakValueDictionary[str, Any]" = weakref.WeakValueDictionary()
+
+
+def register_cache(cache):
+    """TTLCacheを監視対象に追加（ラベルはキャッシュ名）"""
+    _caches.add(cache)
+
+
+def register_browser_source(name: str, source):
+    """get_browser_stats()を持つスクレイパーを監視対象に追加"""
+    _browser_sources[name] = source
+
+
+def _collect_cache(stat: str) -> Callable[[], Iterable[Tuple[Dict[str, str], float]]]:
+    def collect():
+        return [({'cache': cache.name}, cache.get_stats()[stat]) for cache in list(_caches)]
+    return collect
+
+
+def _collect_cache_events():
+    samples = []
+    for cache in list(_caches):
+        stats = cache.get_stats()
+        for event, stat in (('hit', 'hits'), ('stale_hit', 'stale_hits'), ('miss', 'misses'), ('eviction', 'evictions'), ('expiration', 'expirations'), ('store_hit', 'store_hits')):
+            samples.append(({'cache': cache.name, 'event': event}, stats[stat]))
+    return samples
+
+
+def _collect_browser(stat: str) -> Callable[[], Iterable[Tuple[Dict[str, str], float]]]:
+    def collect():
+        return [({'scraper': name}, source.get_browser_stats().get(stat, 0)) for name, source in list(_browser_sources.items())]
+    return collect
+
+
+def cache_hit_rate(cache_name: str) -> Optional[float]:
+    """キャッシュのヒット率（期限切れデータの返却を含む、参照がない場合はNone）"""
+    for cache in list(_caches):
+        if cache.name == cache_name:
+            stats = cache.get_stats()
+            lookups = stats['hits'] + stats['stale_hits'] + stats['misses']
+            return (stats['hits'] + stats['stale_hits']) / lookups if lookups else None
+    return None
+
+
+def cache_stats() -> Dict[str, Dict[str, Any]]:
+    """キャッシュ名別の統計"""
+    return {cache.name: cache.get_stats() for cache in list(_caches)}
+
+
+def browser_stats() -> Dict[str, Dict[str, int]]:
+    """スクレイパー別のブラウザ・ページ数"""
+    return {name: source.get_browser_stats() for name, source in list(_browser_sources.items())}
+
+
+# スクレイピング
+SCRAPE_DURATION = REGISTRY.histogram("fanza_bot_scrape_duration_seconds", "Scrape latency per source", ["source"])
+SCRAPE_ERRORS = REGISTRY.counter("fanza_bot_scrape_errors_total", "Failed scrapes per source", ["source"])
+LISTING_PAGE_DURATION = REGISTRY.histogram("fanza_bot_listing_page_duration_seconds", "FANZA listing page fetch latency per method", ["method"])
+MISSAV_ENRICH_DURATION = REGISTRY.histogram("fanza_bot_missav_enrich_duration_seconds", "MissAV URL lookup latency for a FANZA product", ["result"])
+
+# コマンド・Discord API
+COMMAND_DURATION = REGISTRY.histogram("fanza_bot_command_duration_seconds", "Command latency per command and mode", ["command", "mode"])
+DISCORD_SEND_DURATION = REGISTRY.histogram("fanza_bot_discord_send_duration_seconds", "Discord message send/edit latency", ["operation"], buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0))
+ADMISSION_WAIT = REGISTRY.histogram("fanza_bot_admission_wait_seconds", "Time spent waiting for a scrape admission slot per scrape kind", ["kind"], buckets=(0.0, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0))
+ADMISSION_REJECTED = REGISTRY.counter("fanza_bot_admission_rejected_total", "Scrapes rejected by the admission queue per reason", ["reason"])
+SHARD_EVENTS = REGISTRY.counter("fanza_bot_shard_events_total", "Gateway shard lifecycle events per shard", ["shard", "event"])
+RATE_LIMITED = REGISTRY.counter("fanza_bot_rate_limited_total", "Commands rejected by the rate limiter per bucket scope", ["scope"])
+BROWSER_RSS = REGISTRY.gauge("fanza_bot_browser_rss_bytes", "Resident memory of the Playwright driver and browser process tree per scraper", ["source"])
+BROWSER_PROBE_DURATION = REGISTRY.histogram("fanza_bot_browser_probe_duration_seconds", "Time to open a page and navigate to a blank document per scraper", ["source"], buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0))
+BROWSER_RECYCLES = REGISTRY.counter("fanza_bot_browser_recycles_total", "Browser relaunches triggered by the watchdog per scraper and reason", ["source", "reason"])
+
+# キャッシュ
+REGISTRY.callback("fanza_bot_cache_events_total", "Cache lookups and removals per cache", "counter", _collect_cache_events)
+REGISTRY.callback("fanza_bot_cache_entries", "Cached entries per cache", "gauge", _collect_cache('entries'))
+REGISTRY.callback("fanza_bot_cache_bytes", "Approximate cache size in bytes per cache", "gauge", _collect_cache('bytes'))
+
+# ブラウザ
+REGISTRY.callback("fanza_bot_browsers", "Connected browser instances per scraper", "gauge", _collect_browser('browsers'))
+REGISTRY.callback("fanza_bot_browser_pages", "Open browser pages per scraper", "gauge", _collect_browser('pages'))
+REGISTRY.callback("fanza_bot_page_pool_in_use", "Pooled pages currently checked out", "gauge", _collect_browser('pool_in_use'))
+REGISTRY.callback("fanza_bot_page_pool_waiters", "Tasks waiting for a pooled page", "gauge", _collect_browser('pool_waiters'))
+
+
+_server_runner = None
+
+
+async def start_metrics_server(host: str = METRICS_HOST, port: int = METRICS_PORT):
+    """/metricsを返すHTTPサーバーを起動（portが0の場合は起動しない）"""
+    global _server_runner
+    if not port or _server_runner is not None:
+        return
+    from aiohttp import web
+
+    async def handle_metrics(request: web.Request) -> web.Response:
+        return web.Response(text=REGISTRY.render(), content_type='text/plain', charset='utf-8')
+
+    app = web.Application()
+    app.router.add_get('/metrics', handle_metrics)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    _server_runner = runner
+    logger.info(f"Metrics endpoint listening on http://{host}:{port}/metrics")
+
+
+async def stop_metrics_server():
+    """メトリクスのHTTPサーバーを停止"""
+    global _server_runner
+    if _server_runner is not None:
+        await _server_runner.cleanup()
+        _server_runner = None
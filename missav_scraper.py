@@ -4,24 +4,192 @@ MissAV検索・スクレイピングモジュール
 """
 
 import asyncio
-from playwright.async_api import async_playwright
-from datetime import datetime, timedelta
+from contextlib import asynccontextmanager
+from playwright.async_api import async_playwright, Browser, BrowserContext
 import logging
 import re
-from typing import List, Dict, Optional
+import metrics
+from admission import scrape_admission
+from browser_watchdog import (
+    close_browser, forget_browser_processes, playwright_driver_pid, record_browser_processes, wait_until_drained
+)
+from typing import AsyncIterator, List, Dict, Optional, Tuple
 from urllib.parse import quote
+from resource_blocker import ResourceBlocker
+from single_flight import SingleFlight
+from ttl_cache import TTLCache
+from cache_store import get_default_store
 
 logger = logging.getLogger(__name__)
 
 USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36"
 MISSAV_BASE_URL = "https://missav123.com"
 CACHE_DURATION = 1800  # 30分キャッシュ
+CACHE_MAX_ENTRIES = 2000  # 検索キャッシュの最大件数
+CACHE_MAX_BYTES = 16 * 1024 * 1024  # 検索キャッシュのおおよその上限（16MB）
+CONTENT_ID_MAP_DURATION = 7 * 24 * 3600  # FANZA品番→MissAV URL対応の保持期間（7日）
+CONTENT_ID_NEGATIVE_DURATION = 6 * 3600  # 「見つからなかった」記録の保持期間（6時間）
+CONTENT_ID_MAP_MAX_ENTRIES = 20000  # 品番対応の最大件数
+CONTENT_ID_MAP_MAX_BYTES = 8 * 1024 * 1024  # 品番対応のおおよその上限（8MB）
+MAX_CONCURRENT_PAGES = 4  # 同時に開くページ数の上限
+
+
+def normalize_title(title: str) -> str:
+    """キャッシュ・集約キー用にタイトルを正規化（空白の圧縮、小文字化）"""
+    return ' '.join(title.split()).lower()
 
 
 class MissAVScraper:
     def __init__(self):
-        self.cache = {}
-        self.cache_timestamp = {}
+        self.cache = TTLCache(
+            ttl=CACHE_DURATION,
+            max_entries=CACHE_MAX_ENTRIES,
+            max_bytes=CACHE_MAX_BYTES,
+            name="missav",
+            store=get_default_store()
+        )
+        # FANZA品番（cid）→MissAV URLの対応（見つからなかった品番は空文字で記録）
+        self.content_id_map = TTLCache(
+            ttl=CONTENT_ID_MAP_DURATION,
+            max_entries=CONTENT_ID_MAP_MAX_ENTRIES,
+            max_bytes=CONTENT_ID_MAP_MAX_BYTES,
+            name="missav_cid",
+            store=get_default_store()
+        )
+        self.resource_blocker = ResourceBlocker()
+        self._inflight = SingleFlight()  # 同一タイトルの検索を集約
+        self._browser: Optional[Browser] = None
+        self._context: Optional[BrowserContext] = None
+        self._playwright = None
+        self._launch_lock = asyncio.Lock()
+        self._page_semaphore = asyncio.Semaphore(MAX_CONCURRENT_PAGES)
+        # ブラウザの再起動（再起動中は新しいページを開かず、開いているページの完了を待つ）
+        self._recycle_lock = asyncio.Lock()
+        self._recycle_gate = asyncio.Event()
+        self._recycle_gate.set()
+        self._pages_in_use = 0
+        self.scrapes_since_launch = 0  # 現在のブラウザでページを開いた回数
+        self.recycle_count = 0
+        metrics.register_cache(self.cache)
+        metrics.register_cache(self.content_id_map)
+        metrics.register_browser_source("missav", self)
+
+    async def _get_browser(self) -> Browser:
+        """ブラウザインスタンスを取得（再利用）"""
+        if self._browser is None or not self._browser.is_connected():
+            if self._playwright is None:
+                self._playwright = await async_playwright().start()
+            self._browser = await self._playwright.chromium.launch(
+                headless=True,
+                args=['--no-sandbox', '--disable-dev-shm-usage']
+            )
+            # 後片付けをせずに終了した場合に次の起動時に終了させられるよう記録
+            record_browser_processes("missav", self.browser_driver_pid())
+            self.scrapes_since_launch = 0
+        return self._browser
+
+    @asynccontextmanager
+    async def _page_slot(self) -> AsyncIterator[None]:
+        """ページを開く枠を確保（ブラウザの再起動中は完了を待つ）"""
+        async with self._page_semaphore:
+            await self._recycle_gate.wait()
+            self._pages_in_use += 1
+            self.scrapes_since_launch += 1
+            try:
+                yield
+            finally:
+                self._pages_in_use -= 1
+
+    async def _get_context(self) -> BrowserContext:
+        """ブラウザコンテキストを取得（再利用）"""
+        # 並列検索で複数のブラウザが起動しないようロックする
+        async with self._launch_lock:
+            if self._context is None or self._context.browser != await self._get_browser():
+                browser = await self._get_browser()
+                self._context = await browser.new_context(
+                    user_agent=USER_AGENT,
+                    viewport={'width': 1920, 'height': 1080}
+                )
+                await self.resource_blocker.install(self._context)
+            return self._context
+
+    def get_cache_stats(self) -> Dict[str, any]:
+        """キャッシュの統計を取得"""
+        return self.cache.get_stats()
+
+    def get_browser_stats(self) -> Dict[str, int]:
+        """起動中のブラウザ・開いているページ数"""
+        connected = self._browser is not None and self._browser.is_connected()
+        return {
+            'browsers': 1 if connected else 0,
+            'pages': len(self._context.pages) if connected and self._context else 0
+        }
+
+    def browser_driver_pid(self) -> Optional[int]:
+        """ブラウザを起動したPlaywrightドライバーのPID（監視用）"""
+        return playwright_driver_pid(self._playwright) if self._playwright else None
+
+    def active_context(self) -> Optional[BrowserContext]:
+        """起動中のブラウザのコンテキスト（未起動・切断時はNone）"""
+        if self._browser is None or not self._browser.is_connected():
+            return None
+        return self._context
+
+    async def recycle_browser(self, reason: str) -> bool:
+        """開いているページの完了を待ってからブラウザを閉じる（次の検索時に起動し直す）"""
+        if self._browser is None or self._recycle_lock.locked():
+            return False
+        async with self._recycle_lock:
+            logger.info(f"Recycling MissAV browser ({reason}) after {self.scrapes_since_launch} pages")
+            self._recycle_gate.clear()
+            try:
+                if not await wait_until_drained(lambda: self._pages_in_use):
+                    logger.warning("Timed out waiting for in-flight MissAV pages; recycling anyway")
+                await self._close_browser()
+            finally:
+                self._recycle_gate.set()
+            self.recycle_count += 1
+            return True
+
+    async def _close_browser(self):
+        """コンテキスト・ブラウザを閉じる（Playwrightドライバーは残す）"""
+        if self._context:
+            try:
+                await self._context.close()
+            except Exception as e:
+                logger.debug(f"Failed to close browser context: {e}")
+            self._context = None
+        if self._browser:
+            await close_browser(self._browser, self.browser_driver_pid())
+            self._browser = None
+
+    async def lookup_content_id(self, content_id: str) -> Tuple[bool, Optional[str]]:
+        """FANZA品番に対応するMissAV URLを参照
+
+        Returns:
+            (記録があるか, MissAV URL) のタプル。見つからなかったと記録済みの場合は (True, None)
+        """
+        missav_url = await self.content_id_map.load(content_id)
+        if missav_url is None:
+            return False, None
+        return True, missav_url or None
+
+    async def remember_content_id(self, content_id: str, missav_url: Optional[str]):
+        """FANZA品番とMissAV URLの対応を記録（Noneの場合は「見つからなかった」として短期間記録）"""
+        if missav_url:
+            await self.content_id_map.save(content_id, missav_url)
+        else:
+            await self.content_id_map.save(content_id, "", ttl=CONTENT_ID_NEGATIVE_DURATION)
+
+    async def close(self):
+        """リソースをクリーンアップ"""
+        self.cache.close()
+        self.content_id_map.close()
+        await self._close_browser()
+        if self._playwright:
+            await self._playwright.stop()
+            self._playwright = None
+        forget_browser_processes("missav")
 
     async def search_videos(self, title: str, force_refresh: bool = False) -> List[Dict[str, any]]:
         """タイトルで動画を検索
@@ -30,90 +198,108 @@ class MissAVScraper:
             title: 検索するタイトル
             force_refresh: Trueの場合、キャッシュを無視して新規検索
         """
-        # キャッシュチェック
-        cache_key = f"search_{title.lower()}"
+        # キャッシュチェック（空白と大文字小文字を正規化したタイトルをキーにする）
+        cache_key = self._search_cache_key(title)
         
         # force_refreshがFalseの場合のみキャッシュをチェック
         if not force_refresh:
-            if cache_key in self.cache_timestamp:
-                if datetime.now() - self.cache_timestamp[cache_key] < timedelta(seconds=CACHE_DURATION):
-                    logger.info(f"Returning cached search results for: {title}")
-                    return self.cache[cache_key]
+            cached_videos = await self.cache.load(cache_key)
+            if cached_videos is not None:
+                logger.info(f"Returning cached search results for: {title}")
+                return cached_videos
         else:
             logger.info(f"Force refresh enabled, bypassing cache for search: {title}")
 
-        # 検索実行
+        # 検索実行（同じタイトルの検索が実行中であれば結果を共有）
+        return await self._inflight.do(cache_key, lambda: self._search_and_cache(title, cache_key))
+
+    async def _search_and_cache(self, title: str, cache_key: str) -> List[Dict[str, any]]:
+        """検索して結果をキャッシュに保存"""
         search_url = f"{MISSAV_BASE_URL}/ja/search/{quote(title)}"
         videos = await self.scrape_search_results(search_url, title)
         
         # キャッシュに保存
         if videos:
-            self.cache[cache_key] = videos
-            self.cache_timestamp[cache_key] = datetime.now()
+            await self.cache.save(cache_key, videos)
         
         return videos
 
+    def normalize_title(self, title: str) -> str:
+        """キャッシュ・集約キー用にタイトルを正規化"""
+        return normalize_title(title)
+
+    def _search_cache_key(self, title: str) -> str:
+        return f"search_{self.normalize_title(title)}"
+
+    def is_search_cached(self, title: str) -> bool:
+        """検索結果が有効期限内のままメモリにキャッシュされているか（統計は更新しない）"""
+        entry = self.cache.peek(self._search_cache_key(title))
+        return entry is not None and entry.is_fresh
+
+    def get_search_cache_remaining(self, title: str) -> Optional[float]:
+        """検索結果のキャッシュの有効期限までの残り秒数（キャッシュがない場合はNone、統計は更新しない）"""
+        entry = self.cache.peek(self._search_cache_key(title))
+        return entry.ttl - entry.age if entry else None
+
     async def scrape_search_results(self, search_url: str, title: str) -> List[Dict[str, any]]:
-        """検索結果ページをスクレイピング"""
+        """検索結果ページをスクレイピング（Bot全体の受付制御で実行枠を確保してから取得）"""
+        async with scrape_admission.slot("missav"):
+            with metrics.SCRAPE_DURATION.time(source="missav"):
+                return await self._scrape_search_results(search_url, title)
+
+    async def _scrape_search_results(self, search_url: str, title: str) -> List[Dict[str, any]]:
         videos = []
         
         try:
-            async with async_playwright() as p:
-                browser = await p.chromium.launch(
-                    headless=True,
-                    args=['--no-sandbox', '--disable-dev-shm-usage']
-                )
-                
-                context = await browser.new_context(
-                    user_agent=USER_AGENT,
-                    viewport={'width': 1920, 'height': 1080}
-                )
+            async with self._page_slot():
+                context = await self._get_context()
                 page = await context.new_page()
                 
-                logger.info(f"Searching MissAV for: {title}")
-                logger.info(f"Search URL: {search_url}")
-                
-                await page.goto(search_url, wait_until='networkidle')
-                await page.wait_for_timeout(3000)
-                
-                # 検索結果の動画要素を取得（MissAVの実際の構造に基づく）
-                video_elements = await page.query_selector_all("div.grid.grid-cols-2 > div")
-                
-                if not video_elements:
-                    # フォールバック用の他のセレクタ
-                    fallback_selectors = [
-                        "div[class*='grid'] > div",
-                        ".thumbnail.group",
-                        "div.thumbnail"
-                    ]
+                try:
+                    logger.info(f"Searching MissAV for: {title}")
+                    logger.info(f"Search URL: {search_url}")
                     
-                    for selector in fallback_selectors:
-                        elements = await page.query_selector_all(selector)
-                        if elements:
-                            video_elements = elements
-                            logger.info(f"Found {len(elements)} elements with fallback selector: {selector}")
-                            break
-                else:
-                    logger.info(f"Found {len(video_elements)} videos with main selector")
-                
-                if not video_elements:
-                    logger.warning("No video elements found")
-                    await browser.close()
-                    return videos
-                
-                # 各動画の情報を取得（最大20件）
-                for element in video_elements[:20]:
-                    try:
-                        video_info = await self.extract_video_info(element)
-                        if video_info and self.is_relevant_video(video_info['title'], title):
-                            videos.append(video_info)
-                            logger.info(f"Added video: {video_info['title'][:50]}...")
+                    await page.goto(search_url, wait_until='networkidle')
+                    await page.wait_for_timeout(3000)
+                    
+                    # 検索結果の動画要素を取得（MissAVの実際の構造に基づく）
+                    video_elements = await page.query_selector_all("div.grid.grid-cols-2 > div")
+                    
+                    if not video_elements:
+                        # フォールバック用の他のセレクタ
+                        fallback_selectors = [
+                            "div[class*='grid'] > div",
+                            ".thumbnail.group",
+                            "div.thumbnail"
+                        ]
                         
-                    except Exception as e:
-                        logger.error(f"Error extracting video info: {e}")
-                        continue
-                
-                await browser.close()
+                        for selector in fallback_selectors:
+                            elements = await page.query_selector_all(selector)
+                            if elements:
+                                video_elements = elements
+                                logger.info(f"Found {len(elements)} elements with fallback selector: {selector}")
+                                break
+                    else:
+                        logger.info(f"Found {len(video_elements)} videos with main selector")
+                    
+                    if not video_elements:
+                        logger.warning("No video elements found")
+                        return videos
+                    
+                    # 各動画の情報を取得（最大20件）
+                    for element in video_elements[:20]:
+                        try:
+                            video_info = await self.extract_video_info(element)
+                            if video_info and self.is_relevant_video(video_info['title'], title):
+                                videos.append(video_info)
+                                logger.info(f"Added video: {video_info['title'][:50]}...")
+                            
+                        except Exception as e:
+                            logger.error(f"Error extracting video info: {e}")
+                            continue
+                    
+                finally:
+                    await page.close()
                 
                 # 関連性でソート（タイトルの類似度）
                 videos.sort(key=lambda x: self.calculate_relevance(x['title'], title), reverse=True)
@@ -121,7 +307,10 @@ class MissAVScraper:
                 logger.info(f"Successfully found {len(videos)} relevant videos")
                 
         except Exception as e:
+            # 取得の失敗を「該当なし」と区別できるよう呼び出し元に伝える（空の結果として記録しない）
+            metrics.SCRAPE_ERRORS.inc(source="missav")
             logger.error(f"MissAV scraping error: {e}")
+            raise
         
         return videos
 
@@ -280,44 +469,38 @@ class MissAVScraper:
     async def get_video_direct_url(self, video_page_url: str) -> Optional[str]:
         """動画ページから直接再生URLを取得"""
         try:
-            async with async_playwright() as p:
-                browser = await p.chromium.launch(
-                    headless=True,
-                    args=['--no-sandbox', '--disable-dev-shm-usage']
-                )
-                
-                context = await browser.new_context(
-                    user_agent=USER_AGENT,
-                    viewport={'width': 1920, 'height': 1080}
-                )
+            async with self._page_slot():
+                context = await self._get_context()
                 page = await context.new_page()
                 
-                logger.info(f"Getting direct URL from: {video_page_url}")
-                
-                await page.goto(video_page_url, wait_until='networkidle')
-                await page.wait_for_timeout(5000)
-                
-                # 動画URLを探す
-                video_selectors = [
-                    "video source[src]",
-                    "video[src]",
-                    "source[src*='.mp4']",
-                    "source[src*='.m3u8']"
-                ]
-                
-                for selector in video_selectors:
-                    video_elem = await page.query_selector(selector)
-                    if video_elem:
-                        src = await video_elem.get_attribute('src')
-                        if src:
-                            if src.startswith('//'):
-                                return f"https:{src}"
-                            elif src.startswith('/'):
-                                return f"{MISSAV_BASE_URL}{src}"
-                            elif src.startswith('http'):
-                                return src
-                
-                await browser.close()
+                try:
+                    logger.info(f"Getting direct URL from: {video_page_url}")
+                    
+                    await page.goto(video_page_url, wait_until='networkidle')
+                    await page.wait_for_timeout(5000)
+                    
+                    # 動画URLを探す
+                    video_selectors = [
+                        "video source[src]",
+                        "video[src]",
+                        "source[src*='.mp4']",
+                        "source[src*='.m3u8']"
+                    ]
+                    
+                    for selector in video_selectors:
+                        video_elem = await page.query_selector(selector)
+                        if video_elem:
+                            src = await video_elem.get_attribute('src')
+                            if src:
+                                if src.startswith('//'):
+                                    return f"https:{src}"
+                                elif src.startswith('/'):
+                                    return f"{MISSAV_BASE_URL}{src}"
+                                elif src.startswith('http'):
+                                    return src
+                    
+                finally:
+                    await page.close()
                 
         except Exception as e:
             logger.error(f"Error getting direct video URL: {e}")
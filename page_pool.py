@@ -0,0 +1,188 @@
+"""
+Playwrightページプール
+事前に作成したページを貸し出し、使用後はabout:blankに戻して再利用する
+一定回数使用したページや処理に失敗したページは破棄して作り直す
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Awaitable, Callable, Deque, Dict, Optional
+from playwright.async_api import Page
+from config import PAGE_POOL_MIN_SIZE, PAGE_POOL_MAX_SIZE, PAGE_POOL_MAX_USES
+
+logger = logging.getLogger(__name__)
+
+
+class PagePool:
+    """最小/最大サイズと再利用回数の上限を持つページプール"""
+
+    def __init__(self, page_factory: Callable[[], Awaitable[Page]], min_size: int = PAGE_POOL_MIN_SIZE, max_size: int = PAGE_POOL_MAX_SIZE, max_uses: int = PAGE_POOL_MAX_USES):
+        """
+        Args:
+            page_factory: 新しいページを作成するコルーチン関数（年齢認証などの準備も含む）
+            min_size: 常に確保しておくページ数
+            max_size: 同時に存在できるページ数の上限
+            max_uses: 1ページあたりの最大使用（ナビゲーション）回数
+        """
+        self._page_factory = page_factory
+        self.min_size = min_size
+        self.max_size = max(max_size, 1)
+        self.max_uses = max_uses
+        self._idle: Deque[Page] = deque()
+        self._uses: Dict[Page, int] = {}
+        self._size = 0  # 作成中を含むページ数
+        self._in_use = 0
+        self._waiters = 0
+        self._closed = False
+        self._condition = asyncio.Condition()
+        self._refill_task: Optional[asyncio.Task] = None
+        # 統計
+        self.created_count = 0
+        self.retired_count = 0
+        self.acquire_count = 0
+        self.total_wait_time = 0.0
+        self.max_wait_time = 0.0
+
+    async def warm_up(self):
+        """最小サイズまでページを事前作成"""
+        while not self._closed and self._size < self.min_size:
+            self._size += 1
+            try:
+                page = await self._create_page()
+            except Exception as e:
+                self._size -= 1
+                logger.error(f"Failed to pre-create pooled page: {e}")
+                return
+            async with self._condition:
+                self._idle.append(page)
+                self._condition.notify()
+
+    @asynccontextmanager
+    async def acquire(self) -> AsyncIterator[Page]:
+        """ページを借りる（例外発生時はページを破棄）"""
+        page = await self._checkout()
+        failed = False
+        try:
+            yield page
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            await self._checkin(page, failed)
+
+    async def _create_page(self) -> Page:
+        page = await self._page_factory()
+        self._uses[page] = 0
+        self.created_count += 1
+        return page
+
+    async def _checkout(self) -> Page:
+        started = time.monotonic()
+        page = None
+        self._waiters += 1
+        try:
+            async with self._condition:
+                while True:
+                    if self._closed:
+                        raise RuntimeError("Page pool is closed")
+                    # 待機中に閉じられたページは破棄
+                    while self._idle and page is None:
+                        candidate = self._idle.popleft()
+                        if candidate.is_closed():
+                            self._forget(candidate)
+                        else:
+                            page = candidate
+                    if page is not None or self._size < self.max_size:
+                        break
+                    await self._condition.wait()
+                if page is None:
+                    self._size += 1
+        finally:
+            self._waiters -= 1
+
+        if page is None:
+            try:
+                page = await self._create_page()
+            except Exception:
+                async with self._condition:
+                    self._size -= 1
+                    self._condition.notify()
+                raise
+
+        self._in_use += 1
+        wait_time = time.monotonic() - started
+        self.acquire_count += 1
+        self.total_wait_time += wait_time
+        self.max_wait_time = max(self.max_wait_time, wait_time)
+        return page
+
+    async def _checkin(self, page: Page, failed: bool):
+        self._in_use -= 1
+        self._uses[page] = self._uses.get(page, 0) + 1
+        retire = failed or self._closed or page.is_closed() or self._uses[page] >= self.max_uses
+
+        if not retire:
+            # 次の利用者のためにページをリセット
+            try:
+                await page.goto("about:blank")
+            except Exception as e:
+                logger.debug(f"Failed to reset pooled page: {e}")
+                retire = True
+
+        if retire:
+            await self._retire(page)
+
+        async with self._condition:
+            if not retire:
+                self._idle.append(page)
+            self._condition.notify()
+
+        if retire and not self._closed and self._size < self.min_size:
+            self._schedule_refill()
+
+    def _forget(self, page: Page):
+        self._uses.pop(page, None)
+        self._size -= 1
+        self.retired_count += 1
+
+    async def _retire(self, page: Page):
+        self._forget(page)
+        try:
+            if not page.is_closed():
+                await page.close()
+        except Exception as e:
+            logger.debug(f"Failed to close retired page: {e}")
+
+    def _schedule_refill(self):
+        if self._refill_task is None or self._refill_task.done():
+            self._refill_task = asyncio.create_task(self.warm_up())
+
+    async def close(self):
+        """全ページを閉じてプールを停止"""
+        self._closed = True
+        if self._refill_task and not self._refill_task.done():
+            self._refill_task.cancel()
+        async with self._condition:
+            idle_pages = list(self._idle)
+            self._idle.clear()
+            self._condition.notify_all()
+        for page in idle_pages:
+            await self._retire(page)
+
+    def get_stats(self) -> Dict[str, any]:
+        """占有状況と待ち時間の統計を取得"""
+        return {
+            'size': self._size,
+            'idle': len(self._idle),
+            'in_use': self._in_use,
+            'waiters': self._waiters,
+            'max_size': self.max_size,
+            'created': self.created_count,
+            'retired': self.retired_count,
+            'acquired': self.acquire_count,
+            'avg_wait': self.total_wait_time / self.acquire_count if self.acquire_count else 0.0,
+            'max_wait': self.max_wait_time
+        }
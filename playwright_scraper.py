@@ -5,26 +5,443 @@ Playwright版スクレイパー（Seleniumの代替案）
 """
 
 import asyncio
-from playwright.async_api import async_playwright, Browser, BrowserContext
-from datetime import datetime, timedelta
+from playwright.async_api import async_playwright, Browser, BrowserContext, Page
+from datetime import datetime
 import logging
 import re
 import hashlib
-from typing import List, Dict, Optional
-from config import USER_AGENT, FANZA_SALE_URL, MIN_RATING, MAX_ITEMS, CACHE_DURATION
+import time
+import metrics
+import tracing
+import admission
+from admission import scrape_admission
+from browser_watchdog import (
+    close_browser, forget_browser_processes, playwright_driver_pid, record_browser_processes, wait_until_drained
+)
+from typing import AsyncIterator, Callable, List, Dict, Optional, Tuple
+from resource_blocker import ResourceBlocker
+from page_pool import PagePool
+from single_flight import SingleFlight
+from ttl_cache import TTLCache
+from cache_store import get_default_store
+from fanza_query import FanzaQuery
+from config import (
+    USER_AGENT, FANZA_SALE_URL, MIN_RATING, MAX_ITEMS, CACHE_DURATION, CACHE_STALE_GRACE,
+    LISTING_CACHE_MAX_ENTRIES, LISTING_CACHE_MAX_BYTES, USE_BULK_EXTRACTION,
+    MAX_LISTING_PAGES, LISTING_PAGE_CONCURRENCY,
+    ENABLE_HTTP_FETCH, HTTP_FETCH_TIMEOUT, HTTP_FETCH_MAX_CONNECTIONS
+)
+
+# HTTP取得は任意機能（aiohttp・lxmlがない場合はPlaywrightのみで取得）
+try:
+    import aiohttp
+    from lxml import html as lxml_html
+except ImportError:
+    aiohttp = None
+    lxml_html = None
 
 logger = logging.getLogger(__name__)
 
+# 商品カード・各項目のセレクター（個別抽出と一括抽出で共通）
+PRODUCT_SELECTORS = [
+    "[data-e2eid='content-card']",
+    "div[data-e2eid='content-card']",
+    "article[data-e2eid='content-card']"
+]
+TITLE_SELECTORS = [
+    "a[data-e2eid='title']",
+    "a[href*='/detail/']",
+    "span.hover\\:underline",
+    "a span.hover\\:underline"
+]
+STAR_SELECTORS = [
+    "img[src*='icon/star/yellow.svg']",  # 正確なセレクター
+    "img[src*='star/yellow']",
+    "img[src*='star'][alt='']",  # 空のaltタグの星画像
+    "img[alt*='星']",
+    "[class*='star']",
+    "[data-rating]",
+    ".star-rating img",
+    "img[src*='rating']"
+]
+IMAGE_SELECTORS = [
+    "a[href*='/detail/'] img",  # 商品リンク内の画像
+    "picture img",              # picture要素内の画像
+    "img[loading='lazy']",      # 遅延読み込み画像
+    "img[alt]"                  # altタグがある画像
+]
+ACTRESS_SELECTORS = [
+    "a[href*='?actress=']",
+    "a.text-gray-500.hover\\:underline",
+    "a[href*='/actress/']",
+    "a[href*='actress_id=']"
+]
+IMAGE_HOSTS = ('awsimgsrc.dmm.co.jp', 'pics.dmm.co.jp')
+EXCLUDED_ACTRESS_NAMES = ['詳細', '商品', '動画', 'サンプル', '画像', 'レビュー']
+MAX_CARDS = 100  # 1ページで確認する最大カード数
+
+# 全カードの情報を1回のpage.evaluateで取得するスクリプト
+# ElementHandleを作らずプレーンなJSONだけを返すため、IPC往復とハンドルの保持が不要
+BULK_EXTRACT_SCRIPT = """
+(args) => {
+    const text = (el) => (el && el.textContent ? el.textContent.trim() : '');
+    const first = (root, selectors) => {
+        for (const selector of selectors) {
+            const el = root.querySelector(selector);
+            if (el) return el;
+        }
+        return null;
+    };
+
+    let cards = [];
+    for (const selector of args.productSelectors) {
+        cards = Array.from(document.querySelectorAll(selector));
+        if (cards.length) break;
+    }
+
+    return cards.slice(0, args.maxCards).map((card) => {
+        // タイトル（画像のalt → テキストの順）
+        let title = '';
+        const titleImg = card.querySelector("a[href*='/detail/'] img");
+        if (titleImg) title = (titleImg.getAttribute('alt') || '').trim();
+        if (!title) {
+            for (const selector of args.titleSelectors) {
+                const el = card.querySelector(selector);
+                if (el) {
+                    title = text(el);
+                    if (title) break;
+                }
+            }
+        }
+
+        const link = first(card, ["a[data-e2eid='title']", "a[href*='/detail/']"]);
+
+        // 星の数（最初に見つかったセレクターを使用）
+        let stars = 0;
+        for (const selector of args.starSelectors) {
+            const count = card.querySelectorAll(selector).length;
+            if (count) {
+                stars = count;
+                break;
+            }
+        }
+
+        // 代替手段：評価テキストの候補（Playwrightの:has-textに相当する検索を含む）
+        const ratingTexts = [];
+        if (!stars) {
+            for (const selector of ["[class*='rating']", "[class*='review']"]) {
+                const el = card.querySelector(selector);
+                if (el) ratingTexts.push(el.textContent || '');
+            }
+            const starSpan = Array.from(card.querySelectorAll('span')).find((el) => (el.textContent || '').includes('★'));
+            if (starSpan) ratingTexts.push(starSpan.textContent || '');
+            const ratingLabel = Array.from(card.querySelectorAll('*')).find((el) => (el.textContent || '').includes('評価'));
+            if (ratingLabel) ratingTexts.push(ratingLabel.textContent || '');
+        }
+
+        // 商品画像（対象ホストの画像が見つかるまで順に確認）
+        let image = '';
+        let imageMatched = false;
+        for (const selector of args.imageSelectors) {
+            const el = card.querySelector(selector);
+            if (el) {
+                image = el.getAttribute('src') || '';
+                if (image && args.imageHosts.some((host) => image.includes(host))) {
+                    imageMatched = true;
+                    break;
+                }
+            }
+        }
+
+        // 女優（最初に見つかったセレクターの先頭3件）
+        let actresses = [];
+        for (const selector of args.actressSelectors) {
+            const elems = Array.from(card.querySelectorAll(selector));
+            if (elems.length) {
+                actresses = elems.slice(0, 3).map((el) => ({
+                    name: el.textContent || '',
+                    href: el.getAttribute('href') || ''
+                }));
+                break;
+            }
+        }
+
+        const priceEl = card.querySelector("[data-e2eid='content-price']");
+
+        return {
+            title: title,
+            href: link ? (link.getAttribute('href') || '') : '',
+            stars: stars,
+            rating_texts: ratingTexts,
+            price_text: priceEl ? (priceEl.textContent || '') : '',
+            image: image,
+            image_matched: imageMatched,
+            actresses: actresses
+        };
+    });
+}
+"""
+
+
+# HTTP取得したHTMLの解析用XPath（上記CSSセレクターと同じ順序・対象）
+PRODUCT_XPATHS = [
+    "//*[@data-e2eid='content-card']",
+    "//div[@data-e2eid='content-card']",
+    "//article[@data-e2eid='content-card']"
+]
+TITLE_XPATHS = [
+    ".//a[@data-e2eid='title']",
+    ".//a[contains(@href, '/detail/')]",
+    ".//span[contains(concat(' ', normalize-space(@class), ' '), ' hover:underline ')]",
+    ".//a//span[contains(concat(' ', normalize-space(@class), ' '), ' hover:underline ')]"
+]
+LINK_XPATHS = [
+    ".//a[@data-e2eid='title']",
+    ".//a[contains(@href, '/detail/')]"
+]
+STAR_XPATHS = [
+    ".//img[contains(@src, 'icon/star/yellow.svg')]",
+    ".//img[contains(@src, 'star/yellow')]",
+    ".//img[contains(@src, 'star') and @alt='']",
+    ".//img[contains(@alt, '星')]",
+    ".//*[contains(@class, 'star')]",
+    ".//*[@data-rating]",
+    ".//*[contains(concat(' ', normalize-space(@class), ' '), ' star-rating ')]//img",
+    ".//img[contains(@src, 'rating')]"
+]
+RATING_TEXT_XPATHS = [
+    ".//*[contains(@class, 'rating')]",
+    ".//*[contains(@class, 'review')]",
+    ".//span[contains(., '★')]",
+    ".//*[contains(., '評価')]"
+]
+IMAGE_XPATHS = [
+    ".//a[contains(@href, '/detail/')]//img",
+    ".//picture//img",
+    ".//img[@loading='lazy']",
+    ".//img[@alt]"
+]
+ACTRESS_XPATHS = [
+    ".//a[contains(@href, '?actress=')]",
+    ".//a[contains(concat(' ', normalize-space(@class), ' '), ' text-gray-500 ') and contains(concat(' ', normalize-space(@class), ' '), ' hover:underline ')]",
+    ".//a[contains(@href, '/actress/')]",
+    ".//a[contains(@href, 'actress_id=')]"
+]
+
+
+def _first_xpath(element, xpaths: List[str]):
+    """最初に見つかった要素を返す"""
+    for xpath in xpaths:
+        found = element.xpath(xpath)
+        if found:
+            return found[0]
+    return None
+
+
+def parse_listing_html(html_text: str) -> List[Dict[str, any]]:
+    """一覧ページのHTMLから商品カードの生データを抽出（BULK_EXTRACT_SCRIPTと同じ形式）"""
+    document = lxml_html.fromstring(html_text)
+    cards = []
+    for xpath in PRODUCT_XPATHS:
+        cards = document.xpath(xpath)
+        if cards:
+            break
+    
+    raw_cards = []
+    for card in cards[:MAX_CARDS]:
+        # タイトル（画像のalt → テキストの順）
+        title = ''
+        title_imgs = card.xpath(".//a[contains(@href, '/detail/')]//img")
+        if title_imgs:
+            title = (title_imgs[0].get('alt') or '').strip()
+        if not title:
+            for xpath in TITLE_XPATHS:
+                found = card.xpath(xpath)
+                if found:
+                    title = found[0].text_content().strip()
+                    if title:
+                        break
+        
+        link = _first_xpath(card, LINK_XPATHS)
+        
+        # 星の数（最初に見つかったXPathを使用）
+        stars = 0
+        for xpath in STAR_XPATHS:
+            count = len(card.xpath(xpath))
+            if count:
+                stars = count
+                break
+        
+        # 代替手段：評価テキストの候補
+        rating_texts = []
+        if not stars:
+            for xpath in RATING_TEXT_XPATHS:
+                found = card.xpath(xpath)
+                if found:
+                    rating_texts.append(found[0].text_content())
+        
+        # 商品画像（対象ホストの画像が見つかるまで順に確認）
+        image = ''
+        image_matched = False
+        for xpath in IMAGE_XPATHS:
+            found = card.xpath(xpath)
+            if found:
+                image = found[0].get('src') or ''
+                if image and any(host in image for host in IMAGE_HOSTS):
+                    image_matched = True
+                    break
+        
+        # 女優（最初に見つかったXPathの先頭3件）
+        actresses = []
+        for xpath in ACTRESS_XPATHS:
+            found = card.xpath(xpath)
+            if found:
+                actresses = [{'name': el.text_content(), 'href': el.get('href') or ''} for el in found[:3]]
+                break
+        
+        price_el = _first_xpath(card, [".//*[@data-e2eid='content-price']"])
+        
+        raw_cards.append({
+            'title': title,
+            'href': (link.get('href') or '') if link is not None else '',
+            'stars': stars,
+            'rating_texts': rating_texts,
+            'price_text': price_el.text_content() if price_el is not None else '',
+            'image': image,
+            'image_matched': image_matched,
+            'actresses': actresses
+        })
+    return raw_cards
+
+
+class HttpListingFetcher:
+    """ブラウザを使わずに一覧ページを取得する（年齢認証Cookie付きの共有HTTPセッション）"""
+    
+    def __init__(self, timeout: float = HTTP_FETCH_TIMEOUT, max_connections: int = HTTP_FETCH_MAX_CONNECTIONS):
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self._session: Optional["aiohttp.ClientSession"] = None
+        # 統計
+        self.fetch_count = 0
+        self.empty_count = 0
+        self.error_count = 0
+    
+    @staticmethod
+    def is_available() -> bool:
+        """必要なライブラリがインストールされているか"""
+        return aiohttp is not None and lxml_html is not None
+    
+    def _get_session(self) -> "aiohttp.ClientSession":
+        """HTTPセッションを取得（接続を使い回す）"""
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.max_connections),
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                headers={
+                    'User-Agent': USER_AGENT,
+                    'Accept-Language': 'ja,en;q=0.8',
+                    # 年齢認証済みとして扱われるCookie
+                    'Cookie': 'age_check_done=1'
+                }
+            )
+        return self._session
+    
+    async def fetch_cards(self, url: str) -> List[Dict[str, any]]:
+        """一覧ページを取得して商品カードの生データを返す（取得・解析に失敗した場合は空）"""
+        self.fetch_count += 1
+        try:
+            async with self._get_session().get(url) as response:
+                response.raise_for_status()
+                html_text = await response.text()
+            # 解析はイベントループを止めないようスレッドで実行
+            raw_cards = await asyncio.to_thread(parse_listing_html, html_text)
+        except Exception as e:
+            self.error_count += 1
+            logger.warning(f"HTTP fetch failed for {url[:100]}: {e}")
+            return []
+        
+        if not raw_cards:
+            self.empty_count += 1
+        return raw_cards
+    
+    async def close(self):
+        """HTTPセッションを閉じる"""
+        if self._session and not self._session.closed:
+            await self._session.close()
+        self._session = None
+    
+    def get_stats(self) -> Dict[str, int]:
+        """HTTP取得の統計を取得"""
+        return {
+            'fetched': self.fetch_count,
+            'empty': self.empty_count,
+            'errors': self.error_count
+        }
+
+
+def extract_content_id(url: str) -> Optional[str]:
+    """商品URLからFANZAの品番（cid）を抽出"""
+    if not url:
+        return None
+    match = re.search(r'(?:cid=|[?&]id=)([A-Za-z0-9_]+)', url)
+    return match.group(1).lower() if match else None
+
+
+def format_rating_stars(rating: float) -> str:
+    """評価を星マークで表現"""
+    full_stars = int(rating)
+    half_star = 1 if rating - full_stars >= 0.5 else 0
+    empty_stars = 5 - full_stars - half_star
+    
+    return "★" * full_stars + "☆" * half_star + "☆" * empty_stars
+
+
+def resolve_target(url: Optional[str], query: Optional[FanzaQuery]) -> Tuple[str, str]:
+    """検索条件またはURLからスクレイピング対象URLとキャッシュキーを決定（両方省略時はデフォルト条件）"""
+    if query is None and not url:
+        query = FanzaQuery()
+    if query is not None:
+        return query.url, query.cache_key
+    # URLベースの包括的なキャッシュキー
+    return url, hashlib.md5(url.encode('utf-8')).hexdigest()
+
 
 class PlaywrightFanzaScraper:
     def __init__(self):
-        self.cache = {}
-        self.cache_timestamp = None
-        self.cache_by_url = {}  # URL別の包括的キャッシュ
-        self.cache_timestamp_by_url = {}  # URL別のタイムスタンプ
+        # URL別の包括的キャッシュ（期限切れ後も猶予期間中は保持）
+        self.cache = TTLCache(
+            ttl=CACHE_DURATION,
+            stale_ttl=CACHE_STALE_GRACE,
+            max_entries=LISTING_CACHE_MAX_ENTRIES,
+            max_bytes=LISTING_CACHE_MAX_BYTES,
+            name="listing",
+            store=get_default_store()
+        )
         self._browser: Optional[Browser] = None
         self._context: Optional[BrowserContext] = None
         self._playwright = None
+        self.resource_blocker = ResourceBlocker()
+        self._launch_lock = asyncio.Lock()
+        self._inflight = SingleFlight()  # 同一キャッシュキーのスクレイピングを集約
+        self._background_tasks = set()  # バックグラウンド再取得タスクの参照を保持
+        self._stream_listeners: Dict[str, List[asyncio.Queue]] = {}  # キャッシュキー別の逐次取得の待ち受け
+        self._page_pool: Optional[PagePool] = None
+        self._page_pool_context: Optional[BrowserContext] = None
+        self._age_verified_context: Optional[BrowserContext] = None
+        # ブラウザの再起動（再起動中は新しいページの貸し出しを止めて実行中のページの完了を待つ）
+        self._recycle_lock = asyncio.Lock()
+        self._recycle_gate = asyncio.Event()
+        self._recycle_gate.set()
+        self.scrapes_since_launch = 0  # 現在のブラウザで一覧ページを表示した回数
+        self.recycle_count = 0
+        self.http_fetcher: Optional[HttpListingFetcher] = None
+        metrics.register_cache(self.cache)
+        metrics.register_browser_source("fanza", self)
+        if ENABLE_HTTP_FETCH:
+            if HttpListingFetcher.is_available():
+                self.http_fetcher = HttpListingFetcher()
+            else:
+                logger.warning("ENABLE_HTTP_FETCH is set but aiohttp/lxml is not installed; using Playwright only")
 
     def parse_rating(self, rating_text: str) -> float:
         """評価テキストから数値を抽出"""
@@ -38,15 +455,7 @@ class PlaywrightFanzaScraper:
 
     def format_rating_stars(self, rating: float) -> str:
         """評価を星マークで表現"""
-        full_stars = int(rating)
-        half_star = 1 if rating - full_stars >= 0.5 else 0
-        empty_stars = 5 - full_stars - half_star
-        
-        return "★" * full_stars + "☆" * half_star + "☆" * empty_stars
-
-    def _generate_cache_key(self, url: str) -> str:
-        """URLベースの包括的なキャッシュキーを生成"""
-        return hashlib.md5(url.encode('utf-8')).hexdigest()
+        return format_rating_stars(rating)
     
     async def _get_browser(self) -> Browser:
         """ブラウザインスタンスを取得（再利用）"""
@@ -55,148 +464,296 @@ class PlaywrightFanzaScraper:
                 self._playwright = await async_playwright().start()
             self._browser = await self._playwright.chromium.launch(
                 headless=True,
-                args=['--no-sandbox', '--disable-dev-shm-usage', '--disable-gpu', '--disable-images']
+                args=['--no-sandbox', '--disable-dev-shm-usage', '--disable-gpu']
             )
+            # 後片付けをせずに終了した場合に次の起動時に終了させられるよう記録
+            record_browser_processes("fanza", self.browser_driver_pid())
+            self.scrapes_since_launch = 0
         return self._browser
     
     async def _get_context(self) -> BrowserContext:
         """ブラウザコンテキストを取得（再利用）"""
-        if self._context is None or self._context.browser != await self._get_browser():
-            browser = await self._get_browser()
-            self._context = await browser.new_context(
-                user_agent=USER_AGENT,
-                viewport={'width': 1920, 'height': 1080}
-            )
+        # プールのページ作成と並列スクレイピングで複数のブラウザが起動しないようロックする
+        async with self._launch_lock:
+            if self._context is None or self._context.browser != await self._get_browser():
+                browser = await self._get_browser()
+                self._context = await browser.new_context(
+                    user_agent=USER_AGENT,
+                    viewport={'width': 1920, 'height': 1080}
+                )
+                # 画像・フォント・解析系スクリプトなどの読み込みを中断
+                await self.resource_blocker.install(self._context)
+            return self._context
+    
+    async def _get_page_pool(self) -> PagePool:
+        """ページプールを取得（コンテキストが作り直された場合はプールも作り直す）"""
+        # ブラウザの再起動中は完了を待つ
+        await self._recycle_gate.wait()
+        context = await self._get_context()
+        if self._page_pool is None or self._page_pool_context is not context:
+            old_pool = self._page_pool
+            self._page_pool = PagePool(self._create_pool_page)
+            self._page_pool_context = context
+            if old_pool:
+                await old_pool.close()
+            asyncio.create_task(self._page_pool.warm_up())
+        return self._page_pool
+    
+    async def _create_pool_page(self) -> Page:
+        """プール用のページを作成（コンテキストごとに一度だけ年齢認証を済ませる）"""
+        context = await self._get_context()
+        page = await context.new_page()
+        if self._age_verified_context is not context:
+            try:
+                await page.goto(FANZA_SALE_URL, wait_until='domcontentloaded')
+                await self._handle_age_verification(page)
+                self._age_verified_context = context
+            except Exception as e:
+                logger.warning(f"Age verification during page warm-up failed: {e}")
+            await page.goto("about:blank")
+        return page
+    
+    async def _handle_age_verification(self, page: Page):
+        """年齢認証ページが表示されていれば「はい」を押す"""
+        try:
+            # 年齢認証ボタンを探す（タイムアウト短縮）
+            age_button = await page.query_selector("a:has-text('はい')")
+            if age_button:
+                await age_button.click()
+                logger.info("Age verification completed")
+                await page.wait_for_load_state('domcontentloaded')
+        except:
+            pass
+    
+    async def warm_up(self):
+        """ページプールを事前に準備"""
+        pool = await self._get_page_pool()
+        await pool.warm_up()
+    
+    def get_page_pool_stats(self) -> Optional[Dict[str, any]]:
+        """ページプールの統計を取得"""
+        return self._page_pool.get_stats() if self._page_pool else None
+    
+    def get_browser_stats(self) -> Dict[str, int]:
+        """起動中のブラウザ・開いているページ・プールの占有状況"""
+        connected = self._browser is not None and self._browser.is_connected()
+        pool_stats = self.get_page_pool_stats() or {}
+        return {
+            'browsers': 1 if connected else 0,
+            'pages': len(self._context.pages) if connected and self._context else 0,
+            'pool_in_use': pool_stats.get('in_use', 0),
+            'pool_waiters': pool_stats.get('waiters', 0)
+        }
+    
+    def browser_driver_pid(self) -> Optional[int]:
+        """ブラウザを起動したPlaywrightドライバーのPID（監視用）"""
+        return playwright_driver_pid(self._playwright) if self._playwright else None
+    
+    def active_context(self) -> Optional[BrowserContext]:
+        """起動中のブラウザのコンテキスト（未起動・切断時はNone）"""
+        if self._browser is None or not self._browser.is_connected():
+            return None
         return self._context
     
-    async def close(self):
-        """リソースをクリーンアップ"""
+    async def recycle_browser(self, reason: str) -> bool:
+        """実行中のページの完了を待ってからブラウザを閉じる（次の取得時に起動し直す）
+        
+        Returns:
+            ブラウザを閉じた場合はTrue（起動していない・再起動中の場合はFalse）
+        """
+        if self._browser is None or self._recycle_lock.locked():
+            return False
+        async with self._recycle_lock:
+            logger.info(f"Recycling FANZA browser ({reason}) after {self.scrapes_since_launch} scrapes")
+            self._recycle_gate.clear()
+            try:
+                pool = self._page_pool
+                if pool and not await wait_until_drained(lambda: pool.get_stats()['in_use'] + pool.get_stats()['waiters']):
+                    logger.warning("Timed out waiting for in-flight pages; recycling anyway")
+                await self._close_browser()
+            finally:
+                self._recycle_gate.set()
+            self.recycle_count += 1
+            return True
+    
+    async def _close_browser(self):
+        """ページプール・コンテキスト・ブラウザを閉じる（Playwrightドライバーは残す）"""
+        if self._page_pool:
+            await self._page_pool.close()
+            self._page_pool = None
+            self._page_pool_context = None
         if self._context:
-            await self._context.close()
+            try:
+                await self._context.close()
+            except Exception as e:
+                logger.debug(f"Failed to close browser context: {e}")
             self._context = None
         if self._browser:
-            await self._browser.close()
+            await close_browser(self._browser, self.browser_driver_pid())
             self._browser = None
+    
+    async def close(self):
+        """リソースをクリーンアップ"""
+        self.cache.close()
+        if self.http_fetcher:
+            await self.http_fetcher.close()
+        await self._close_browser()
         if self._playwright:
             await self._playwright.stop()
             self._playwright = None
+        forget_browser_processes("fanza")
 
-    async def get_high_rated_products(self, url: str = None, max_items: Optional[int] = None, force_refresh: bool = False) -> List[Dict[str, any]]:
+    def _resolve_target(self, url: Optional[str], query: Optional[FanzaQuery]) -> Tuple[str, str]:
+        """検索条件またはURLからスクレイピング対象URLとキャッシュキーを決定"""
+        return resolve_target(url, query)
+    
+    async def get_high_rated_products(self, url: str = None, max_items: Optional[int] = None, force_refresh: bool = False, query: Optional[FanzaQuery] = None) -> List[Dict[str, any]]:
         """高評価商品を取得（キャッシュ機能付き）
         
         Args:
-            url: スクレイピング対象のURL（省略時はデフォルトURL）
+            url: スクレイピング対象のURL（queryを指定した場合は無視）
             max_items: 最大取得件数
             force_refresh: Trueの場合、キャッシュを無視して新規取得
+            query: 検索条件（url・query共に省略時はデフォルト条件）
         """
-        # URLが指定されていない場合はデフォルトURL
-        if not url:
-            url = FANZA_SALE_URL
-        
-        # URLベースのキャッシュキーを生成
-        cache_key = self._generate_cache_key(url)
+        # 検索条件からURLとキャッシュキーを決定
+        url, cache_key = self._resolve_target(url, query)
         
         # force_refreshがFalseの場合のみキャッシュをチェック
         if not force_refresh:
             # キャッシュチェック
-            if cache_key in self.cache_timestamp_by_url and cache_key in self.cache_by_url:
-                if datetime.now() - self.cache_timestamp_by_url[cache_key] < timedelta(seconds=CACHE_DURATION):
+            with tracing.span("cache_lookup"):
+                entry = await self.cache.load_entry(cache_key, allow_stale=True)
+            if entry:
+                if entry.is_fresh:
                     logger.info(f"Returning cached data for URL: {url[:100]}...")
-                    return self.cache_by_url[cache_key]
+                    return entry.value
+                # 猶予期間内なら期限切れのデータを即座に返し、裏で再取得する
+                logger.info(f"Returning stale cached data and revalidating in background for URL: {url[:100]}...")
+                self._schedule_revalidation(url, cache_key)
+                return entry.value
         else:
             logger.info(f"Force refresh enabled, bypassing cache for URL: {url[:100]}...")
         
-        # 新規取得
-        products = await self.scrape_products(url)
+        # 新規取得（同じキーのスクレイピングが実行中であれば結果を共有）
+        joined = self._inflight.is_inflight(cache_key)
+        if joined:
+            logger.info(f"Joining in-flight scrape for URL: {url[:100]}...")
+        with tracing.span("scrape_wait", joined=joined):
+            return await self._inflight.do(cache_key, lambda: self._scrape_and_cache(url, cache_key))
+    
+    async def stream_high_rated_products(self, url: str = None, force_refresh: bool = False, query: Optional[FanzaQuery] = None) -> AsyncIterator[List[Dict[str, any]]]:
+        """高評価商品を取得できた順にバッチで返す（非同期ジェネレーター）
+        
+        キャッシュがあれば全件を1バッチで返す。スクレイピングする場合は一覧ページごとに返し、
+        最後にまだ返していない商品（実行中のスクレイピングに合流した場合など）をまとめて返す。
+        呼び出し元が途中で反復をやめてもスクレイピングは継続し、結果はキャッシュされる。
+        """
+        _, cache_key = self._resolve_target(url, query)
+        queue: asyncio.Queue = asyncio.Queue()
+        listeners = self._stream_listeners.setdefault(cache_key, [])
+        listeners.append(queue)
+        task = asyncio.ensure_future(self.get_high_rated_products(url=url, force_refresh=force_refresh, query=query))
+        # 途中で反復をやめた場合も例外が未取得のまま残らないようにする
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        seen = set()
+        try:
+            while not task.done():
+                getter = asyncio.ensure_future(queue.get())
+                await asyncio.wait({getter, task}, return_when=asyncio.FIRST_COMPLETED)
+                if not getter.done():
+                    getter.cancel()
+                    break
+                batch = [product for product in getter.result() if self._product_key(product) not in seen]
+                if batch:
+                    seen.update(self._product_key(product) for product in batch)
+                    yield batch
+            
+            remaining = [product for product in await task if self._product_key(product) not in seen]
+            if remaining:
+                yield remaining
+        finally:
+            listeners.remove(queue)
+            if not listeners:
+                self._stream_listeners.pop(cache_key, None)
+    
+    def _publish_batch(self, cache_key: str, batch: List[Dict[str, any]]):
+        """スクレイピング途中の商品を逐次取得の待ち受けに配信"""
+        for queue in self._stream_listeners.get(cache_key, []):
+            queue.put_nowait(batch)
+    
+    def _schedule_revalidation(self, url: str, cache_key: str):
+        """期限切れのキャッシュをバックグラウンドで再取得"""
+        if self._inflight.is_inflight(cache_key):
+            return
+        # 要求したユーザーのサーバー・順番待ちの通知先を引き継がない（バックグラウンドの待ち行列で実行）
+        task = admission.create_background_task(self._inflight.do(cache_key, lambda: self._scrape_and_cache(url, cache_key)))
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+    
+    def get_cache_timestamp(self, url: str = None, query: Optional[FanzaQuery] = None) -> Optional[datetime]:
+        """キャッシュされたデータの取得時刻を返す（キャッシュがない場合はNone）"""
+        _, cache_key = self._resolve_target(url, query)
+        entry = self.cache.peek(cache_key)
+        return entry.fetched_at if entry else None
+    
+    def get_cache_remaining(self, url: str = None, query: Optional[FanzaQuery] = None) -> Optional[float]:
+        """キャッシュの有効期限までの残り秒数（期限切れは負の値、キャッシュがない場合はNone）"""
+        _, cache_key = self._resolve_target(url, query)
+        entry = self.cache.peek(cache_key)
+        return entry.ttl - entry.age if entry else None
+    
+    def get_cache_stats(self) -> Dict[str, any]:
+        """キャッシュの統計を取得"""
+        return self.cache.get_stats()
+    
+    async def _scrape_and_cache(self, url: str, cache_key: str) -> List[Dict[str, any]]:
+        """スクレイピングして結果をキャッシュに保存"""
+        with tracing.span("scrape_products"):
+            products = await self.scrape_products(url, on_batch=lambda batch: self._publish_batch(cache_key, batch))
         if products:
-            self.cache_by_url[cache_key] = products
-            self.cache_timestamp_by_url[cache_key] = datetime.now()
+            with tracing.span("cache_save"):
+                await self.cache.save(cache_key, products)
             logger.info(f"Cached {len(products)} products for URL: {url[:100]}...")
         
         return products
 
-    async def scrape_products(self, url: str) -> List[Dict[str, any]]:
-        """実際のスクレイピング処理（高速化版）"""
+    async def scrape_products(self, url: str, on_batch: Optional[Callable[[List[Dict[str, any]]], None]] = None) -> List[Dict[str, any]]:
+        """実際のスクレイピング処理（高速化版）
+        
+        1ページ目で条件を満たす商品がMAX_ITEMSに届かない場合は、
+        続きのページを別のページで並列に取得する
+        Bot全体の受付制御で実行枠を確保してから取得する（混雑時はAdmissionRejected）
+        
+        Args:
+            url: 一覧ページのURL
+            on_batch: 一覧ページ1枚分の商品を取得するたびに呼ばれるコールバック
+        """
+        async with scrape_admission.slot("fanza"):
+            return await self._scrape_products(url, on_batch)
+
+    async def _scrape_products(self, url: str, on_batch: Optional[Callable[[List[Dict[str, any]]], None]] = None) -> List[Dict[str, any]]:
         products = []
+        started = time.perf_counter()
         
         try:
-            # 再利用可能なブラウザコンテキストを取得
-            context = await self._get_context()
-            page = await context.new_page()
+            first_page_products, card_count = await self._scrape_listing_page(url)
+            page_results = {1: first_page_products}
+            if on_batch and first_page_products:
+                on_batch(first_page_products)
+            
+            if self._count_unique(page_results) < MAX_ITEMS and card_count > 0 and MAX_LISTING_PAGES > 1:
+                await self._scrape_additional_pages(url, page_results, on_batch)
+            
+            # ページ順に結合し、品番で重複を除外
+            seen = set()
+            for page_number in sorted(page_results):
+                for product in page_results[page_number]:
+                    product_key = self._product_key(product)
+                    if product_key not in seen:
+                        seen.add(product_key)
+                        products.append(product)
             
-            try:
-                # ページにアクセス
-                logger.info(f"Accessing URL: {url}")
-                await page.goto(url, wait_until='domcontentloaded')  # networkidleより高速
-                
-                # 年齢認証の処理
-                try:
-                    # 年齢認証ボタンを探す（タイムアウト短縮）
-                    age_button = await page.query_selector("a:has-text('はい')")
-                    if age_button:
-                        await age_button.click()
-                        logger.info("Age verification completed")
-                        await page.wait_for_load_state('domcontentloaded')
-                except:
-                    pass
-                
-                # 商品リストの要素を直接待機（タイムアウト短縮）
-                try:
-                    await page.wait_for_selector("[data-e2eid='content-card']", timeout=10000)
-                except:
-                    logger.warning("Product selector not found within timeout")
-                
-                # 商品要素を探す（最初に見つかったセレクターを使用）
-                product_selectors = [
-                    "[data-e2eid='content-card']",
-                    "div[data-e2eid='content-card']",
-                    "article[data-e2eid='content-card']"
-                ]
-                
-                product_elements = None
-                for selector in product_selectors:
-                    elements = await page.query_selector_all(selector)
-                    if elements:
-                        product_elements = elements
-                        logger.info(f"Found {len(elements)} products with selector: {selector}")
-                        break
-                
-                if not product_elements:
-                    logger.warning("No product elements found")
-                    return products
-                
-                # 並列処理で商品情報を取得（最大100件まで確認）
-                semaphore = asyncio.Semaphore(10)  # 同時処理数制限
-                tasks = []
-                
-                async def process_element(element):
-                    async with semaphore:
-                        return await self._extract_product_info(element)
-                
-                # タスクを作成
-                for element in product_elements[:100]:
-                    tasks.append(process_element(element))
-                
-                # 並列実行
-                results = await asyncio.gather(*tasks, return_exceptions=True)
-                
-                # 結果を処理
-                for result in results:
-                    if isinstance(result, dict) and result.get('title'):
-                        product_rating = result.get('rating', 0)
-                        logger.debug(f"Product: {result['title'][:30]}... Rating: {product_rating}")
-                        
-                        if product_rating >= MIN_RATING:
-                            products.append(result)
-                            logger.debug(f"Added product: {result['title'][:30]}... (Rating: {product_rating})")
-                        elif product_rating > 0:
-                            logger.debug(f"Product below threshold: {result['title'][:30]}... (Rating: {product_rating}, Min: {MIN_RATING})")
-                        else:
-                            logger.debug(f"Product with zero rating: {result['title'][:30]}...")
-                
-            finally:
-                await page.close()
-                
             # 評価順でソートして上位を返す
             products.sort(key=lambda x: x['rating'], reverse=True)
             products = products[:MAX_ITEMS]
@@ -204,10 +761,259 @@ class PlaywrightFanzaScraper:
             logger.info(f"Successfully scraped {len(products)} high-rated products")
             
         except Exception as e:
+            metrics.SCRAPE_ERRORS.inc(source="fanza")
             logger.error(f"Scraping error: {e}")
         
+        metrics.SCRAPE_DURATION.observe(time.perf_counter() - started, source="fanza")
         return products
     
+    async def _scrape_additional_pages(self, url: str, page_results: Dict[int, List[Dict[str, any]]], on_batch: Optional[Callable[[List[Dict[str, any]]], None]] = None):
+        """2ページ目以降を並列に取得（十分な件数が集まるか最終ページに達した時点で打ち切り）"""
+        semaphore = asyncio.Semaphore(LISTING_PAGE_CONCURRENCY)
+        
+        async def fetch_page(page_number: int):
+            async with semaphore:
+                try:
+                    return page_number, await self._scrape_listing_page(self._build_page_url(url, page_number))
+                except Exception as e:
+                    # 1ページの失敗で他のページの結果を捨てないよう、このページだけ飛ばす
+                    metrics.SCRAPE_ERRORS.inc(source="fanza")
+                    logger.warning(f"Failed to scrape listing page {page_number}, skipping: {e}")
+                    return page_number, None
+        
+        # ページは完了順に受け取るため、打ち切るのは打ち切りを決めたページより後のページのみ
+        # （それより前のページは評価の高い商品を含みうるため、完了まで待つ）
+        tasks = {n: asyncio.create_task(fetch_page(n)) for n in range(2, MAX_LISTING_PAGES + 1)}
+        finished = {1}
+        stop_page = None
+        try:
+            pending = set(tasks.values())
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    page_number, result = task.result()
+                    finished.add(page_number)
+                    if result is None:
+                        continue
+                    page_products, card_count = result
+                    page_results[page_number] = page_products
+                    if on_batch and page_products:
+                        on_batch(page_products)
+                    if card_count == 0 and (stop_page is None or page_number < stop_page):
+                        logger.info(f"Reached the end of the listing at page {page_number}")
+                        stop_page = page_number
+                
+                # 1ページ目から途切れずに取得済みのページで十分な件数が集まったか
+                prefix = 1
+                while prefix + 1 in finished:
+                    prefix += 1
+                if stop_page is None or prefix < stop_page:
+                    prefix_results = {n: products for n, products in page_results.items() if n <= prefix}
+                    if self._count_unique(prefix_results) >= MAX_ITEMS:
+                        logger.info(f"Collected enough products by page {prefix}, stopping crawl")
+                        stop_page = prefix
+                
+                if stop_page is not None:
+                    for page_number, task in tasks.items():
+                        if page_number > stop_page:
+                            task.cancel()
+                    pending = {task for page_number, task in tasks.items() if page_number <= stop_page and not task.done()}
+            if stop_page is not None:
+                # 先に完了した後のページの結果は使わず、順に巡回した場合と同じ範囲の結果にする
+                for page_number in [n for n in page_results if n > stop_page]:
+                    del page_results[page_number]
+        finally:
+            for task in tasks.values():
+                task.cancel()
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+    
+    def _count_unique(self, page_results: Dict[int, List[Dict[str, any]]]) -> int:
+        """ページ横断で重複を除いた商品数"""
+        return len({
+            self._product_key(product)
+            for page_products in page_results.values()
+            for product in page_products
+        })
+    
+    def _product_key(self, product: Dict[str, any]) -> str:
+        """重複判定用のキー（品番 → URL → タイトルの順）"""
+        return product.get('content_id') or product.get('url') or product['title']
+    
+    def _build_page_url(self, url: str, page_number: int) -> str:
+        """一覧URLにページ番号を付与"""
+        separator = '&' if '?' in url else '?'
+        return f"{url}{separator}page={page_number}"
+    
+    async def _scrape_listing_page(self, url: str) -> Tuple[List[Dict[str, any]], int]:
+        """一覧ページ1枚をスクレイピングし、評価条件を満たす商品とカード数を返す"""
+        products = []
+        
+        # HTTPで取得できればブラウザを使わない（カードが見つからなければPlaywrightで再取得）
+        results = []
+        if self.http_fetcher:
+            with metrics.LISTING_PAGE_DURATION.time(method="http"), tracing.span("http_fetch"):
+                raw_cards = await self.http_fetcher.fetch_cards(url)
+            if raw_cards:
+                logger.info(f"Fetched {len(raw_cards)} product cards over HTTP: {url}")
+                results = [self._build_product_info(raw) for raw in raw_cards]
+            else:
+                logger.info(f"No product cards in HTTP response, falling back to Playwright: {url}")
+        if not results:
+            with metrics.LISTING_PAGE_DURATION.time(method="browser"), tracing.span("render_listing"):
+                results = await self._render_listing_page(url)
+        
+        if not results:
+            logger.warning("No product elements found")
+            return products, 0
+        
+        # 結果を処理
+        for result in results:
+            if isinstance(result, dict) and result.get('title'):
+                product_rating = result.get('rating', 0)
+                logger.debug(f"Product: {result['title'][:30]}... Rating: {product_rating}")
+                
+                if product_rating >= MIN_RATING:
+                    products.append(result)
+                    logger.debug(f"Added product: {result['title'][:30]}... (Rating: {product_rating})")
+                elif product_rating > 0:
+                    logger.debug(f"Product below threshold: {result['title'][:30]}... (Rating: {product_rating}, Min: {MIN_RATING})")
+                else:
+                    logger.debug(f"Product with zero rating: {result['title'][:30]}...")
+        
+        return products, len(results)
+    
+    async def _render_listing_page(self, url: str) -> List[Dict[str, any]]:
+        """一覧ページをブラウザで表示して商品情報を抽出"""
+        # 年齢認証済みのページをプールから借りる
+        pool = await self._get_page_pool()
+        async with pool.acquire() as page:
+            self.scrapes_since_launch += 1
+            # ページにアクセス
+            logger.info(f"Accessing URL: {url}")
+            with tracing.span("goto"):
+                await page.goto(url, wait_until='domcontentloaded')  # networkidleより高速
+            
+            # 年齢認証の処理（Cookieが切れていた場合のみ表示される）
+            with tracing.span("age_verification"):
+                await self._handle_age_verification(page)
+            
+            # 商品リストの要素を直接待機（タイムアウト短縮）
+            with tracing.span("wait_for_cards"):
+                try:
+                    await page.wait_for_selector("[data-e2eid='content-card']", timeout=10000)
+                except:
+                    logger.warning("Product selector not found within timeout")
+            
+            # 商品情報を抽出（一括抽出 → 失敗時は個別抽出にフォールバック）
+            with tracing.span("extract_cards"):
+                results = []
+                if USE_BULK_EXTRACTION:
+                    results = await self._extract_products_bulk(page)
+                if not results:
+                    results = await self._extract_products_per_handle(page)
+        return results
+    
+    async def _extract_products_bulk(self, page) -> List[Dict[str, any]]:
+        """全商品カードの情報を1回のpage.evaluateで抽出"""
+        try:
+            raw_cards = await page.evaluate(BULK_EXTRACT_SCRIPT, {
+                'productSelectors': PRODUCT_SELECTORS,
+                'titleSelectors': TITLE_SELECTORS,
+                'starSelectors': STAR_SELECTORS,
+                'imageSelectors': IMAGE_SELECTORS,
+                'actressSelectors': ACTRESS_SELECTORS,
+                'imageHosts': list(IMAGE_HOSTS),
+                'maxCards': MAX_CARDS
+            })
+        except Exception as e:
+            logger.warning(f"Bulk extraction failed, falling back to per-element extraction: {e}")
+            return []
+        
+        logger.info(f"Bulk extracted {len(raw_cards)} product cards")
+        return [self._build_product_info(raw) for raw in raw_cards]
+    
+    async def _extract_products_per_handle(self, page) -> List[Dict[str, any]]:
+        """ElementHandle単位で商品情報を抽出（一括抽出のフォールバック）"""
+        # 商品要素を探す（最初に見つかったセレクターを使用）
+        product_elements = None
+        for selector in PRODUCT_SELECTORS:
+            elements = await page.query_selector_all(selector)
+            if elements:
+                product_elements = elements
+                logger.info(f"Found {len(elements)} products with selector: {selector}")
+                break
+        
+        if not product_elements:
+            return []
+        
+        # 並列処理で商品情報を取得（最大100件まで確認）
+        semaphore = asyncio.Semaphore(10)  # 同時処理数制限
+        
+        async def process_element(element):
+            async with semaphore:
+                return await self._extract_product_info(element)
+        
+        # 並列実行
+        return await asyncio.gather(
+            *[process_element(element) for element in product_elements[:MAX_CARDS]],
+            return_exceptions=True
+        )
+    
+    def _build_product_info(self, raw: Dict[str, any]) -> Dict[str, any]:
+        """一括抽出したカードの生データを商品情報に変換"""
+        title = (raw.get('title') or '').strip()
+        if not title:
+            return {}
+        
+        url = raw.get('href') or ''
+        if url and not url.startswith('http'):
+            url = f"https://www.dmm.co.jp{url}"
+        
+        # 評価（星の数 → 評価テキストの順）
+        rating = float(raw.get('stars') or 0)
+        if rating == 0.0:
+            for rating_text in raw.get('rating_texts') or []:
+                parsed_rating = self.parse_rating(rating_text)
+                if parsed_rating > 0:
+                    rating = parsed_rating
+                    break
+        
+        price = "価格不明"
+        price_text = raw.get('price_text') or ''
+        if '円' in price_text:
+            price = price_text.strip()
+        
+        image_url = raw.get('image') or ''
+        if raw.get('image_matched') and 'ps.jpg' in image_url:
+            image_url = image_url.replace('ps.jpg', 'pl.jpg')
+        
+        actresses = []
+        for actress in raw.get('actresses') or []:
+            clean_name = (actress.get('name') or '').strip()
+            if (len(clean_name) > 1 and
+                clean_name not in EXCLUDED_ACTRESS_NAMES and
+                not any(a['name'] == clean_name for a in actresses)):
+                actresses.append({
+                    'name': clean_name,
+                    'url': self._build_actress_url(actress.get('href') or '')
+                })
+        
+        return {
+            'title': title[:50] + '...' if len(title) > 50 else title,
+            'rating': rating,
+            'price': price,
+            'url': url,
+            'content_id': extract_content_id(url),
+            'image_url': image_url,
+            'actresses': actresses
+        }
+    
+    def _build_actress_url(self, actress_href: str) -> str:
+        """女優リンクのhrefから完全なURLを生成"""
+        if actress_href.startswith('/'):
+            return f"https://www.dmm.co.jp{actress_href}"
+        return actress_href if actress_href.startswith('http') else f"https://www.dmm.co.jp/{actress_href}"
+    
     async def _extract_product_info(self, element) -> Dict[str, any]:
         """商品要素から情報を抽出（並列処理用）"""
         try:
@@ -222,13 +1028,7 @@ class PlaywrightFanzaScraper:
             
             # altタグが空の場合は他のセレクターを試す
             if not title:
-                title_selectors = [
-                    "a[data-e2eid='title']",
-                    "a[href*='/detail/']",
-                    "span.hover\\:underline",
-                    "a span.hover\\:underline"
-                ]
-                for selector in title_selectors:
+                for selector in TITLE_SELECTORS:
                     title_elem = await element.query_selector(selector)
                     if title_elem:
                         title = await title_elem.text_content()
@@ -251,18 +1051,7 @@ class PlaywrightFanzaScraper:
             
             # 評価（星の画像の数をカウント - 複数のセレクターを試行）
             rating = 0.0
-            star_selectors = [
-                "img[src*='icon/star/yellow.svg']",  # 正確なセレクター
-                "img[src*='star/yellow']",
-                "img[src*='star'][alt='']",  # 空のaltタグの星画像
-                "img[alt*='星']",
-                "[class*='star']",
-                "[data-rating]",
-                ".star-rating img",
-                "img[src*='rating']"
-            ]
-            
-            for selector in star_selectors:
+            for selector in STAR_SELECTORS:
                 star_images = await element.query_selector_all(selector)
                 if star_images:
                     rating = len(star_images)
@@ -308,17 +1097,11 @@ class PlaywrightFanzaScraper:
             
             # 商品画像URL（最初の有効なものを使用）
             image_url = ""
-            image_selectors = [
-                "a[href*='/detail/'] img",  # 商品リンク内の画像
-                "picture img",              # picture要素内の画像
-                "img[loading='lazy']",      # 遅延読み込み画像
-                "img[alt]"                  # altタグがある画像
-            ]
-            for selector in image_selectors:
+            for selector in IMAGE_SELECTORS:
                 img_elem = await element.query_selector(selector)
                 if img_elem:
                     image_url = await img_elem.get_attribute('src')
-                    if image_url and ('awsimgsrc.dmm.co.jp' in image_url or 'pics.dmm.co.jp' in image_url):
+                    if image_url and any(host in image_url for host in IMAGE_HOSTS):
                         # 高解像度版に変換
                         if 'ps.jpg' in image_url:
                             image_url = image_url.replace('ps.jpg', 'pl.jpg')
@@ -326,15 +1109,8 @@ class PlaywrightFanzaScraper:
             
             # 女優名（優先順位付きセレクター）
             actresses = []
-            actress_selectors = [
-                "a[href*='?actress=']",
-                "a.text-gray-500.hover\\:underline",
-                "a[href*='/actress/']",
-                "a[href*='actress_id=']"
-            ]
-            
             # 最初に見つかったセレクターのみ使用（パフォーマンス向上）
-            for selector in actress_selectors:
+            for selector in ACTRESS_SELECTORS:
                 try:
                     actress_elems = await element.query_selector_all(selector)
                     if actress_elems:
@@ -344,18 +1120,12 @@ class PlaywrightFanzaScraper:
                             if actress_name and actress_name.strip():
                                 clean_name = actress_name.strip()
                                 if (len(clean_name) > 1 and 
-                                    clean_name not in ['詳細', '商品', '動画', 'サンプル', '画像', 'レビュー'] and
+                                    clean_name not in EXCLUDED_ACTRESS_NAMES and
                                     not any(a['name'] == clean_name for a in actresses)):
                                     
-                                    # Build full URL
-                                    if actress_href.startswith('/'):
-                                        actress_url = f"https://www.dmm.co.jp{actress_href}"
-                                    else:
-                                        actress_url = actress_href if actress_href.startswith('http') else f"https://www.dmm.co.jp/{actress_href}"
-                                    
                                     actresses.append({
                                         'name': clean_name,
-                                        'url': actress_url
+                                        'url': self._build_actress_url(actress_href)
                                     })
                         break  # 最初に成功したセレクターで完了
                 except Exception:
@@ -366,6 +1136,7 @@ class PlaywrightFanzaScraper:
                 'rating': rating,
                 'price': price,
                 'url': url,
+                'content_id': extract_content_id(url),
                 'image_url': image_url,
                 'actresses': actresses
             }
@@ -380,14 +1151,42 @@ class FanzaScraper:
     def __init__(self):
         self.playwright_scraper = PlaywrightFanzaScraper()
     
-    async def get_high_rated_products(self, url: str = None, max_items: Optional[int] = None, force_refresh: bool = False) -> List[Dict[str, any]]:
+    async def get_high_rated_products(self, url: str = None, max_items: Optional[int] = None, force_refresh: bool = False, query: Optional[FanzaQuery] = None) -> List[Dict[str, any]]:
         """高評価商品を取得"""
-        return await self.playwright_scraper.get_high_rated_products(url=url, max_items=max_items, force_refresh=force_refresh)
+        return await self.playwright_scraper.get_high_rated_products(url=url, max_items=max_items, force_refresh=force_refresh, query=query)
+    
+    def stream_high_rated_products(self, url: str = None, force_refresh: bool = False, query: Optional[FanzaQuery] = None) -> AsyncIterator[List[Dict[str, any]]]:
+        """高評価商品を取得できた順にバッチで返す"""
+        return self.playwright_scraper.stream_high_rated_products(url=url, force_refresh=force_refresh, query=query)
     
     def format_rating_stars(self, rating: float) -> str:
         """評価を星マークで表現"""
         return self.playwright_scraper.format_rating_stars(rating)
     
+    def get_cache_timestamp(self, url: str = None, query: Optional[FanzaQuery] = None) -> Optional[datetime]:
+        """キャッシュされたデータの取得時刻を取得"""
+        return self.playwright_scraper.get_cache_timestamp(url, query)
+    
+    def get_cache_remaining(self, url: str = None, query: Optional[FanzaQuery] = None) -> Optional[float]:
+        """キャッシュの有効期限までの残り秒数を取得"""
+        return self.playwright_scraper.get_cache_remaining(url, query)
+    
+    def get_cache_stats(self) -> Dict[str, any]:
+        """キャッシュの統計を取得"""
+        return self.playwright_scraper.get_cache_stats()
+    
+    async def warm_up(self):
+        """ページプールを事前に準備"""
+        await self.playwright_scraper.warm_up()
+    
+    def get_page_pool_stats(self) -> Optional[Dict[str, any]]:
+        """ページプールの統計を取得"""
+        return self.playwright_scraper.get_page_pool_stats()
+    
+    def get_browser_stats(self) -> Dict[str, int]:
+        """ブラウザ・ページ数を取得"""
+        return self.playwright_scraper.get_browser_stats()
+    
     async def close(self):
         """リソースをクリーンアップ"""
         await self.playwright_scraper.close()
\ No newline at end of file
@@ -0,0 +1,161 @@
+"""
+利用頻度に基づく先読みスケジューラー
+コマンドで使われた検索条件の利用回数を記録し、上位の検索条件をキャッシュの期限切れ前に
+バックグラウンドで再取得する（MissAV検索も合わせて行う）
+"""
+
+import asyncio
+import logging
+import random
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+from fanza_query import FanzaQuery
+from playwright_scraper import FanzaScraper
+from config import (
+    CACHE_DURATION, PREFETCH_TOP_K, PREFETCH_LEAD_TIME, PREFETCH_JITTER, PREFETCH_CHECK_INTERVAL,
+    PREFETCH_CONCURRENCY, PREFETCH_ENRICH_COUNT, PREFETCH_USAGE_HALF_LIFE, PREFETCH_MAX_TRACKED
+)
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class QueryUsage:
+    """検索条件ごとの利用状況"""
+    query: FanzaQuery
+    score: float  # 時間で減衰する利用回数
+    updated_at: float  # scoreを更新した時刻（単調時計）
+
+    def decayed_score(self, now: float) -> float:
+        """現在時刻まで減衰させた利用回数"""
+        return self.score * 0.5 ** ((now - self.updated_at) / PREFETCH_USAGE_HALF_LIFE)
+
+
+class PrefetchScheduler:
+    """よく使われる検索条件をキャッシュの期限切れ前に再取得する"""
+
+    def __init__(self, scraper: FanzaScraper, enrich: Callable[[dict], Awaitable[Optional[str]]], top_k: int = PREFETCH_TOP_K, lead_time: float = PREFETCH_LEAD_TIME, jitter: float = PREFETCH_JITTER, concurrency: int = PREFETCH_CONCURRENCY):
+        """
+        Args:
+            scraper: 再取得に使うスクレイパー
+            enrich: 商品のMissAV URLを検索するコルーチン関数
+            top_k: 先読みする検索条件の数
+            lead_time: 有効期限の何秒前から再取得するか
+            jitter: 再取得を開始するまでの最大遅延（秒）
+            concurrency: 同時に再取得する検索条件の数
+        """
+        self.scraper = scraper
+        self.enrich = enrich
+        self.top_k = top_k
+        self.lead_time = lead_time
+        self.jitter = jitter
+        self._semaphore = asyncio.Semaphore(max(concurrency, 1))
+        self._usage: Dict[str, QueryUsage] = {}
+        self._scheduled: Set[str] = set()  # 再取得を予定・実行中のキャッシュキー
+        self._last_refreshed: Dict[str, float] = {}  # キャッシュキーごとの最終再取得時刻（単調時計）
+        self._tasks: Set[asyncio.Task] = set()
+        self._loop_task: Optional[asyncio.Task] = None
+        # 統計
+        self.refresh_count = 0
+        self.failure_count = 0
+
+    def record(self, query: FanzaQuery):
+        """検索条件の利用を記録"""
+        now = time.monotonic()
+        usage = self._usage.get(query.cache_key)
+        if usage is None:
+            usage = self._usage[query.cache_key] = QueryUsage(query=query, score=0.0, updated_at=now)
+        usage.score = usage.decayed_score(now) + 1
+        usage.updated_at = now
+
+        # 記録数の上限を超えたら利用の少ない条件から忘れる
+        if len(self._usage) > PREFETCH_MAX_TRACKED:
+            least_used = min(self._usage, key=lambda key: self._usage[key].decayed_score(now))
+            del self._usage[least_used]
+            self._last_refreshed.pop(least_used, None)
+
+    def top_queries(self) -> List[FanzaQuery]:
+        """利用回数の多い検索条件（上位top_k件）"""
+        now = time.monotonic()
+        ranked = sorted(self._usage.values(), key=lambda usage: usage.decayed_score(now), reverse=True)
+        return [usage.query for usage in ranked[:self.top_k]]
+
+    def start(self):
+        """定期確認を開始（既に動作中の場合は何もしない）"""
+        if self._loop_task is not None and not self._loop_task.done():
+            return
+        self._loop_task = asyncio.create_task(self._run())
+        logger.info(f"Prefetch scheduler started (top {self.top_k} queries)")
+
+    async def stop(self):
+        """定期確認と実行中の再取得を停止"""
+        tasks = list(self._tasks)
+        if self._loop_task is not None:
+            tasks.append(self._loop_task)
+            self._loop_task = None
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(PREFETCH_CHECK_INTERVAL)
+            try:
+                self._check()
+            except Exception as e:
+                logger.error(f"Error in prefetch scheduler: {e}")
+
+    def _check(self):
+        """期限が近い（またはキャッシュのない）上位の検索条件の再取得を予定"""
+        now = time.monotonic()
+        for query in self.top_queries():
+            if query.cache_key in self._scheduled:
+                continue
+            remaining = self.scraper.get_cache_remaining(query=query)
+            if remaining is not None and remaining > self.lead_time:
+                continue
+            # 該当商品がなくキャッシュされない条件は、有効期限と同じ間隔でのみ再取得
+            last_refreshed = self._last_refreshed.get(query.cache_key)
+            if remaining is None and last_refreshed is not None and now - last_refreshed < CACHE_DURATION:
+                continue
+            self._scheduled.add(query.cache_key)
+            task = asyncio.create_task(self._refresh(query))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _refresh(self, query: FanzaQuery):
+        try:
+            # 複数の検索条件の期限が重なっても再取得が集中しないよう開始を分散
+            await asyncio.sleep(random.uniform(0, self.jitter))
+            async with self._semaphore:
+                logger.info(f"Prefetching popular query: {query.url[:100]}...")
+                products = await self.scraper.get_high_rated_products(query=query, force_refresh=True)
+                # 表示されやすい上位の商品のMissAV URLも事前に検索しておく
+                await asyncio.gather(
+                    *[self._enrich_product(product) for product in products[:PREFETCH_ENRICH_COUNT]],
+                    return_exceptions=True
+                )
+            self._last_refreshed[query.cache_key] = time.monotonic()
+            self.refresh_count += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.failure_count += 1
+            logger.error(f"Failed to prefetch query: {e}")
+        finally:
+            self._scheduled.discard(query.cache_key)
+
+    async def _enrich_product(self, product: dict):
+        missav_url = await self.enrich(product)
+        if missav_url:
+            product['missav_url'] = missav_url
+
+    def get_stats(self) -> Dict[str, int]:
+        """先読みの統計を取得"""
+        return {
+            'tracked': len(self._usage),
+            'scheduled': len(self._scheduled),
+            'refreshed': self.refresh_count,
+            'failed': self.failure_count
+        }
@@ -0,0 +1,139 @@
+"""
+コストに応じたトークンバケット方式のレート制限
+ユーザー・サーバー・Bot全体の3段階のバケットを持ち、キャッシュから返せる要求は少ないコストで通す
+一定時間使われていないバケットは削除し、保持する状態の量を抑える
+"""
+
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+from config import (
+    RATE_LIMIT_USER_CAPACITY, RATE_LIMIT_USER_REFILL, RATE_LIMIT_GUILD_CAPACITY, RATE_LIMIT_GUILD_REFILL,
+    RATE_LIMIT_GLOBAL_CAPACITY, RATE_LIMIT_GLOBAL_REFILL, RATE_LIMIT_IDLE_TTL, RATE_LIMIT_MAX_BUCKETS
+)
+
+
+@dataclass
+class TokenBucket:
+    """トークンバケット（満杯から始まり、時間経過で補充される）"""
+    capacity: float
+    refill_rate: float  # 1秒あたりに補充するトークン数
+    tokens: float
+    updated_at: float  # tokensを更新した時刻（単調時計）
+
+    def refill(self, now: float):
+        """経過時間分のトークンを補充"""
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.refill_rate)
+        self.updated_at = now
+
+    def retry_after(self, cost: float) -> float:
+        """コスト分のトークンが貯まるまでの秒数（足りていれば0）"""
+        if self.tokens >= cost:
+            return 0.0
+        if self.refill_rate <= 0:
+            return float('inf')
+        return (cost - self.tokens) / self.refill_rate
+
+    def is_idle(self, now: float) -> bool:
+        """満杯まで補充済みで保持する必要がないかどうか"""
+        return self.tokens + (now - self.updated_at) * self.refill_rate >= self.capacity
+
+
+class RateLimiter:
+    """ユーザー・サーバー・Bot全体のトークンバケットでコマンドの実行を制限する"""
+
+    def __init__(
+        self,
+        user_capacity: float = RATE_LIMIT_USER_CAPACITY,
+        user_refill: float = RATE_LIMIT_USER_REFILL,
+        guild_capacity: float = RATE_LIMIT_GUILD_CAPACITY,
+        guild_refill: float = RATE_LIMIT_GUILD_REFILL,
+        global_capacity: float = RATE_LIMIT_GLOBAL_CAPACITY,
+        global_refill: float = RATE_LIMIT_GLOBAL_REFILL,
+        idle_ttl: float = RATE_LIMIT_IDLE_TTL,
+        max_buckets: int = RATE_LIMIT_MAX_BUCKETS
+    ):
+        """
+        Args:
+            user_capacity / user_refill: ユーザーごとのバケットの容量と1秒あたりの補充量
+            guild_capacity / guild_refill: サーバーごとのバケットの容量と1秒あたりの補充量
+            global_capacity / global_refill: Bot全体のバケットの容量と1秒あたりの補充量
+            idle_ttl: 最後の利用からこの秒数が経過し満杯に戻ったバケットを削除
+            max_buckets: ユーザー・サーバーそれぞれで保持するバケット数の上限
+        """
+        self.user_limits = (user_capacity, user_refill)
+        self.guild_limits = (guild_capacity, guild_refill)
+        self.idle_ttl = idle_ttl
+        self.max_buckets = max_buckets
+        self._users: Dict[int, TokenBucket] = {}
+        self._guilds: Dict[int, TokenBucket] = {}
+        self._global = TokenBucket(global_capacity, global_refill, global_capacity, time.monotonic())
+        self._last_sweep = time.monotonic()
+        # 統計
+        self.allowed = 0
+        self.limited: Dict[str, int] = {'user': 0, 'guild': 0, 'global': 0}
+        self.evictions = 0
+
+    def _bucket(self, buckets: Dict[int, TokenBucket], key: int, limits: Tuple[float, float], now: float) -> TokenBucket:
+        bucket = buckets.get(key)
+        if bucket is None:
+            capacity, refill_rate = limits
+            bucket = buckets[key] = TokenBucket(capacity, refill_rate, capacity, now)
+            if len(buckets) > self.max_buckets:
+                # 上限を超えたら最も長く使われていないバケットを削除（挿入順＝最終利用順）
+                del buckets[next(iter(buckets))]
+                self.evictions += 1
+        else:
+            # 最終利用順を保つため末尾に移動
+            buckets[key] = buckets.pop(key)
+        bucket.refill(now)
+        return bucket
+
+    def acquire(self, user_id: int, guild_id: Optional[int], cost: float) -> Tuple[float, Optional[str]]:
+        """コスト分のトークンを消費して実行を許可する
+
+        全てのバケットに十分なトークンがある場合のみ消費する（一部だけ減ることはない）
+
+        Returns:
+            (再試行までの秒数, 制限したバケットの種類) 許可した場合は (0.0, None)
+        """
+        now = time.monotonic()
+        self._sweep(now)
+        self._global.refill(now)
+        scopes = [('user', self._bucket(self._users, user_id, self.user_limits, now))]
+        if guild_id is not None:
+            scopes.append(('guild', self._bucket(self._guilds, guild_id, self.guild_limits, now)))
+        scopes.append(('global', self._global))
+
+        # 最も待ち時間の長いバケットを理由として返す
+        retry_after, scope = max((bucket.retry_after(min(cost, bucket.capacity)), name) for name, bucket in scopes)
+        if retry_after > 0:
+            self.limited[scope] += 1
+            return retry_after, scope
+
+        for _, bucket in scopes:
+            bucket.tokens -= min(cost, bucket.capacity)
+        self.allowed += 1
+        return 0.0, None
+
+    def _sweep(self, now: float):
+        """一定時間使われず満杯に戻ったバケットを削除"""
+        if now - self._last_sweep < self.idle_ttl:
+            return
+        self._last_sweep = now
+        for buckets in (self._users, self._guilds):
+            idle = [key for key, bucket in buckets.items() if now - bucket.updated_at >= self.idle_ttl and bucket.is_idle(now)]
+            for key in idle:
+                del buckets[key]
+            self.evictions += len(idle)
+
+    def get_stats(self) -> Dict[str, any]:
+        """統計情報"""
+        return {
+            'allowed': self.allowed,
+            'limited': dict(self.limited),
+            'user_buckets': len(self._users),
+            'guild_buckets': len(self._guilds),
+            'evictions': self.evictions,
+            'global_tokens': round(self._global.tokens, 2)
+        }
@@ -0,0 +1,70 @@
+"""
+ブラウザコンテキスト用のリソースブロック
+画像・メディア・フォント・スタイルシートや解析系ホストへのリクエストを中断して
+スクレイピング時の通信量と読み込み時間を削減する
+"""
+
+import logging
+from collections import Counter
+from typing import Dict, Iterable, Optional
+from playwright.async_api import BrowserContext, Route
+from config import ENABLE_RESOURCE_BLOCKING, BLOCKED_RESOURCE_TYPES, BLOCKED_URL_PATTERNS
+
+logger = logging.getLogger(__name__)
+
+
+class ResourceBlocker:
+    """リソースタイプとURLパターンでリクエストを中断するルーティングポリシー"""
+
+    def __init__(self, resource_types: Optional[Iterable[str]] = None, url_patterns: Optional[Iterable[str]] = None, enabled: bool = ENABLE_RESOURCE_BLOCKING):
+        """
+        Args:
+            resource_types: 中断するリソースタイプ（省略時は設定値）
+            url_patterns: URLに含まれていれば中断する文字列（省略時は設定値）
+            enabled: Falseの場合はルーティングを登録しない
+        """
+        self.resource_types = frozenset(BLOCKED_RESOURCE_TYPES if resource_types is None else resource_types)
+        self.url_patterns = tuple(BLOCKED_URL_PATTERNS if url_patterns is None else url_patterns)
+        self.enabled = enabled
+        self.blocked_count = 0
+        self.allowed_count = 0
+        self.blocked_by_reason: Counter = Counter()
+
+    async def install(self, context: BrowserContext):
+        """コンテキストにルーティングを登録"""
+        if not self.enabled:
+            return
+        await context.route("**/*", self._handle_route)
+
+    def _match(self, resource_type: str, url: str) -> Optional[str]:
+        """中断対象ならその理由（リソースタイプまたはURLパターン）を返す"""
+        if resource_type in self.resource_types:
+            return resource_type
+        for pattern in self.url_patterns:
+            if pattern in url:
+                return pattern
+        return None
+
+    async def _handle_route(self, route: Route):
+        """リクエストごとに中断か続行かを判定"""
+        request = route.request
+        reason = self._match(request.resource_type, request.url)
+        try:
+            if reason:
+                self.blocked_count += 1
+                self.blocked_by_reason[reason] += 1
+                await route.abort()
+            else:
+                self.allowed_count += 1
+                await route.continue_()
+        except Exception as e:
+            # ページが閉じられた後のルーティングは無視
+            logger.debug(f"Route handling skipped for {request.url[:100]}: {e}")
+
+    def get_stats(self) -> Dict[str, any]:
+        """ブロック数の統計を取得"""
+        return {
+            'blocked': self.blocked_count,
+            'allowed': self.allowed_count,
+            'blocked_by_reason': dict(self.blocked_by_reason)
+        }
@@ -0,0 +1,690 @@
+"""
+スクレイピングのワーカープロセスのクライアント
+scraper_worker.pyのワーカーを子プロセスとして起動してUnixソケットで接続し、
+FanzaScraper・MissAVScraperと同じ呼び出し方でワーカー側のスクレイパーを利用できるようにする
+
+複数のワーカーを起動した場合は、検索条件のキャッシュキー・MissAVのタイトル・品番をコンシステントハッシュで
+ワーカーに割り当て、同じ要求が同じワーカー（のキャッシュ・実行中のスクレイピング）に届くようにする
+応答・途中経過が一定時間届かない要求はタイムアウトで失敗させ、ワーカーが終了した場合や
+タイムアウトが続く場合（応答しなくなった場合）はワーカーを起動し直す（起動し直せない間は次の担当に回す）
+キャッシュの取得時刻・残り秒数は応答に含まれる値を手元に記録し、同期的に参照できるようにする
+"""
+
+import asyncio
+import dataclasses
+import itertools
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+import admission
+import metrics
+import tracing
+from admission import AdmissionRejected
+from browser_watchdog import wait_until_drained
+from fanza_query import FanzaQuery
+from hash_ring import HashRing
+from missav_scraper import normalize_title
+from playwright_scraper import format_rating_stars, resolve_target
+from scraper_worker import encode_message, decode_message
+from config import (
+    CACHE_STALE_GRACE, SCRAPER_WORKERS, SCRAPER_WORKER_SOCKET, SCRAPER_WORKER_SPAWN, SCRAPER_WORKER_METRICS_PORT,
+    WORKER_REQUEST_TIMEOUT, WORKER_START_TIMEOUT, WORKER_HEALTH_INTERVAL, WORKER_HEALTH_TIMEOUT,
+    WORKER_MAX_TIMEOUTS, WORKER_RESTART_BACKOFF, WORKER_MESSAGE_LIMIT, WORKER_VIRTUAL_NODES, WORKER_DRAIN_TIMEOUT
+)
+
+logger = logging.getLogger(__name__)
+
+WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "scraper_worker.py")
+MAX_RESTART_BACKOFF = 60  # ワーカーの起動を再試行するまでの最大秒数
+WORKER_STOP_TIMEOUT = 15  # 終了要求後にワーカーの終了を待つ最大秒数
+CACHE_MIRROR_MAX_ENTRIES = 2000  # 手元に記録するキャッシュ情報の最大件数
+
+_generations = itertools.count(1)  # 接続ごとの番号（ワーカーをまたいで一意）
+
+
+class WorkerUnavailable(ConnectionError):
+    """ワーカーに接続できない、または応答がない"""
+
+
+class WorkerError(RuntimeError):
+    """ワーカーで要求の処理に失敗した"""
+
+    def __init__(self, error_type: str, message: str):
+        super().__init__(f"{error_type}: {message}")
+        self.error_type = error_type
+
+
+def default_socket_path(name: str = "worker") -> str:
+    """Botのプロセスごとに異なるソケットのパス（一時ディレクトリ）"""
+    return os.path.join(tempfile.gettempdir(), f"fanza-scraper-{os.getpid()}-{name}.sock")
+
+
+class _RemoteStats:
+    """ワーカーから受け取った統計をメトリクスの監視対象として登録するための参照"""
+
+    def __init__(self, name: str, read):
+        self.name = name
+        self._read = read
+
+    def get_stats(self) -> Dict[str, Any]:
+        return self._read()
+
+    def get_browser_stats(self) -> Dict[str, int]:
+        return self._read()
+
+
+class ScraperWorkerClient:
+    """ワーカープロセスの起動・接続・要求の送受信・状態確認"""
+
+    def __init__(self, name: str = "worker", socket_path: Optional[str] = None, spawn: bool = SCRAPER_WORKER_SPAWN, metrics_port: int = SCRAPER_WORKER_METRICS_PORT, request_timeout: float = WORKER_REQUEST_TIMEOUT):
+        """
+        Args:
+            name: ワーカーの名前（ログ・ソケットのパス用）
+            socket_path: ワーカーのソケットのパス（省略時は一時ディレクトリ）
+            spawn: ワーカーを子プロセスとして起動するか（Falseの場合は起動済みのワーカーに接続のみ）
+            metrics_port: ワーカーの/metricsを公開するポート（0で無効）
+            request_timeout: 応答・途中経過が届かない場合に失敗とみなす秒数
+        """
+        self.name = name
+        self.socket_path = socket_path or default_socket_path(name)
+        self.spawn = spawn
+        self.metrics_port = metrics_port
+        self.request_timeout = request_timeout
+        self.generation = 0  # 接続ごとに変わる番号（接続し直した場合はワーカーのキャッシュが失われた可能性がある）
+        self._process: Optional[subprocess.Popen] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._read_task: Optional[asyncio.Task] = None
+        self._health_task: Optional[asyncio.Task] = None
+        self._connect_lock = asyncio.Lock()
+        self._write_lock = asyncio.Lock()
+        self._pending: Dict[int, asyncio.Queue] = {}
+        self._ids = itertools.count(1)
+        self._consecutive_timeouts = 0
+        self._start_failures = 0
+        self._retry_at = 0.0
+        self._closed = False
+        self._stats_sources: Dict[Tuple[str, str], _RemoteStats] = {}  # メトリクスに登録した参照（弱参照のため保持する）
+        # 統計
+        self.restarts = 0
+        self.timeouts = 0
+        self.last_stats: Dict[str, Any] = {}
+        self.last_seen: Optional[float] = None  # 最後にワーカーからメッセージを受け取った時刻（単調時計）
+
+    @property
+    def connected(self) -> bool:
+        return self._writer is not None and not self._writer.is_closing()
+
+    @property
+    def available(self) -> bool:
+        """要求を送れるか（接続済み、または起動の再試行を待っていない）"""
+        return not self._closed and (self.connected or time.monotonic() >= self._retry_at)
+
+    @property
+    def in_flight(self) -> int:
+        """応答を待っている要求の数"""
+        return len(self._pending)
+
+    @property
+    def pid(self) -> Optional[int]:
+        if self._process is not None and self._process.poll() is None:
+            return self._process.pid
+        return self.last_stats.get('pid') if self.connected else None
+
+    def start(self):
+        """状態確認のループを開始（ワーカーが終了していれば起動し直す）"""
+        if self._health_task is None or self._health_task.done():
+            self._health_task = asyncio.create_task(self._health_loop())
+
+    async def _health_loop(self):
+        while True:
+            try:
+                await self.refresh_stats()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Scraper worker {self.name} health check failed: {e}")
+            await asyncio.sleep(WORKER_HEALTH_INTERVAL)
+
+    async def refresh_stats(self) -> Dict[str, Any]:
+        """ワーカーの統計を取得して記録"""
+        try:
+            stats = await asyncio.wait_for(self.call('stats'), WORKER_HEALTH_TIMEOUT)
+        except asyncio.TimeoutError:
+            self._on_timeout('stats')
+            raise WorkerUnavailable(f"Scraper worker {self.name} did not answer the health check within {WORKER_HEALTH_TIMEOUT}s")
+        self.last_stats = stats
+        self._register_stats_sources(stats)
+        return stats
+
+    def _register_stats_sources(self, stats: Dict[str, Any]):
+        """ワーカーのキャッシュ・ブラウザの統計をBotのメトリクスに登録（初回のみ、ラベルは「名前@ワーカー名」）"""
+        for kind, register in (('caches', metrics.register_cache), ('browsers', metrics.register_browser_source)):
+            for name in stats.get(kind, {}):
+                if (kind, name) in self._stats_sources:
+                    continue
+                source = _RemoteStats(f"{name}@{self.name}", lambda kind=kind, name=name: self.last_stats[kind][name])
+                self._stats_sources[(kind, name)] = source
+                if kind == 'caches':
+                    register(source)
+                else:
+                    register(source.name, source)
+
+    async def _ensure_connected(self):
+        """ワーカーに接続（終了していれば起動し直す、起動に失敗した後は一定時間待ってから再試行）"""
+        if self.connected:
+            return
+        async with self._connect_lock:
+            if self.connected:
+                return
+            if self._closed:
+                raise WorkerUnavailable(f"Scraper worker {self.name} is closed")
+            now = time.monotonic()
+            if now < self._retry_at:
+                raise WorkerUnavailable(f"Scraper worker {self.name} is unavailable (retrying in {self._retry_at - now:.0f}s)")
+            try:
+                await self._connect()
+            except Exception as e:
+                self._start_failures += 1
+                backoff = min(WORKER_RESTART_BACKOFF * 2 ** (self._start_failures - 1), MAX_RESTART_BACKOFF)
+                self._retry_at = time.monotonic() + backoff
+                logger.error(f"Failed to start scraper worker {self.name}: {e}; retrying in {backoff}s")
+                raise WorkerUnavailable(f"Scraper worker {self.name} could not be started: {e}") from e
+            self._start_failures = 0
+
+    async def _connect(self):
+        if self.spawn and (self._process is None or self._process.poll() is not None):
+            if self._process is not None:
+                self.restarts += 1
+                logger.warning(f"Scraper worker {self.name} exited with code {self._process.returncode}; restarting")
+            self._spawn()
+
+        deadline = time.monotonic() + WORKER_START_TIMEOUT
+        while True:
+            if self.spawn and self._process.poll() is not None:
+                raise WorkerUnavailable(f"worker exited during startup with code {self._process.returncode}")
+            try:
+                reader, writer = await asyncio.open_unix_connection(self.socket_path, limit=WORKER_MESSAGE_LIMIT)
+                break
+            except (FileNotFoundError, ConnectionRefusedError):
+                # 起動中（ソケットの作成前、または前回のワーカーのソケットが残っている）
+                if time.monotonic() >= deadline:
+                    raise WorkerUnavailable(f"timed out connecting to {self.socket_path}")
+                await asyncio.sleep(0.2)
+
+        self._writer = writer
+        self._read_task = asyncio.create_task(self._read_loop(reader, writer))
+        self._consecutive_timeouts = 0
+        self.generation = next(_generations)
+        logger.info(f"Connected to scraper worker {self.name} at {self.socket_path}")
+
+    def _spawn(self):
+        env = dict(os.environ, SCRAPER_WORKER_METRICS_PORT=str(self.metrics_port))
+        self._process = subprocess.Popen(
+            [sys.executable, WORKER_SCRIPT, '--socket', self.socket_path, '--parent-pid', str(os.getpid())],
+            env=env
+        )
+        logger.info(f"Started scraper worker {self.name} (pid {self._process.pid})")
+
+    async def _read_loop(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """ワーカーからのメッセージを要求ごとの待ち受けに振り分ける"""
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                message = decode_message(line)
+                self.last_seen = time.monotonic()
+                queue = self._pending.get(message.get('id'))
+                if queue is not None:
+                    queue.put_nowait(message)
+        except (ConnectionError, ValueError) as e:
+            logger.warning(f"Scraper worker {self.name} connection error: {e}")
+        finally:
+            self._disconnect(writer)
+
+    def _disconnect(self, writer: asyncio.StreamWriter):
+        """接続を閉じ、応答待ちの要求を失敗させる"""
+        if self._writer is not writer:
+            return
+        self._writer = None
+        try:
+            writer.close()
+        except Exception:
+            pass
+        for queue in self._pending.values():
+            queue.put_nowait({'disconnected': True})
+        if not self._closed:
+            logger.warning(f"Disconnected from scraper worker {self.name}")
+
+    def _on_timeout(self, method: str):
+        """タイムアウトが続いた場合はワーカーが応答しないとみなして強制終了（次の要求で起動し直す）"""
+        self.timeouts += 1
+        self._consecutive_timeouts += 1
+        logger.warning(f"Scraper worker {self.name} timed out on {method} ({self._consecutive_timeouts}/{WORKER_MAX_TIMEOUTS})")
+        if self._consecutive_timeouts < WORKER_MAX_TIMEOUTS:
+            return
+        logger.error(f"Scraper worker {self.name} is unresponsive; killing it")
+        self._consecutive_timeouts = 0
+        if self.spawn and self._process is not None and self._process.poll() is None:
+            self._process.kill()
+        if self._writer is not None:
+            self._disconnect(self._writer)
+
+    def _error(self, error: Dict[str, Any]) -> Exception:
+        """ワーカーのエラーを例外に変換（受付制御で断られた場合はBotと同じ例外）"""
+        if error.get('type') == 'AdmissionRejected':
+            return AdmissionRejected(error.get('reason', 'unknown'))
+        return WorkerError(error.get('type', 'Exception'), error.get('message', ''))
+
+    async def exchange(self, method: str, params: Optional[Dict[str, Any]] = None) -> AsyncIterator[Tuple[str, Any]]:
+        """要求を送り、途中経過 ('stream', バッチ) と最後に ('result', 結果) を返す（非同期ジェネレーター）
+
+        要求元サーバー・相関IDは現在のコンテキストから引き継ぎ、待ち行列の順番は現在の通知先に伝える
+        途中で反復をやめた場合はワーカー側の処理も中断させる
+        """
+        await self._ensure_connected()
+        writer = self._writer
+        request_id = next(self._ids)
+        queue: asyncio.Queue = asyncio.Queue()
+        self._pending[request_id] = queue
+        notifier = admission.current_queue_notifier()
+        finished = False
+        try:
+            await self._send(writer, {
+                'id': request_id,
+                'method': method,
+                'params': params or {},
+                'guild_id': admission.current_guild(),
+                'trace_id': tracing.current_trace_id()
+            })
+            while True:
+                try:
+                    reply = await asyncio.wait_for(queue.get(), self.request_timeout)
+                except asyncio.TimeoutError:
+                    self._on_timeout(method)
+                    raise WorkerUnavailable(f"Scraper worker {self.name} did not respond to {method} within {self.request_timeout}s")
+                if reply.get('disconnected'):
+                    finished = True
+                    raise WorkerUnavailable(f"Scraper worker {self.name} disconnected during {method}")
+                self._consecutive_timeouts = 0
+                if 'queue_position' in reply:
+                    if notifier is not None:
+                        try:
+                            await notifier(reply['queue_position'])
+                        except Exception as e:
+                            logger.warning(f"Failed to notify queue position: {e}")
+                    continue
+                if 'stream' in reply:
+                    yield 'stream', reply['stream']
+                    continue
+                finished = True
+                if 'error' in reply:
+                    raise self._error(reply['error'])
+                yield 'result', reply.get('result')
+                return
+        finally:
+            self._pending.pop(request_id, None)
+            if not finished and writer is self._writer and self.connected:
+                # 呼び出し元が待つのをやめた（中断・タイムアウト）
+                try:
+                    writer.write(encode_message({'id': request_id, 'cancel': True}))
+                except Exception:
+                    pass
+
+    async def _send(self, writer: asyncio.StreamWriter, message: Dict[str, Any]):
+        try:
+            async with self._write_lock:
+                writer.write(encode_message(message))
+                await writer.drain()
+        except (ConnectionError, RuntimeError) as e:
+            raise WorkerUnavailable(f"Failed to send request to scraper worker {self.name}: {e}") from e
+
+    async def call(self, method: str, params: Optional[Dict[str, Any]] = None) -> Any:
+        """要求を送り、結果を返す"""
+        exchange = self.exchange(method, params)
+        try:
+            async for kind, payload in exchange:
+                if kind == 'result':
+                    return payload
+        finally:
+            await exchange.aclose()
+
+    def get_status(self) -> Dict[str, Any]:
+        """ワーカーの状態（Botの表示用）"""
+        return {
+            'name': self.name,
+            'pid': self.pid,
+            'connected': self.connected,
+            'restarts': self.restarts,
+            'timeouts': self.timeouts,
+            'in_flight': self.in_flight,
+            'last_seen': None if self.last_seen is None else time.monotonic() - self.last_seen
+        }
+
+    async def close(self):
+        """状態確認を停止し、起動したワーカーを終了させる
+
+        Botの終了後に別のイベントループから呼ばれる場合があるため、接続・タスクの後始末は失敗しても続ける
+        """
+        if self._closed:
+            return
+        self._closed = True
+        if self._health_task is not None and not self._health_task.done():
+            try:
+                self._health_task.cancel()
+            except RuntimeError:
+                pass
+        if self._writer is not None:
+            try:
+                self._disconnect(self._writer)
+            except RuntimeError:
+                self._writer = None
+        if self.spawn and self._process is not None and self._process.poll() is None:
+            # SIGTERMでブラウザを閉じてから終了する
+            self._process.terminate()
+            try:
+                await asyncio.get_running_loop().run_in_executor(None, self._process.wait, WORKER_STOP_TIMEOUT)
+            except subprocess.TimeoutExpired:
+                logger.warning(f"Scraper worker {self.name} did not stop in time; killing it")
+                self._process.kill()
+            logger.info(f"Scraper worker {self.name} stopped")
+
+
+def worker_socket_paths() -> List[str]:
+    """SCRAPER_WORKER_SOCKETに指定したワーカーごとのソケットのパス"""
+    return [path.strip() for path in SCRAPER_WORKER_SOCKET.split(',') if path.strip()]
+
+
+class ScraperWorkerPool:
+    """複数のワーカーをコンシステントハッシュで使い分ける
+
+    キーを担当するワーカーが起動し直せない間は、ハッシュリング上の次のワーカーに回す
+    """
+
+    def __init__(self, count: int = SCRAPER_WORKERS, spawn: bool = SCRAPER_WORKER_SPAWN, virtual_nodes: int = WORKER_VIRTUAL_NODES):
+        """
+        Args:
+            count: 起動するワーカー数（起動しない場合はSCRAPER_WORKER_SOCKETに指定したソケットの数）
+            spawn: ワーカーを子プロセスとして起動するか
+            virtual_nodes: ハッシュリング上の1ワーカーあたりの仮想ノード数
+        """
+        self.spawn = spawn
+        self.socket_paths = worker_socket_paths()
+        if not spawn:
+            count = len(self.socket_paths)
+            if not count:
+                raise ValueError("SCRAPER_WORKER_SPAWN=false requires SCRAPER_WORKER_SOCKET")
+        self.workers: Dict[str, ScraperWorkerClient] = {}
+        self.ring = HashRing(virtual_nodes=virtual_nodes)
+        self._started = False
+        self._resize_lock = asyncio.Lock()
+        # 統計
+        self.failovers = 0  # 担当のワーカーが使えず次のワーカーに回した回数
+        for index in range(max(count, 1)):
+            self._add_worker(index)
+
+    def __len__(self) -> int:
+        return len(self.workers)
+
+    def _add_worker(self, index: int) -> ScraperWorkerClient:
+        name = f"worker{index}"
+        client = ScraperWorkerClient(
+            name=name,
+            socket_path=self.socket_paths[index] if index < len(self.socket_paths) else None,
+            spawn=self.spawn,
+            metrics_port=SCRAPER_WORKER_METRICS_PORT + index if SCRAPER_WORKER_METRICS_PORT else 0
+        )
+        self.workers[name] = client
+        self.ring.add(name)
+        if self._started:
+            client.start()
+        return client
+
+    def owner(self, key: str) -> Optional[str]:
+        """キーを担当するワーカー名"""
+        return self.ring.get(key)
+
+    def select(self, key: str) -> Tuple[ScraperWorkerClient, bool]:
+        """キーを担当するワーカーと、代わりのワーカーかどうか（使えない場合はリング上の次の使えるワーカー）"""
+        primary = None
+        for name in self.ring.iter_nodes(key):
+            client = self.workers[name]
+            if primary is None:
+                primary = client
+            if client.available:
+                return client, client is not primary
+        # 全て使えない場合は担当のワーカーで失敗させる
+        return primary, False
+
+    def route(self, key: str) -> ScraperWorkerClient:
+        """要求を送るワーカーを選ぶ"""
+        client, failover = self.select(key)
+        if failover:
+            self.failovers += 1
+        return client
+
+    async def call(self, key: str, method: str, params: Optional[Dict[str, Any]] = None) -> Any:
+        """キーを担当するワーカーに要求を送り、結果を返す"""
+        return await self.route(key).call(method, params)
+
+    def exchange(self, key: str, method: str, params: Optional[Dict[str, Any]] = None) -> AsyncIterator[Tuple[str, Any]]:
+        """キーを担当するワーカーに要求を送り、途中経過と結果を返す"""
+        return self.route(key).exchange(method, params)
+
+    async def broadcast(self, method: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """全てのワーカーに要求を送る（ワーカー名→結果または例外）"""
+        names = list(self.workers)
+        results = await asyncio.gather(*(self.workers[name].call(method, params) for name in names), return_exceptions=True)
+        return dict(zip(names, results))
+
+    def start(self):
+        """全てのワーカーの状態確認を開始"""
+        self._started = True
+        for client in self.workers.values():
+            client.start()
+
+    async def resize(self, count: int):
+        """ワーカー数を変更（増やす場合は追加、減らす場合は番号の大きいワーカーから実行中の要求の完了を待って終了）
+
+        担当が変わるのは追加・削除したワーカーの分のキーのみで、他のワーカーのキャッシュはそのまま使える
+        """
+        if not self.spawn:
+            raise ValueError("Workers can only be resized when the bot spawns them")
+        if count < 1:
+            raise ValueError("At least one worker is required")
+        async with self._resize_lock:
+            while len(self.workers) < count:
+                client = self._add_worker(len(self.workers))
+                logger.info(f"Added scraper worker {client.name}")
+            while len(self.workers) > count:
+                name = f"worker{len(self.workers) - 1}"
+                # 先にリングから外して新しい要求を他のワーカーに回す
+                self.ring.remove(name)
+                client = self.workers[name]
+                if not await wait_until_drained(lambda: client.in_flight, WORKER_DRAIN_TIMEOUT):
+                    logger.warning(f"Timed out waiting for in-flight requests on scraper worker {name}; stopping anyway")
+                await client.close()
+                del self.workers[name]
+                logger.info(f"Removed scraper worker {name}")
+
+    def get_status(self) -> List[Dict[str, Any]]:
+        """ワーカーごとの状態と担当するキーの割合"""
+        shares = self.ring.shares()
+        return [{**client.get_status(), 'share': shares.get(name, 0.0)} for name, client in self.workers.items()]
+
+    def get_scrape_stats(self) -> Dict[str, float]:
+        """全ワーカーのFANZAスクレイピングの回数・平均時間・エラー数（最後の状態確認の値）"""
+        count = errors = total = 0.0
+        for client in self.workers.values():
+            stats = client.last_stats.get('scrape')
+            if stats:
+                count += stats['count']
+                total += stats['avg'] * stats['count']
+                errors += stats['errors']
+        return {'count': int(count), 'avg': total / count if count else 0.0, 'errors': errors}
+
+    def get_admission_stats(self) -> Dict[str, int]:
+        """全ワーカーの受付制御の使用中の枠・上限・待ち件数の合計"""
+        totals = {'active': 0, 'max_concurrent': 0, 'queued': 0}
+        for client in self.workers.values():
+            stats = client.last_stats.get('admission') or {}
+            for key in totals:
+                totals[key] += stats.get(key, 0)
+        return totals
+
+    def cache_hit_rate(self, cache_name: str) -> Optional[float]:
+        """全ワーカーのキャッシュのヒット率（期限切れデータの返却を含む、参照がない場合はNone）"""
+        hits = lookups = 0
+        for client in self.workers.values():
+            stats = client.last_stats.get('caches', {}).get(cache_name)
+            if stats:
+                hits += stats['hits'] + stats['stale_hits']
+                lookups += stats['hits'] + stats['stale_hits'] + stats['misses']
+        return hits / lookups if lookups else None
+
+    async def close(self):
+        """全てのワーカーを終了させる"""
+        for client in list(self.workers.values()):
+            await client.close()
+
+
+class _CacheMirror:
+    """ワーカーのキャッシュの取得時刻・有効期限の手元の記録（キャッシュキー→情報）"""
+
+    def __init__(self, pool: ScraperWorkerPool, max_entries: int = CACHE_MIRROR_MAX_ENTRIES):
+        self.pool = pool
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[Optional[datetime], float, str, int]]" = OrderedDict()
+
+    def remember(self, key: str, info: Dict[str, Any], client: ScraperWorkerClient):
+        """応答に含まれるキャッシュ情報（fetched_at・remaining）を応答したワーカーと共に記録"""
+        if info.get('remaining') is None:
+            self._entries.pop(key, None)
+            return
+        fetched_at = datetime.fromisoformat(info['fetched_at']) if info.get('fetched_at') else None
+        self._entries[key] = (fetched_at, time.monotonic() + info['remaining'], client.name, client.generation)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _get(self, key: str) -> Optional[Tuple[Optional[datetime], float]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        fetched_at, expires_at, name, generation = entry
+        client = self.pool.workers.get(name)
+        # 次の要求が別のワーカーに届く場合（ワーカー数の変更・代わりのワーカーで応答した場合）や
+        # 接続し直した後（ワーカーが起動し直した可能性がある）、猶予期間を過ぎた記録は使わない
+        if (client is None or client.generation != generation or self.pool.select(key)[0] is not client
+                or time.monotonic() - expires_at > CACHE_STALE_GRACE):
+            del self._entries[key]
+            return None
+        return fetched_at, expires_at - time.monotonic()
+
+    def timestamp(self, key: str) -> Optional[datetime]:
+        entry = self._get(key)
+        return entry[0] if entry else None
+
+    def remaining(self, key: str) -> Optional[float]:
+        entry = self._get(key)
+        return entry[1] if entry else None
+
+
+class RemoteFanzaScraper:
+    """ワーカーのFanzaScraperを呼び出す（FanzaScraperと同じ呼び出し方、検索条件のキャッシュキーでワーカーを選ぶ）"""
+
+    def __init__(self, pool: ScraperWorkerPool):
+        self.pool = pool
+        self._cache_info = _CacheMirror(pool)
+
+    @staticmethod
+    def _params(url: Optional[str], query: Optional[FanzaQuery], **params) -> Dict[str, Any]:
+        return {'url': url, 'query': dataclasses.asdict(query) if query is not None else None, **params}
+
+    async def get_high_rated_products(self, url: str = None, max_items: Optional[int] = None, force_refresh: bool = False, query: Optional[FanzaQuery] = None) -> List[Dict[str, any]]:
+        """高評価商品を取得"""
+        _, cache_key = resolve_target(url, query)
+        client = self.pool.route(cache_key)
+        result = await client.call('fanza.get_high_rated_products', self._params(url, query, max_items=max_items, force_refresh=force_refresh))
+        self._cache_info.remember(cache_key, result['cache'], client)
+        return result['products']
+
+    async def stream_high_rated_products(self, url: str = None, force_refresh: bool = False, query: Optional[FanzaQuery] = None) -> AsyncIterator[List[Dict[str, any]]]:
+        """高評価商品を取得できた順にバッチで返す"""
+        _, cache_key = resolve_target(url, query)
+        client = self.pool.route(cache_key)
+        exchange = client.exchange('fanza.stream_high_rated_products', self._params(url, query, force_refresh=force_refresh))
+        try:
+            async for kind, payload in exchange:
+                if kind == 'stream':
+                    yield payload
+                else:
+                    self._cache_info.remember(cache_key, payload['cache'], client)
+        finally:
+            await exchange.aclose()
+
+    def format_rating_stars(self, rating: float) -> str:
+        """評価を星マークで表現"""
+        return format_rating_stars(rating)
+
+    def get_cache_timestamp(self, url: str = None, query: Optional[FanzaQuery] = None) -> Optional[datetime]:
+        """キャッシュされたデータの取得時刻を取得（ワーカーから最後に受け取った情報）"""
+        return self._cache_info.timestamp(resolve_target(url, query)[1])
+
+    def get_cache_remaining(self, url: str = None, query: Optional[FanzaQuery] = None) -> Optional[float]:
+        """キャッシュの有効期限までの残り秒数を取得（ワーカーから最後に受け取った情報）"""
+        return self._cache_info.remaining(resolve_target(url, query)[1])
+
+    async def warm_up(self):
+        """全てのワーカーを起動してページプールを事前に準備"""
+        for name, result in (await self.pool.broadcast('fanza.warm_up')).items():
+            if isinstance(result, Exception):
+                logger.warning(f"Failed to warm up scraper worker {name}: {result}")
+
+    async def close(self):
+        """ワーカーを終了させる"""
+        await self.pool.close()
+
+
+class RemoteMissAVScraper:
+    """ワーカーのMissAVScraperを呼び出す（MissAVScraperと同じ呼び出し方、正規化したタイトル・品番でワーカーを選ぶ）"""
+
+    def __init__(self, pool: ScraperWorkerPool):
+        self.pool = pool
+        self._cache_info = _CacheMirror(pool)
+
+    async def search_videos(self, title: str, force_refresh: bool = False) -> List[Dict[str, any]]:
+        """タイトルで動画を検索"""
+        key = normalize_title(title)
+        client = self.pool.route(key)
+        result = await client.call('missav.search_videos', {'title': title, 'force_refresh': force_refresh})
+        self._cache_info.remember(key, result['cache'], client)
+        return result['videos']
+
+    async def lookup_content_id(self, content_id: str) -> Tuple[bool, Optional[str]]:
+        """FANZA品番に対応するMissAV URLを参照"""
+        found, missav_url = await self.pool.call(content_id, 'missav.lookup_content_id', {'content_id': content_id})
+        return found, missav_url
+
+    async def remember_content_id(self, content_id: str, missav_url: Optional[str]):
+        """FANZA品番とMissAV URLの対応を記録"""
+        await self.pool.call(content_id, 'missav.remember_content_id', {'content_id': content_id, 'missav_url': missav_url})
+
+    def normalize_title(self, title: str) -> str:
+        """キャッシュ・集約キー用にタイトルを正規化"""
+        return normalize_title(title)
+
+    def is_search_cached(self, title: str) -> bool:
+        """検索結果が有効期限内のままキャッシュされているか（ワーカーから最後に受け取った情報）"""
+        remaining = self._cache_info.remaining(normalize_title(title))
+        return remaining is not None and remaining > 0
+
+    async def close(self):
+        """ワーカーを終了させる"""
+        await self.pool.close()
@@ -0,0 +1,317 @@
+"""
+スクレイピングのワーカープロセス
+FANZA・MissAVのスクレイパーとブラウザの監視をBotとは別のプロセスで実行し、Unixソケット上の
+1行1JSONのメッセージで呼び出せるようにする（Bot側のクライアントはscraper_client.py）
+ブラウザの操作・HTMLの解析・受付制御の待ち行列はこのプロセスで処理されるため、
+Botのイベントループ（ゲートウェイのハートビート・ボタン操作）を妨げず、ブラウザの異常終了やメモリもBotから切り離される
+
+    要求:     {"id": 1, "method": "fanza.get_high_rated_products", "params": {...}, "guild_id": 123, "trace_id": "..."}
+    応答:     {"id": 1, "result": ...} / {"id": 1, "error": {"type": "...", "message": "...", "reason": "..."}}
+    途中経過: {"id": 1, "stream": [...]}（逐次取得のバッチ） / {"id": 1, "queue_position": 3}（待ち行列での順番）
+    中断:     {"id": 1, "cancel": true}
+
+起動: python scraper_worker.py --socket /tmp/fanza-scraper.sock [--parent-pid PID]
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import signal
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+import admission
+import metrics
+import tracing
+from admission import AdmissionRejected
+from browser_watchdog import BrowserWatchdog, reap_orphaned_browsers
+from cache_store import close_default_store
+from fanza_query import FanzaQuery
+from missav_scraper import MissAVScraper
+from playwright_scraper import FanzaScraper
+from config import (
+    LOG_LEVEL, LOG_FORMAT, ENABLE_BROWSER_WATCHDOG, REAP_ORPHANED_BROWSERS,
+    SCRAPER_WORKER_METRICS_PORT, WORKER_MESSAGE_LIMIT
+)
+
+logger = logging.getLogger(__name__)
+
+PARENT_CHECK_INTERVAL = 5  # 親プロセス（Bot）の終了を確認する間隔（秒）
+
+Send = Callable[[Dict[str, Any]], Awaitable[None]]
+
+
+def encode_message(message: Dict[str, Any]) -> bytes:
+    """メッセージを1行のJSONに変換"""
+    return json.dumps(message, ensure_ascii=False, separators=(',', ':')).encode('utf-8') + b'\n'
+
+
+def decode_message(line: bytes) -> Dict[str, Any]:
+    """1行のJSONをメッセージに変換"""
+    return json.loads(line)
+
+
+def _query_from_params(params: Dict[str, Any]) -> Optional[FanzaQuery]:
+    query = params.get('query')
+    return FanzaQuery(**query) if query is not None else None
+
+
+class ScraperWorker:
+    """スクレイパーを保持し、ソケットから受けた要求を実行する"""
+
+    def __init__(self):
+        self.scraper = FanzaScraper()
+        self.missav_scraper = MissAVScraper()
+        self.browser_watchdog = BrowserWatchdog({"fanza": self.scraper.playwright_scraper, "missav": self.missav_scraper})
+        self.started_at = time.monotonic()
+        self.active_requests = 0
+        self.served = 0
+        self.failed = 0
+        self._stopping = asyncio.Event()
+        self._connections: Set[asyncio.Task] = set()
+        # ストリーミングしない要求: メソッド名→コルーチン関数（paramsを受け取り結果を返す）
+        self._methods: Dict[str, Callable[[Dict[str, Any]], Awaitable[Any]]] = {
+            'fanza.get_high_rated_products': self._get_high_rated_products,
+            'fanza.warm_up': self._warm_up,
+            'missav.search_videos': self._search_videos,
+            'missav.lookup_content_id': self._lookup_content_id,
+            'missav.remember_content_id': self._remember_content_id,
+            'stats': self._stats
+        }
+        # ストリーミングする要求: メソッド名→(途中経過の送信関数, params)を受け取り結果を返すコルーチン関数
+        self._stream_methods: Dict[str, Callable[[Send, Dict[str, Any]], Awaitable[Any]]] = {
+            'fanza.stream_high_rated_products': self._stream_high_rated_products
+        }
+
+    def _fanza_cache(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Bot側で参照するキャッシュの取得時刻・残り秒数"""
+        url, query = params.get('url'), _query_from_params(params)
+        fetched_at = self.scraper.get_cache_timestamp(url, query)
+        return {
+            'fetched_at': fetched_at.isoformat() if fetched_at else None,
+            'remaining': self.scraper.get_cache_remaining(url, query)
+        }
+
+    def _missav_cache(self, title: str) -> Dict[str, Any]:
+        return {'remaining': self.missav_scraper.get_search_cache_remaining(title)}
+
+    async def _get_high_rated_products(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        products = await self.scraper.get_high_rated_products(
+            url=params.get('url'),
+            max_items=params.get('max_items'),
+            force_refresh=params.get('force_refresh', False),
+            query=_query_from_params(params)
+        )
+        return {'products': products, 'cache': self._fanza_cache(params)}
+
+    async def _stream_high_rated_products(self, send: Send, params: Dict[str, Any]) -> Dict[str, Any]:
+        stream = self.scraper.stream_high_rated_products(
+            url=params.get('url'),
+            force_refresh=params.get('force_refresh', False),
+            query=_query_from_params(params)
+        )
+        try:
+            async for batch in stream:
+                await send({'stream': batch})
+        finally:
+            await stream.aclose()
+        return {'cache': self._fanza_cache(params)}
+
+    async def _warm_up(self, params: Dict[str, Any]):
+        await self.scraper.warm_up()
+
+    async def _search_videos(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        title = params['title']
+        videos = await self.missav_scraper.search_videos(title, force_refresh=params.get('force_refresh', False))
+        return {'videos': videos, 'cache': self._missav_cache(title)}
+
+    async def _lookup_content_id(self, params: Dict[str, Any]):
+        found, missav_url = await self.missav_scraper.lookup_content_id(params['content_id'])
+        return [found, missav_url]
+
+    async def _remember_content_id(self, params: Dict[str, Any]):
+        await self.missav_scraper.remember_content_id(params['content_id'], params.get('missav_url'))
+
+    async def _stats(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        scrape_stats = metrics.SCRAPE_DURATION.summary(source="fanza")
+        return {
+            'pid': os.getpid(),
+            'uptime': time.monotonic() - self.started_at,
+            'active_requests': self.active_requests,
+            'served': self.served,
+            'failed': self.failed,
+            'browsers': metrics.browser_stats(),
+            'caches': metrics.cache_stats(),
+            'admission': admission.scrape_admission.get_stats(),
+            'watchdog': self.browser_watchdog.get_stats(),
+            'scrape': {'count': scrape_stats['count'], 'avg': scrape_stats['avg'], 'errors': metrics.SCRAPE_ERRORS.value(source="fanza")}
+        }
+
+    async def _execute(self, request_id: int, message: Dict[str, Any], send: Send):
+        """1件の要求を実行して応答を送信（要求元サーバー・相関IDはクライアントから引き継ぐ）"""
+        method = message.get('method')
+        params = message.get('params') or {}
+        admission.set_guild(message.get('guild_id'))
+
+        async def notify_queue_position(position: int):
+            await send({'id': request_id, 'queue_position': position})
+
+        async def send_stream(payload: Dict[str, Any]):
+            await send({'id': request_id, **payload})
+
+        notifier_token = admission.set_queue_notifier(notify_queue_position)
+        trace = tracing.begin_trace(method or "unknown", message.get('trace_id') or f"worker-{request_id}")
+        self.active_requests += 1
+        try:
+            if method in self._stream_methods:
+                result = await self._stream_methods[method](send_stream, params)
+            elif method in self._methods:
+                result = await self._methods[method](params)
+            else:
+                raise ValueError(f"Unknown method: {method}")
+            self.served += 1
+            await send({'id': request_id, 'result': result})
+        except asyncio.CancelledError:
+            raise
+        except AdmissionRejected as e:
+            self.failed += 1
+            await send({'id': request_id, 'error': {'type': 'AdmissionRejected', 'message': str(e), 'reason': e.reason}})
+        except Exception as e:
+            self.failed += 1
+            logger.error(f"Worker request {method} failed: {e}")
+            await send({'id': request_id, 'error': {'type': type(e).__name__, 'message': str(e)}})
+        finally:
+            # 応答後も実行中のスクレイピングの共有が続いている場合に、終わった要求へ順番を送らない
+            admission.reset_queue_notifier(notifier_token)
+            self.active_requests -= 1
+            trace.finish()
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """クライアントの接続ごとに要求を読み取り、要求ごとのタスクで並行に実行する"""
+        write_lock = asyncio.Lock()
+        tasks: Dict[int, asyncio.Task] = {}
+        connection = asyncio.current_task()
+        self._connections.add(connection)
+
+        async def send(message: Dict[str, Any]):
+            async with write_lock:
+                writer.write(encode_message(message))
+                await writer.drain()
+
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    message = decode_message(line)
+                    request_id = message['id']
+                except (ValueError, KeyError, TypeError) as e:
+                    logger.error(f"Dropping malformed message from client: {e}")
+                    continue
+                if message.get('cancel'):
+                    # 呼び出し元が待つのをやめた要求（実行中のスクレイピング自体は共有先のために続く）
+                    task = tasks.get(request_id)
+                    if task:
+                        task.cancel()
+                    continue
+                task = asyncio.create_task(self._execute(request_id, message, send))
+                tasks[request_id] = task
+                task.add_done_callback(lambda t, request_id=request_id: tasks.pop(request_id, None))
+        except (ConnectionError, asyncio.LimitOverrunError, ValueError) as e:
+            logger.warning(f"Client connection error: {e}")
+        except asyncio.CancelledError:
+            # ワーカーの終了時（接続のタスクはストリームのコールバックで結果を参照されるため正常に終える）
+            pass
+        finally:
+            for task in list(tasks.values()):
+                task.cancel()
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+            writer.close()
+            self._connections.discard(connection)
+
+    async def _watch_parent(self, parent_pid: int):
+        """親プロセスが終了したらワーカーも終了する（孤立したブラウザを残さない）"""
+        while not self._stopping.is_set():
+            await asyncio.sleep(PARENT_CHECK_INTERVAL)
+            if os.getppid() != parent_pid:
+                logger.warning(f"Parent process {parent_pid} exited; shutting down worker")
+                self._stopping.set()
+
+    async def serve(self, socket_path: str, parent_pid: Optional[int] = None):
+        """ソケットで要求を受け付け、終了要求・シグナル・親プロセスの終了まで実行する"""
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, self._stopping.set)
+
+        if os.path.exists(socket_path):
+            # 前回のワーカーが残したソケット
+            os.unlink(socket_path)
+        server = await asyncio.start_unix_server(self.handle_connection, path=socket_path, limit=WORKER_MESSAGE_LIMIT)
+        os.chmod(socket_path, 0o600)
+        logger.info(f"Scraper worker {os.getpid()} listening on {socket_path}")
+
+        background: Set[asyncio.Task] = set()
+        if parent_pid:
+            background.add(asyncio.create_task(self._watch_parent(parent_pid)))
+        if ENABLE_BROWSER_WATCHDOG:
+            self.browser_watchdog.start()
+        try:
+            await metrics.start_metrics_server(port=SCRAPER_WORKER_METRICS_PORT)
+        except Exception as e:
+            logger.error(f"Failed to start worker metrics endpoint: {e}")
+
+        try:
+            await self._stopping.wait()
+        finally:
+            server.close()
+            for task in background | self._connections:
+                task.cancel()
+            await asyncio.gather(*background, *self._connections, return_exceptions=True)
+            await self.close()
+            try:
+                os.unlink(socket_path)
+            except OSError:
+                pass
+
+    async def close(self):
+        """スクレイパー・監視を停止"""
+        await self.browser_watchdog.stop()
+        await metrics.stop_metrics_server()
+        try:
+            await self.scraper.close()
+        except Exception as e:
+            logger.error(f"Error closing scraper: {e}")
+        try:
+            await self.missav_scraper.close()
+        except Exception as e:
+            logger.error(f"Error closing MissAV scraper: {e}")
+        close_default_store()
+        logger.info("Scraper worker stopped")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="FANZA・MissAVスクレイピングのワーカープロセス")
+    parser.add_argument('--socket', required=True, help="要求を受け付けるUnixソケットのパス")
+    parser.add_argument('--parent-pid', type=int, default=None, help="このプロセスが終了したらワーカーも終了する")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=LOG_LEVEL, format=f"[worker] {LOG_FORMAT}")
+    tracing.install_log_record_factory()
+
+    # 前回のワーカーが残したブラウザを終了させる（強制終了された場合など）
+    if REAP_ORPHANED_BROWSERS:
+        try:
+            reap_orphaned_browsers()
+        except Exception as e:
+            logger.error(f"Failed to reap orphaned browsers: {e}")
+
+    async def run():
+        await ScraperWorker().serve(args.socket, args.parent_pid)
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""
+シャード構成
+AutoShardedBotで複数のゲートウェイ接続（シャード）を扱う場合の設定の解釈、シャードごとの計測、
+担当するシャードを分割して複数のローカルプロセスで起動する監視プロセスを提供する
+"""
+
+import logging
+import os
+import signal
+import subprocess
+import sys
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+import metrics
+from config import (
+    ENABLE_SHARDING, SHARD_COUNT, SHARD_IDS, SHARD_PROCESSES, METRICS_PORT,
+    RATE_LIMIT_GLOBAL_CAPACITY, RATE_LIMIT_GLOBAL_REFILL, SCRAPE_MAX_CONCURRENT
+)
+
+logger = logging.getLogger(__name__)
+
+PROCESS_RESTART_DELAY = 5  # 異常終了したシャードプロセスを起動し直すまでの秒数
+PROCESS_STOP_TIMEOUT = 30  # 終了要求後にシャードプロセスの終了を待つ最大秒数
+
+
+def parse_shard_ids(value: str) -> Optional[List[int]]:
+    """"0-3,8"のような指定をシャードIDの一覧に変換（空の場合はNone＝全シャード）"""
+    ids = set()
+    for part in value.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        if '-' in part:
+            start, end = part.split('-', 1)
+            ids.update(range(int(start), int(end) + 1))
+        else:
+            ids.add(int(part))
+    return sorted(ids) or None
+
+
+def format_shard_ids(shard_ids: Iterable[int]) -> str:
+    """シャードIDの一覧を"0-3,8"の形式にまとめる"""
+    ranges: List[Tuple[int, int]] = []
+    for shard_id in sorted(shard_ids):
+        if ranges and shard_id == ranges[-1][1] + 1:
+            ranges[-1] = (ranges[-1][0], shard_id)
+        else:
+            ranges.append((shard_id, shard_id))
+    return ','.join(str(start) if start == end else f"{start}-{end}" for start, end in ranges)
+
+
+def split_shard_ids(shard_ids: List[int], processes: int) -> List[List[int]]:
+    """シャードIDをプロセス数で連続した範囲に分割"""
+    processes = max(1, min(processes, len(shard_ids)))
+    size, extra = divmod(len(shard_ids), processes)
+    groups = []
+    start = 0
+    for index in range(processes):
+        end = start + size + (1 if index < extra else 0)
+        groups.append(shard_ids[start:end])
+        start = end
+    return groups
+
+
+def bot_options() -> Dict[str, object]:
+    """AutoShardedBotに渡すシャードの設定（SHARD_COUNTが0の場合はDiscordの推奨数）"""
+    if not ENABLE_SHARDING:
+        return {}
+    shard_ids = parse_shard_ids(SHARD_IDS)
+    if shard_ids and not SHARD_COUNT:
+        logger.warning("SHARD_IDS requires SHARD_COUNT; running all recommended shards instead")
+        shard_ids = None
+    options: Dict[str, object] = {'shard_count': SHARD_COUNT or None}
+    if shard_ids:
+        options['shard_ids'] = shard_ids
+    return options
+
+
+def register_shard_metrics(bot):
+    """シャードごとの遅延・担当サーバー数をメトリクスに追加"""
+    def collect_latency():
+        latencies = getattr(bot, 'latencies', None) or [(0, bot.latency)]
+        return [({'shard': str(shard_id)}, latency) for shard_id, latency in latencies if latency == latency]  # 未接続のNaNを除く
+
+    def collect_guilds():
+        counts: Dict[int, int] = {}
+        for guild in bot.guilds:
+            counts[guild.shard_id] = counts.get(guild.shard_id, 0) + 1
+        return [({'shard': str(shard_id)}, count) for shard_id, count in counts.items()]
+
+    metrics.REGISTRY.callback("fanza_bot_shard_latency_seconds", "Gateway heartbeat latency per shard", "gauge", collect_latency)
+    metrics.REGISTRY.callback("fanza_bot_shard_guilds", "Guilds handled per shard", "gauge", collect_guilds)
+
+
+def per_process_limits(processes: int) -> Dict[str, str]:
+    """Bot全体の上限をプロセス数で割った値（子プロセスの環境変数として渡す）
+
+    レート制限の全体のバケットとスクレイピングの同時実行数はプロセスごとに持つため、
+    そのまま渡すとプロセス数倍になる
+    """
+    return {
+        'RATE_LIMIT_GLOBAL_CAPACITY': str(RATE_LIMIT_GLOBAL_CAPACITY / processes),
+        'RATE_LIMIT_GLOBAL_REFILL': str(RATE_LIMIT_GLOBAL_REFILL / processes),
+        'SCRAPE_MAX_CONCURRENT': str(max(1, SCRAPE_MAX_CONCURRENT // processes)),
+    }
+
+
+def should_run_shard_processes() -> bool:
+    """シャードを複数のローカルプロセスに分けて起動するかどうか"""
+    return ENABLE_SHARDING and SHARD_PROCESSES > 1
+
+
+def run_shard_processes() -> int:
+    """担当シャードを分割して子プロセスでBotを起動し、終了まで監視する
+
+    異常終了したプロセスは一定時間後に起動し直す。SIGINT・SIGTERMを受けると全プロセスを終了させる
+    各プロセスのメトリクスのポートはMETRICS_PORTからの連番になり、Bot全体の上限はプロセス数で分割する
+
+    Returns:
+        終了コード
+    """
+    if not SHARD_COUNT:
+        logger.error("SHARD_PROCESSES > 1 requires an explicit SHARD_COUNT")
+        return 1
+    shard_ids = parse_shard_ids(SHARD_IDS) or list(range(SHARD_COUNT))
+    groups = split_shard_ids(shard_ids, SHARD_PROCESSES)
+    limits = per_process_limits(len(groups))
+
+    def spawn(index: int) -> subprocess.Popen:
+        env = dict(os.environ, **limits, SHARD_IDS=format_shard_ids(groups[index]), SHARD_PROCESSES="1")
+        if METRICS_PORT:
+            env['METRICS_PORT'] = str(METRICS_PORT + index)
+        logger.info(f"Starting shard process {index} for shards {env['SHARD_IDS']} of {SHARD_COUNT}")
+        return subprocess.Popen([sys.executable] + sys.argv, env=env)
+
+    stopping = False
+
+    def request_stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+
+    previous_handlers = {sig: signal.signal(sig, request_stop) for sig in (signal.SIGINT, signal.SIGTERM)}
+    children = [spawn(index) for index in range(len(groups))]
+    restart_at: Dict[int, float] = {}
+    try:
+        while not stopping:
+            time.sleep(1)
+            for index, child in enumerate(children):
+                code = child.poll()
+                if code is None:
+                    continue
+                if code == 0:
+                    # 正常終了したプロセスがあれば全体を終了する
+                    stopping = True
+                    break
+                if index not in restart_at:
+                    logger.error(f"Shard process {index} exited with code {code}; restarting in {PROCESS_RESTART_DELAY}s")
+                    restart_at[index] = time.monotonic() + PROCESS_RESTART_DELAY
+                elif time.monotonic() >= restart_at[index]:
+                    del restart_at[index]
+                    children[index] = spawn(index)
+    finally:
+        for child in children:
+            if child.poll() is None:
+                # KeyboardInterruptとして受け取り、ブラウザなどを片付けてから終了する
+                child.send_signal(signal.SIGINT)
+        deadline = time.monotonic() + PROCESS_STOP_TIMEOUT
+        for child in children:
+            try:
+                child.wait(timeout=max(deadline - time.monotonic(), 0.1))
+            except subprocess.TimeoutExpired:
+                child.kill()
+        for sig, handler in previous_handlers.items():
+            signal.signal(sig, handler)
+    return 0
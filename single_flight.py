@@ -0,0 +1,51 @@
+"""
+実行中リクエストの集約（シングルフライト）
+同じキーの処理が実行中であれば新たに開始せず、その結果または例外を共有する
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict
+
+
+class SingleFlight:
+    """キーごとに実行中の処理を1つだけに保つ"""
+
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.started_count = 0
+        self.coalesced_count = 0
+
+    def is_inflight(self, key: str) -> bool:
+        """指定キーの処理が実行中かどうか"""
+        return key in self._inflight
+
+    async def do(self, key: str, func: Callable[[], Awaitable[Any]]) -> Any:
+        """実行中の処理があれば合流し、なければ新たに開始して結果を返す
+
+        処理はタスクとして実行されるため、呼び出し元の1つがキャンセルされても
+        他の待機者への結果の共有は継続される
+        """
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(func())
+            self._inflight[key] = task
+            self.started_count += 1
+            task.add_done_callback(lambda t: self._on_done(key, t))
+        else:
+            self.coalesced_count += 1
+        return await asyncio.shield(task)
+
+    def _on_done(self, key: str, task: asyncio.Future):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # 全ての待機者がキャンセルされた場合の未取得例外の警告を防ぐ
+        if not task.cancelled():
+            task.exception()
+
+    def get_stats(self) -> Dict[str, int]:
+        """集約の統計を取得"""
+        return {
+            'inflight': len(self._inflight),
+            'started': self.started_count,
+            'coalesced': self.coalesced_count
+        }
@@ -0,0 +1,149 @@
+"""
+スクレイピングの受付制御のテスト
+"""
+
+import asyncio
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import admission
+import playwright_scraper
+from admission import AdmissionController
+from playwright_scraper import PlaywrightFanzaScraper
+
+
+class AdmissionControllerTest(unittest.IsolatedAsyncioTestCase):
+    async def test_cancel_during_start_notification_releases_slot(self):
+        controller = AdmissionController(max_concurrent=1, max_queue=10, queue_timeout=10)
+        await controller.acquire("fanza")
+        notifying = asyncio.Event()
+
+        async def notifier(position: int):
+            if position == 0:
+                # 実行開始の通知（Discordのメッセージ編集など）の途中で中断される
+                notifying.set()
+                await asyncio.sleep(10)
+
+        async def request():
+            admission.set_queue_notifier(notifier)
+            async with controller.slot("fanza"):
+                pass
+
+        task = asyncio.create_task(request())
+        await asyncio.sleep(0.05)
+        controller.release()
+        await notifying.wait()
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+        self.assertEqual(controller.active, 0)
+        self.assertEqual(controller.queued, 0)
+
+    async def queue_requests(self, controller: AdmissionController, guilds):
+        """サーバーごとの要求を順に待ち行列に入れ、実行された順を記録するリストと要求のタスクを返す"""
+        order = []
+
+        async def request(guild_id, name):
+            admission.set_guild(guild_id)
+            async with controller.slot("fanza"):
+                order.append(name)
+
+        tasks = []
+        for guild_id, name in guilds:
+            tasks.append(asyncio.create_task(request(guild_id, name)))
+            await asyncio.sleep(0)
+        return order, tasks
+
+    async def test_guilds_are_served_in_turn(self):
+        controller = AdmissionController(max_concurrent=1, max_queue=10, queue_timeout=10)
+        await controller.acquire("fanza")
+        order, tasks = await self.queue_requests(controller, [(1, "a1"), (1, "a2"), (1, "a3"), (2, "b1"), (3, "c1")])
+        self.assertEqual(controller.get_stats()['queued_guilds'], 3)
+        controller.release()
+        await asyncio.gather(*tasks)
+        # 1つのサーバーの要求が続いても、他のサーバーの要求を間に挟む
+        self.assertEqual(order, ["a1", "b1", "c1", "a2", "a3"])
+        self.assertEqual(controller.active, 0)
+
+    async def test_queue_positions_follow_service_order(self):
+        controller = AdmissionController(max_concurrent=1, max_queue=10, queue_timeout=10)
+        await controller.acquire("fanza")
+        _, tasks = await self.queue_requests(controller, [(1, "a1"), (1, "a2"), (2, "b1")])
+        positions = {waiter: waiter.position for lane in controller._lanes.values() for waiter in lane}
+        self.assertEqual(sorted(positions.values()), [1, 2, 3])
+        self.assertEqual(controller._lanes[2][0].position, 2)
+        controller.release()
+        await asyncio.gather(*tasks)
+
+    async def test_full_queue_rejects(self):
+        controller = AdmissionController(max_concurrent=1, max_queue=1, queue_timeout=10)
+        await controller.acquire("fanza")
+        _, tasks = await self.queue_requests(controller, [(1, "a1")])
+        with self.assertRaises(admission.AdmissionRejected) as context:
+            await controller.acquire("fanza")
+        self.assertEqual(context.exception.reason, "queue_full")
+        controller.release()
+        await asyncio.gather(*tasks)
+
+    async def test_wait_timeout_rejects_and_leaves_queue(self):
+        controller = AdmissionController(max_concurrent=1, max_queue=10, queue_timeout=0.05)
+        await controller.acquire("fanza")
+        with self.assertRaises(admission.AdmissionRejected) as context:
+            await controller.acquire("fanza")
+        self.assertEqual(context.exception.reason, "timeout")
+        self.assertEqual(controller.queued, 0)
+        self.assertEqual(controller.get_stats()['rejected'], {'queue_full': 0, 'timeout': 1})
+
+
+class BackgroundContextTest(unittest.IsolatedAsyncioTestCase):
+    async def test_notifier_is_disabled_after_reset(self):
+        notified = []
+
+        async def notifier(position: int):
+            notified.append(position)
+
+        token = admission.set_queue_notifier(notifier)
+        inherited = asyncio.ensure_future(asyncio.sleep(0, result=admission.current_queue_notifier()))
+        admission.reset_queue_notifier(token)
+        await (await inherited)(3)
+        self.assertEqual(notified, [])
+
+    async def test_revalidation_does_not_inherit_requester(self):
+        controller = AdmissionController(max_concurrent=1, max_queue=10, queue_timeout=10)
+        scraper = PlaywrightFanzaScraper()
+        notified = []
+
+        async def notifier(position: int):
+            notified.append(position)
+
+        stale = mock.Mock(is_fresh=False, value=[{'title': "cached"}])
+        await controller.acquire("fanza")
+        with mock.patch.object(playwright_scraper, 'scrape_admission', controller), \
+                mock.patch.object(scraper.cache, 'load_entry', mock.AsyncMock(return_value=stale)), \
+                mock.patch.object(scraper, '_scrape_products', mock.AsyncMock(return_value=[])):
+            async def command():
+                admission.set_guild(1234)
+                token = admission.set_queue_notifier(notifier)
+                try:
+                    return await scraper.get_high_rated_products(url="https://example.com/list/")
+                finally:
+                    admission.reset_queue_notifier(token)
+
+            # コマンドは期限切れのデータを返して終了し、再取得は枠が空くまで待ち行列に残る
+            self.assertEqual(await asyncio.create_task(command()), [{'title': "cached"}])
+            await asyncio.sleep(0.05)
+            self.assertEqual(controller.queued, 1)
+            self.assertEqual(list(controller._lanes), [None])
+
+            controller.release()
+            await asyncio.gather(*scraper._background_tasks)
+        self.assertEqual(notified, [])
+        self.assertEqual(controller.active, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
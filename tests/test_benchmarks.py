@@ -0,0 +1,90 @@
+"""
+ベンチマーク用の固定ページ・ローカルサーバー・計測のテスト
+"""
+
+import os
+import socket
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fixtures import fanza_listing_html, missav_search_html
+from benchmarks.probes import IPCCounter
+from benchmarks.server import FixtureServer
+from playwright_scraper import HttpListingFetcher, parse_listing_html
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class FixturesTest(unittest.TestCase):
+    def test_listing_cards_are_parsed_by_the_scraper(self):
+        raw_cards = parse_listing_html(fanza_listing_html(12, page=2))
+        self.assertEqual(len(raw_cards), 12)
+        self.assertEqual(raw_cards[0]['href'], "/av/content/?id=bench00012")
+        self.assertEqual({card['stars'] for card in raw_cards}, {4, 5})
+        self.assertTrue(all(card['image_matched'] for card in raw_cards))
+
+    def test_empty_listing_page(self):
+        self.assertEqual(parse_listing_html(fanza_listing_html(0)), [])
+
+    def test_saved_html_takes_precedence(self):
+        with tempfile.TemporaryDirectory() as saved_dir:
+            with open(os.path.join(saved_dir, "missav_search.html"), "w", encoding="utf-8") as f:
+                f.write("<html>saved</html>")
+            self.assertEqual(missav_search_html("q", 5, saved_dir), "<html>saved</html>")
+            self.assertIn("data-e2eid=\"content-card\"", fanza_listing_html(1, saved_dir=saved_dir))
+
+
+class FixtureServerTest(unittest.IsolatedAsyncioTestCase):
+    async def test_serves_listing_pages_and_counts_cards(self):
+        server = FixtureServer(port=free_port())
+        server.card_count = 7
+        server.listing_pages = 1
+        await server.start()
+        self.addAsyncCleanup(server.stop)
+        fetcher = HttpListingFetcher()
+        self.addAsyncCleanup(fetcher.close)
+
+        first = await fetcher.fetch_cards(f"{server.base_url}/av/list/?sort=review_rank")
+        second = await fetcher.fetch_cards(f"{server.base_url}/av/list/?sort=review_rank&page=2")
+        self.assertEqual((len(first), len(second)), (7, 0))
+        self.assertEqual((server.request_count, server.cards_served), (2, 7))
+        self.assertEqual(fetcher.get_stats(), {'fetched': 2, 'empty': 1, 'errors': 0})
+
+        server.reset_counters()
+        self.assertEqual((server.request_count, server.cards_served), (0, 0))
+
+
+class IPCCounterTest(unittest.TestCase):
+    def test_install_wraps_and_uninstall_restores(self):
+        from playwright._impl._connection import Channel
+
+        original = Channel.send
+        counter = IPCCounter()
+        counter.install()
+        try:
+            self.assertIsNot(Channel.send, original)
+        finally:
+            counter.uninstall()
+        self.assertIs(Channel.send, original)
+
+    def test_wrapped_send_counts_by_method(self):
+        counter = IPCCounter()
+        send = counter._wrap(lambda channel, method, params=None: f"{method} sent")
+        self.assertEqual(send(None, "goto", {}), "goto sent")
+        send(None, "goto")
+        send(None, "evaluateExpression")
+        self.assertEqual(dict(counter.calls), {'goto': 2, 'evaluateExpression': 1})
+        self.assertEqual(counter.total, 3)
+        counter.reset()
+        self.assertEqual(counter.total, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,134 @@
+"""
+ブラウザの監視と残ったプロセスの後片付けのテスト（ブラウザの代わりにsleepのプロセスを使う）
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+import textwrap
+import time
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import browser_watchdog
+from browser_watchdog import BrowserWatchdog, forget_browser_processes, record_browser_processes, reap_orphaned_browsers
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def is_running(pid: int) -> bool:
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            return f.read().rsplit(')', 1)[1].split()[0] != 'Z'
+    except OSError:
+        return False
+
+
+@unittest.skipUnless(os.path.isdir('/proc'), "requires /proc")
+class ReapOrphanedBrowsersTest(unittest.TestCase):
+    def setUp(self):
+        self.pid_dir = tempfile.mkdtemp()
+        patcher = mock.patch.object(browser_watchdog, 'BROWSER_PID_DIR', self.pid_dir)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.spawned = []
+        self.addCleanup(self.kill_spawned)
+
+    def kill_spawned(self):
+        for pid in self.spawned:
+            try:
+                os.kill(pid, 9)
+            except OSError:
+                pass
+
+    def spawn_sleep(self) -> subprocess.Popen:
+        process = subprocess.Popen(["sleep", "60"])
+        self.addCleanup(process.wait)
+        self.addCleanup(process.kill)
+        return process
+
+    def test_reaps_only_processes_recorded_by_an_exited_owner(self):
+        # 記録したプロセス（Bot）が後片付けをせずに終了し、ドライバー役のプロセスが残る
+        script = textwrap.dedent(f"""
+            import subprocess, sys
+            sys.path.insert(0, {ROOT!r})
+            import browser_watchdog
+            browser_watchdog.BROWSER_PID_DIR = {self.pid_dir!r}
+            driver = subprocess.Popen(["sleep", "60"], start_new_session=True, stdout=subprocess.DEVNULL)
+            browser_watchdog.record_browser_processes("fanza", driver.pid)
+            print(driver.pid)
+        """)
+        orphan_pid = int(subprocess.check_output([sys.executable, "-c", script], cwd=ROOT).split()[-1])
+        self.spawned.append(orphan_pid)
+        # 記録していない同じユーザーのプロセスと、動作中のプロセスが記録したプロセス
+        unrelated = self.spawn_sleep()
+        live = self.spawn_sleep()
+        record_browser_processes("missav", live.pid)
+        self.addCleanup(forget_browser_processes, "missav")
+
+        self.assertEqual(reap_orphaned_browsers(grace=1.0), 1)
+        deadline = time.monotonic() + 5
+        while is_running(orphan_pid) and time.monotonic() < deadline:
+            time.sleep(0.05)
+        self.assertFalse(is_running(orphan_pid))
+        self.assertTrue(is_running(unrelated.pid))
+        self.assertTrue(is_running(live.pid))
+        self.assertEqual(sorted(os.listdir(self.pid_dir)), [f"{os.getpid()}.json"])
+
+    def test_reused_pid_is_not_reaped(self):
+        process = self.spawn_sleep()
+        browser_watchdog._write_pid_file(os.path.join(self.pid_dir, "999999999.json"), {
+            'owner': [999999999, 1],
+            'browsers': {'fanza': [[process.pid, 1]]}  # 起動時刻が異なる＝別のプロセス
+        })
+        self.assertEqual(reap_orphaned_browsers(grace=0.1), 0)
+        self.assertTrue(is_running(process.pid))
+        self.assertEqual(os.listdir(self.pid_dir), [])
+
+    def test_forget_removes_record(self):
+        process = self.spawn_sleep()
+        record_browser_processes("fanza", process.pid)
+        self.assertEqual(os.listdir(self.pid_dir), [f"{os.getpid()}.json"])
+        forget_browser_processes("fanza")
+        self.assertEqual(os.listdir(self.pid_dir), [])
+
+
+class FakeTarget:
+    def __init__(self, scrapes: int = 0, pages: int = 1):
+        self.scrapes_since_launch = scrapes
+        self.pages = pages
+        self.recycled = []
+
+    def get_browser_stats(self):
+        return {'browsers': 1, 'pages': self.pages}
+
+    def browser_driver_pid(self):
+        return None
+
+    async def recycle_browser(self, reason: str) -> bool:
+        self.recycled.append(reason)
+        return True
+
+
+class BrowserWatchdogCheckTest(unittest.IsolatedAsyncioTestCase):
+    async def check(self, target, probe_time=0.1, **options):
+        watchdog = BrowserWatchdog({}, **options)
+        with mock.patch.object(watchdog, 'probe', mock.AsyncMock(return_value=probe_time)):
+            return await watchdog.check("fanza", target)
+
+    async def test_healthy_browser_is_kept(self):
+        target = FakeTarget(scrapes=10)
+        self.assertIsNone(await self.check(target, recycle_after=100))
+        self.assertEqual(target.recycled, [])
+
+    async def test_recycle_reasons(self):
+        self.assertEqual(await self.check(FakeTarget(), probe_time=None), "unresponsive")
+        self.assertEqual(await self.check(FakeTarget(pages=40), max_pages=32), "pages")
+        self.assertEqual(await self.check(FakeTarget(scrapes=500), recycle_after=500), "scrapes")
+
+
+if __name__ == "__main__":
+    unittest.main()
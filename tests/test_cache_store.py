@@ -0,0 +1,69 @@
+"""
+SQLiteキャッシュストアのテスト（一時ディレクトリのDBファイルを使う）
+"""
+
+import os
+import sys
+import tempfile
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cache_store import SQLiteCacheStore
+
+
+class SQLiteCacheStoreTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "cache.db")
+
+    def open_store(self) -> SQLiteCacheStore:
+        store = SQLiteCacheStore(self.path)
+        self.addCleanup(store.close)
+        return store
+
+    async def test_round_trip_across_reopen(self):
+        now = time.time()
+        store = self.open_store()
+        await store.save("listing", "k", [{'title': "作品", 'rating': 4.5}], now, now + 60)
+        store.close()
+
+        value, fetched_at, expires_at = await self.open_store().load("listing", "k")
+        self.assertEqual(value, [{'title': "作品", 'rating': 4.5}])
+        self.assertEqual((fetched_at, expires_at), (now, now + 60))
+
+    async def test_namespaces_are_separate(self):
+        now = time.time()
+        store = self.open_store()
+        await store.save("listing", "k", 1, now, now + 60)
+        await store.save("missav", "k", 2, now, now + 60)
+        self.assertEqual((await store.load("listing", "k"))[0], 1)
+        self.assertEqual((await store.load("missav", "k"))[0], 2)
+
+    async def test_save_overwrites_and_delete_removes(self):
+        now = time.time()
+        store = self.open_store()
+        await store.save("listing", "k", 1, now, now + 60)
+        await store.save("listing", "k", 2, now, now + 60)
+        self.assertEqual((await store.load("listing", "k"))[0], 2)
+        await store.delete("listing", "k")
+        self.assertIsNone(await store.load("listing", "k"))
+
+    async def test_expired_rows_are_not_loaded(self):
+        now = time.time()
+        store = self.open_store()
+        await store.save("listing", "old", 1, now - 120, now - 60)
+        self.assertIsNone(await store.load("listing", "old"))
+
+    async def test_unserializable_value_is_logged_not_raised(self):
+        now = time.time()
+        store = self.open_store()
+        with self.assertLogs("cache_store", level="ERROR"):
+            await store.save("listing", "k", object(), now, now + 60)
+        self.assertIsNone(await store.load("listing", "k"))
+
+
+if __name__ == "__main__":
+    unittest.main()
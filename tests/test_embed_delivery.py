@@ -0,0 +1,83 @@
+"""
+Embedの一括送信のテスト（Discordには送信せず、送信・編集を記録する）
+"""
+
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import discord
+from embed_delivery import EmbedDelivery, MAX_EMBED_CHARS_PER_MESSAGE, MAX_EMBEDS_PER_MESSAGE, pack_embeds
+
+
+def make_embed(title: str, description: str = "") -> discord.Embed:
+    return discord.Embed(title=title, description=description)
+
+
+class PackEmbedsTest(unittest.TestCase):
+    def test_splits_by_embed_count(self):
+        batches = pack_embeds([make_embed(str(i)) for i in range(25)])
+        self.assertEqual([len(batch) for batch in batches], [MAX_EMBEDS_PER_MESSAGE, MAX_EMBEDS_PER_MESSAGE, 5])
+        self.assertEqual([i for batch in batches for i in batch], list(range(25)))
+
+    def test_splits_by_total_chars(self):
+        embeds = [make_embed("t", "x" * 2500) for _ in range(5)]
+        batches = pack_embeds(embeds)
+        self.assertEqual([len(batch) for batch in batches], [2, 2, 1])
+        for batch in batches:
+            self.assertLessEqual(sum(len(embeds[i]) for i in batch), MAX_EMBED_CHARS_PER_MESSAGE)
+
+    def test_headroom_reserves_chars(self):
+        embeds = [make_embed("t", "x" * 1900) for _ in range(3)]
+        self.assertEqual(len(pack_embeds(embeds)), 1)
+        self.assertEqual(len(pack_embeds(embeds, headroom=200)), 2)
+
+    def test_oversized_embed_is_sent_alone(self):
+        embeds = [make_embed("a"), make_embed("t", "x" * 5999), make_embed("b")]
+        self.assertEqual(pack_embeds(embeds), [[0], [1], [2]])
+
+
+class EmbedDeliveryTest(unittest.IsolatedAsyncioTestCase):
+    async def send_all(self, count: int):
+        messages = []
+
+        async def send(embeds):
+            message = mock.Mock()
+            message.edit = mock.AsyncMock()
+            message.sent = list(embeds)
+            messages.append(message)
+            return message
+
+        delivery = EmbedDelivery(send)
+        await delivery.send([make_embed(str(i)) for i in range(count)])
+        return delivery, messages
+
+    async def test_send_packs_into_messages(self):
+        delivery, messages = await self.send_all(12)
+        self.assertEqual([len(message.sent) for message in messages], [10, 2])
+        self.assertEqual(len(delivery.embeds), 12)
+
+    async def test_replace_edits_each_message_once_with_all_replacements(self):
+        delivery, messages = await self.send_all(12)
+        await delivery.replace({1: make_embed("one"), 3: make_embed("three"), 11: make_embed("eleven")})
+
+        messages[0].edit.assert_awaited_once()
+        titles = [embed.title for embed in messages[0].edit.await_args.kwargs['embeds']]
+        self.assertEqual(titles[1], "one")
+        self.assertEqual(titles[3], "three")
+        self.assertEqual(titles[0], "0")
+        messages[1].edit.assert_awaited_once()
+        self.assertEqual(messages[1].edit.await_args.kwargs['embeds'][1].title, "eleven")
+
+    async def test_replace_skips_untouched_messages(self):
+        delivery, messages = await self.send_all(12)
+        await delivery.replace({2: make_embed("two")})
+        messages[0].edit.assert_awaited_once()
+        messages[1].edit.assert_not_awaited()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,51 @@
+"""
+FANZA検索条件のテスト
+"""
+
+import dataclasses
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import SALE_TYPES
+from fanza_query import FanzaQuery, encode_term
+
+
+class FanzaQueryTest(unittest.TestCase):
+    def test_url_keeps_user_keyword(self):
+        query = FanzaQuery(keyword="  ＡＢＣ　Ｔｅｓｔ  ")
+        self.assertEqual(query.keyword, "ＡＢＣ Ｔｅｓｔ")
+        self.assertIn("key=%EF%BC%A1", query.url)
+
+    def test_cache_key_ignores_width_and_case(self):
+        self.assertEqual(FanzaQuery(keyword="ＡＢＣ　Ｔｅｓｔ").cache_key, FanzaQuery(keyword=" abc  test ").cache_key)
+        self.assertNotEqual(FanzaQuery(keyword="abc").cache_key, FanzaQuery(keyword="abd").cache_key)
+
+    def test_round_trip_keeps_keyword(self):
+        # ワーカーとの受け渡し（asdict→再構築）で検索URLが変わらない
+        query = FanzaQuery(keyword="Ｔｅｓｔ", media_type="vr")
+        restored = FanzaQuery(**dataclasses.asdict(query))
+        self.assertEqual(restored.url, query.url)
+        self.assertEqual(restored.cache_key, query.cache_key)
+
+    def test_sale_keys_and_keyword_share_encoding(self):
+        query = FanzaQuery(sale_type="all", keyword="a+b|c")
+        key = query.url.split("key=", 1)[1].split("&", 1)[0]
+        keyword_part, sale_part = key.split('+', 1)
+        self.assertEqual(keyword_part, "a%2Bb%7Cc")
+        self.assertEqual(sale_part.split('|'), [encode_term(term) for term in SALE_TYPES["all"]["keys"]])
+        self.assertNotIn("％", query.url)
+
+    def test_long_keyword_with_all_sales_has_bounded_stable_cache_key(self):
+        keyword = "長いキーワード" * 200
+        query = FanzaQuery(sale_type="all", keyword=keyword, media_type="vr", release_filter="latest")
+        self.assertEqual(len(query.cache_key), 32)
+        self.assertEqual(query.cache_key, FanzaQuery(sale_type="all", keyword=keyword, media_type="vr", release_filter="latest").cache_key)
+        self.assertNotEqual(query.cache_key, FanzaQuery(sale_type="all", keyword=keyword + "2", media_type="vr", release_filter="latest").cache_key)
+        self.assertNotEqual(query.cache_key, FanzaQuery(sale_type="none", keyword=keyword, media_type="vr", release_filter="latest").cache_key)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,116 @@
+"""
+/fanza_searchの表示のテスト（Discord・スクレイパーは使わず、送信と取得を差し替える）
+"""
+
+import asyncio
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import bot
+
+
+def make_product(name: str, rating: float) -> dict:
+    return {'title': name, 'rating': rating, 'price': "1,000円", 'url': f"https://example.com/cid={name}/", 'content_id': name}
+
+
+class FanzaSearchTest(unittest.IsolatedAsyncioTestCase):
+    async def run_search(self, batches, **options):
+        events = []
+        messages = []
+
+        async def send(*args, **kwargs):
+            message = mock.Mock()
+            message.edit = mock.AsyncMock(side_effect=lambda **edit: events.append(('edit', [e.title for e in edit['embeds']])))
+            messages.append(message)
+            events.append(('send', [e.title for e in kwargs.get('embeds', [])]))
+            return message
+
+        async def stream(**kwargs):
+            for batch in batches:
+                events.append(('batch', [product['title'] for product in batch]))
+                yield batch
+
+        interaction = mock.Mock()
+        interaction.response.defer = mock.AsyncMock()
+        interaction.followup.send = mock.AsyncMock(side_effect=send)
+        with mock.patch.object(bot, 'check_nsfw_interaction', mock.AsyncMock(return_value=True)), \
+                mock.patch.object(bot, 'check_rate_limit_interaction', mock.AsyncMock(return_value=True)), \
+                mock.patch.object(bot, 'search_missav_for_product', mock.AsyncMock(return_value=None)), \
+                mock.patch.object(bot.prefetcher, 'record'), \
+                mock.patch.object(bot.scraper, 'stream_high_rated_products', side_effect=stream), \
+                mock.patch.object(bot.scraper, 'get_cache_timestamp', return_value=None):
+            await bot.slash_fanza_search.callback(interaction, **options)
+        return events
+
+    async def test_rating_mode_posts_early_and_replaces_better_products(self):
+        first = [make_product(f"a{i}", 4.1) for i in range(3)]
+        second = [make_product("best", 4.9), make_product("low", 4.0)]
+        events = await self.run_search([first, second], mode="rating", sort_type="ranking", count=3)
+
+        kinds = [kind for kind, _ in events]
+        # 表示件数が揃った時点で、残りのバッチを受け取る前に表示する
+        self.assertEqual(kinds[:3], ['batch', 'send', 'batch'])
+        self.assertEqual(events[1][1][1:], ["1. a0", "2. a1", "3. a2"])
+        # 全件の取得後に上位が入れ替わった分を1回の編集で差し替える
+        self.assertEqual(events[3], ('edit', [events[1][1][0], "1. best", "2. a0", "3. a1"]))
+
+    async def test_review_rank_stops_after_enough_products(self):
+        first = [make_product(f"a{i}", 4.5) for i in range(3)]
+        events = await self.run_search([first, [make_product("late", 4.9)]], mode="rating", count=3)
+        self.assertEqual([kind for kind, _ in events], ['batch', 'send'])
+
+
+class PaginationEnrichmentTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.searched = []
+
+        async def search(product, force_refresh=False):
+            self.searched.append(product['title'])
+            return f"https://missav.example/{product['title']}"
+
+        patcher = mock.patch.object(bot, 'search_missav_for_product', side_effect=search)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.interaction = mock.Mock()
+        self.interaction.guild_id = 1
+
+    def make_view(self, pages: int) -> "bot.PaginationView":
+        products = [make_product(f"p{i}", 4.0) for i in range(bot.ITEMS_PER_PAGE * pages)]
+        view = bot.PaginationView(products, self.interaction)
+        view.message = mock.Mock()
+        view.message.edit = mock.AsyncMock()
+        self.addCleanup(view.stop)
+        return view
+
+    async def test_only_current_page_is_awaited_and_next_page_prefetched(self):
+        view = self.make_view(pages=3)
+        await view.load_current_page()
+        per_page = bot.ITEMS_PER_PAGE
+        self.assertEqual(self.searched[:per_page], [f"p{i}" for i in range(per_page)])
+        self.assertTrue(all(view.products[i].get('missav_url') for i in range(per_page)))
+        view.message.edit.assert_awaited_once()
+
+        await asyncio.gather(*view._missav_tasks.values())
+        # 次のページまで先読みし、その先のページは検索しない
+        self.assertEqual(sorted(self.searched), sorted(f"p{i}" for i in range(per_page * 2)))
+
+    async def test_prefetched_page_is_not_searched_again(self):
+        view = self.make_view(pages=2)
+        await view.load_current_page()
+        await asyncio.gather(*view._missav_tasks.values())
+        searched = len(self.searched)
+
+        view.current_page = 1
+        view.message.edit.reset_mock()
+        await view.load_current_page()
+        self.assertEqual(len(self.searched), searched)
+        # 先読み済みのページは待つものがないため再描画もしない
+        view.message.edit.assert_not_awaited()
+
+
+if __name__ == "__main__":
+    unittest.main()
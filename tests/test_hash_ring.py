@@ -0,0 +1,72 @@
+"""
+コンシステントハッシュのテスト
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from hash_ring import HashRing
+
+KEYS = [f"keyword-{i}" for i in range(2000)]
+
+
+class HashRingTest(unittest.TestCase):
+    def test_empty_ring(self):
+        ring = HashRing()
+        self.assertIsNone(ring.get("key"))
+        self.assertEqual(list(ring.iter_nodes("key")), [])
+
+    def test_assignment_is_stable(self):
+        ring = HashRing(["a", "b", "c"])
+        other = HashRing(["c", "b", "a"])
+        self.assertEqual([ring.get(key) for key in KEYS], [other.get(key) for key in KEYS])
+
+    def test_keys_are_spread_across_nodes(self):
+        ring = HashRing(["a", "b", "c", "d"])
+        counts = {node: 0 for node in ring.nodes}
+        for key in KEYS:
+            counts[ring.get(key)] += 1
+        for count in counts.values():
+            self.assertGreater(count, len(KEYS) / 4 * 0.6)
+        self.assertAlmostEqual(sum(ring.shares().values()), 1.0)
+
+    def test_adding_node_moves_only_its_keys(self):
+        ring = HashRing(["a", "b", "c"])
+        before = {key: ring.get(key) for key in KEYS}
+        ring.add("d")
+        moved = [key for key in KEYS if ring.get(key) != before[key]]
+        # 移動するのは新しいノードの担当になったキーだけ
+        self.assertTrue(all(ring.get(key) == "d" for key in moved))
+        self.assertLess(len(moved), len(KEYS) / 4 * 1.5)
+
+    def test_removing_node_moves_only_its_keys(self):
+        ring = HashRing(["a", "b", "c", "d"])
+        before = {key: ring.get(key) for key in KEYS}
+        ring.remove("b")
+        self.assertNotIn("b", ring)
+        for key in KEYS:
+            if before[key] != "b":
+                self.assertEqual(ring.get(key), before[key])
+            else:
+                self.assertNotEqual(ring.get(key), "b")
+
+    def test_iter_nodes_lists_each_node_once(self):
+        ring = HashRing(["a", "b", "c"])
+        for key in KEYS[:50]:
+            nodes = list(ring.iter_nodes(key))
+            self.assertEqual(sorted(nodes), ["a", "b", "c"])
+            self.assertEqual(nodes[0], ring.get(key))
+
+    def test_add_and_remove_are_idempotent(self):
+        ring = HashRing(["a"], virtual_nodes=10)
+        ring.add("a")
+        self.assertEqual(len(ring._ring), 10)
+        ring.remove("missing")
+        self.assertEqual(len(ring), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+"""
+HTTP取得した一覧ページの解析と、Playwrightへのフォールバックのテスト
+"""
+
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from playwright_scraper import PlaywrightFanzaScraper, parse_listing_html
+
+CARD = """
+<div data-e2eid="content-card">
+  <a href="/digital/videoa/-/detail/=/cid={cid}/">
+    <img alt="{title}" src="https://pics.dmm.co.jp/digital/video/{cid}/{cid}ps.jpg">
+  </a>
+  <a data-e2eid="title" href="/digital/videoa/-/detail/=/cid={cid}/"><span class="hover:underline">{title}</span></a>
+  <div>{stars}</div>
+  <a href="/digital/videoa/-/list/?actress=1">女優A</a>
+  <span data-e2eid="content-price">1,980円</span>
+</div>
+"""
+STAR = '<img src="https://example.com/icon/star/yellow.svg">'
+
+
+def make_listing(*cards) -> str:
+    body = "".join(CARD.format(cid=cid, title=title, stars=STAR * stars) for cid, title, stars in cards)
+    return f"<html><body><main>{body}</main></body></html>"
+
+
+class ParseListingHtmlTest(unittest.TestCase):
+    def test_parses_cards_in_bulk_script_format(self):
+        raw_cards = parse_listing_html(make_listing(("abc00123", "作品A", 4), ("xyz00999", "作品B", 0)))
+        self.assertEqual(len(raw_cards), 2)
+        self.assertEqual(raw_cards[0], {
+            'title': "作品A",
+            'href': "/digital/videoa/-/detail/=/cid=abc00123/",
+            'stars': 4,
+            'rating_texts': [],
+            'price_text': "1,980円",
+            'image': "https://pics.dmm.co.jp/digital/video/abc00123/abc00123ps.jpg",
+            'image_matched': True,
+            'actresses': [{'name': "女優A", 'href': "/digital/videoa/-/list/?actress=1"}]
+        })
+        self.assertEqual(raw_cards[1]['stars'], 0)
+
+    def test_parsed_cards_build_the_same_products(self):
+        scraper = PlaywrightFanzaScraper()
+        product = scraper._build_product_info(parse_listing_html(make_listing(("abc00123", "作品A", 4)))[0])
+        self.assertEqual(product['content_id'], "abc00123")
+        self.assertEqual(product['rating'], 4.0)
+        self.assertTrue(product['image_url'].endswith("pl.jpg"))
+
+    def test_page_without_cards(self):
+        self.assertEqual(parse_listing_html("<html><body><p>年齢認証</p></body></html>"), [])
+
+
+class HttpFallbackTest(unittest.IsolatedAsyncioTestCase):
+    async def scrape(self, raw_cards):
+        scraper = PlaywrightFanzaScraper()
+        scraper.http_fetcher = mock.Mock()
+        scraper.http_fetcher.fetch_cards = mock.AsyncMock(return_value=raw_cards)
+        rendered = [{'title': "ブラウザ", 'rating': 5.0}]
+        with mock.patch.object(scraper, '_render_listing_page', mock.AsyncMock(return_value=rendered)) as render:
+            products, card_count = await scraper._scrape_listing_page("https://example.com/list/")
+        return products, card_count, render
+
+    async def test_http_cards_skip_the_browser(self):
+        products, card_count, render = await self.scrape(parse_listing_html(make_listing(("abc00123", "作品A", 5), ("xyz00999", "作品B", 1))))
+        render.assert_not_awaited()
+        self.assertEqual(card_count, 2)
+        self.assertEqual([product['title'] for product in products], ["作品A"])
+
+    async def test_empty_http_response_falls_back_to_browser(self):
+        products, card_count, render = await self.scrape([])
+        render.assert_awaited_once()
+        self.assertEqual([product['title'] for product in products], ["ブラウザ"])
+
+
+if __name__ == "__main__":
+    unittest.main()
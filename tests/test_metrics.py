@@ -0,0 +1,105 @@
+"""
+計測値（カウンター・ゲージ・ヒストグラム）とテキスト形式の出力・/metricsエンドポイントのテスト
+"""
+
+import os
+import socket
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import aiohttp
+import metrics
+from metrics import Counter, Gauge, Histogram, Metric, MetricsRegistry
+from ttl_cache import TTLCache
+
+
+class MetricTest(unittest.TestCase):
+    def test_base_class_is_abstract(self):
+        with self.assertRaises(TypeError):
+            Metric("base", "abstract")
+
+    def test_counter_sums_matching_labels(self):
+        counter = Counter("errors_total", "errors", ["source", "reason"])
+        counter.inc(source="fanza", reason="timeout")
+        counter.inc(2, source="fanza", reason="parse")
+        counter.inc(source="missav", reason="timeout")
+        self.assertEqual(counter.value(source="fanza"), 3)
+        self.assertEqual(counter.value(reason="timeout"), 2)
+        self.assertEqual(counter.value(), 4)
+
+    def test_unknown_label_is_rejected(self):
+        with self.assertRaises(ValueError):
+            Gauge("rss_bytes", "rss", ["source"]).set(1, scraper="fanza")
+
+    def test_histogram_summary_and_buckets(self):
+        histogram = Histogram("duration_seconds", "duration", ["source"], buckets=(0.1, 1.0))
+        for value in (0.05, 0.5, 0.5, 5.0):
+            histogram.observe(value, source="fanza")
+        summary = histogram.summary(source="fanza")
+        self.assertEqual(summary['count'], 4)
+        self.assertAlmostEqual(summary['avg'], 6.05 / 4)
+        self.assertEqual(summary['p50'], 1.0)
+        self.assertEqual(summary['p95'], float('inf'))
+
+        buckets = {labels['le']: value for name, labels, value in histogram.samples() if name.endswith('_bucket')}
+        self.assertEqual(buckets, {'0.1': 1, '1': 3, '+Inf': 4})
+
+
+class MetricsRegistryTest(unittest.TestCase):
+    def test_render_prometheus_text(self):
+        registry = MetricsRegistry()
+        registry.counter("fanza_bot_commands_total", "Commands", ["command"]).inc(command='say "hi"')
+        registry.callback("fanza_bot_cache_entries", "Entries", "gauge", lambda: [({'cache': "fanza"}, 3)])
+        text = registry.render()
+        self.assertIn("# TYPE fanza_bot_commands_total counter", text)
+        self.assertIn('fanza_bot_commands_total{command="say \\"hi\\""} 1', text)
+        self.assertIn('fanza_bot_cache_entries{cache="fanza"} 3', text)
+        self.assertTrue(text.endswith('\n'))
+
+    def test_failing_callback_is_skipped(self):
+        registry = MetricsRegistry()
+
+        def collect():
+            raise RuntimeError("broken")
+
+        registry.callback("broken_metric", "Broken", "gauge", collect)
+        self.assertIn("# TYPE broken_metric gauge", registry.render())
+
+
+class CacheMetricsTest(unittest.TestCase):
+    def test_registered_cache_is_exported(self):
+        cache = TTLCache(ttl=60, max_entries=10, max_bytes=10 ** 6, name="metrics_test")
+        metrics.register_cache(cache)
+        cache.set("a", 1)
+        cache.get("a")
+        cache.get("missing")
+        self.assertEqual(metrics.cache_hit_rate("metrics_test"), 0.5)
+        text = metrics.REGISTRY.render()
+        self.assertIn('fanza_bot_cache_events_total{cache="metrics_test",event="hit"} 1', text)
+        self.assertIn('fanza_bot_cache_entries{cache="metrics_test"} 1', text)
+
+
+class MetricsServerTest(unittest.IsolatedAsyncioTestCase):
+    async def test_serves_registry_text(self):
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            port = sock.getsockname()[1]
+        await metrics.start_metrics_server(host="127.0.0.1", port=port)
+        self.addAsyncCleanup(metrics.stop_metrics_server)
+        metrics.COMMAND_DURATION.observe(0.2, command="fanza_search", mode="rating")
+
+        async with aiohttp.ClientSession() as session:
+            async with session.get(f"http://127.0.0.1:{port}/metrics") as response:
+                self.assertEqual(response.status, 200)
+                text = await response.text()
+        self.assertIn('fanza_bot_command_duration_seconds_count{command="fanza_search",mode="rating"}', text)
+
+    async def test_port_zero_disables_server(self):
+        await metrics.start_metrics_server(port=0)
+        self.assertIsNone(metrics._server_runner)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,92 @@
+"""
+MissAVScraperのブラウザ・コンテキストの再利用のテスト（Playwrightは起動せず、起動処理を差し替える）
+"""
+
+import asyncio
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import missav_scraper
+from missav_scraper import MissAVScraper
+
+
+class FakeBrowser:
+    def __init__(self):
+        self.connected = True
+        self.contexts = []
+
+    def is_connected(self) -> bool:
+        return self.connected
+
+    async def new_context(self, **options):
+        await asyncio.sleep(0)
+        context = mock.Mock(browser=self, pages=[])
+        context.route = mock.AsyncMock()
+        context.close = mock.AsyncMock()
+        self.contexts.append(context)
+        return context
+
+    async def close(self):
+        self.connected = False
+
+
+class BrowserReuseTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.browsers = []
+
+        async def launch(**options):
+            await asyncio.sleep(0)
+            browser = FakeBrowser()
+            self.browsers.append(browser)
+            return browser
+
+        playwright = mock.Mock()
+        playwright.chromium.launch = mock.AsyncMock(side_effect=launch)
+        playwright.stop = mock.AsyncMock()
+        starter = mock.Mock()
+        starter.return_value.start = mock.AsyncMock(return_value=playwright)
+        for name, value in (('async_playwright', starter), ('record_browser_processes', mock.Mock()),
+                            ('forget_browser_processes', mock.Mock()), ('playwright_driver_pid', mock.Mock(return_value=None))):
+            patcher = mock.patch.object(missav_scraper, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.playwright = playwright
+        self.scraper = MissAVScraper()
+
+    async def test_context_is_reused_across_searches(self):
+        first = await self.scraper._get_context()
+        second = await self.scraper._get_context()
+        self.assertIs(first, second)
+        self.assertEqual(len(self.browsers), 1)
+        self.assertEqual(len(self.browsers[0].contexts), 1)
+        first.route.assert_awaited_once()
+
+    async def test_concurrent_searches_launch_one_browser(self):
+        contexts = await asyncio.gather(*[self.scraper._get_context() for _ in range(5)])
+        self.assertEqual(len({id(context) for context in contexts}), 1)
+        self.assertEqual(len(self.browsers), 1)
+
+    async def test_disconnected_browser_is_relaunched(self):
+        first = await self.scraper._get_context()
+        self.browsers[0].connected = False
+        second = await self.scraper._get_context()
+        self.assertIsNot(first, second)
+        self.assertEqual(len(self.browsers), 2)
+        # Playwrightのドライバーは起動し直さない
+        self.assertEqual(missav_scraper.async_playwright.return_value.start.await_count, 1)
+
+    async def test_close_releases_browser_and_driver(self):
+        context = await self.scraper._get_context()
+        await self.scraper.close()
+        context.close.assert_awaited_once()
+        self.assertFalse(self.browsers[0].connected)
+        self.playwright.stop.assert_awaited_once()
+        self.assertIsNone(self.scraper.active_context())
+
+
+if __name__ == "__main__":
+    unittest.main()
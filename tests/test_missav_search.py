@@ -0,0 +1,101 @@
+"""
+MissAV検索のテスト（失敗と「該当なし」の区別・品番の対応記録、ブラウザは使わず検索処理を差し替える）
+"""
+
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import bot
+from missav_scraper import MissAVScraper
+from playwright_scraper import extract_content_id
+
+
+PRODUCT = {'title': "テスト作品 タイトル", 'url': "https://example.com/cid=abc00123/", 'content_id': "abc00123"}
+
+
+def make_missav_scraper(search_side_effect):
+    missav_scraper = mock.Mock()
+    missav_scraper.lookup_content_id = mock.AsyncMock(return_value=(False, None))
+    missav_scraper.search_videos = mock.AsyncMock(side_effect=search_side_effect)
+    missav_scraper.remember_content_id = mock.AsyncMock()
+    return missav_scraper
+
+
+class SearchMissAVForProductTest(unittest.IsolatedAsyncioTestCase):
+    async def test_scrape_error_is_not_remembered_as_not_found(self):
+        missav_scraper = make_missav_scraper(TimeoutError("goto timeout"))
+        with mock.patch.object(bot, 'missav_scraper', missav_scraper):
+            self.assertIsNone(await bot.search_missav_for_product(dict(PRODUCT)))
+        missav_scraper.remember_content_id.assert_not_awaited()
+
+    async def test_empty_result_is_remembered_as_not_found(self):
+        missav_scraper = make_missav_scraper(lambda title, force_refresh=False: [])
+        with mock.patch.object(bot, 'missav_scraper', missav_scraper):
+            self.assertIsNone(await bot.search_missav_for_product(dict(PRODUCT)))
+        missav_scraper.remember_content_id.assert_awaited_once_with("abc00123", None)
+
+
+class SearchVideosTest(unittest.IsolatedAsyncioTestCase):
+    async def test_scrape_error_propagates_and_is_not_cached(self):
+        scraper = MissAVScraper()
+        with mock.patch.object(scraper, '_get_context', side_effect=TimeoutError("launch timeout")):
+            with self.assertRaises(TimeoutError):
+                await scraper.search_videos("テスト作品")
+        self.assertIsNone(scraper.cache.peek(scraper._search_cache_key("テスト作品")))
+
+
+class ContentIdMapTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.scraper = MissAVScraper()
+        self.scraper.content_id_map.store = None
+        self.addCleanup(self.scraper.content_id_map.close)
+
+    async def test_unknown_content_id(self):
+        self.assertEqual(await self.scraper.lookup_content_id("abc00123"), (False, None))
+
+    async def test_found_and_not_found_are_remembered(self):
+        await self.scraper.remember_content_id("abc00123", "https://missav.example/abc-123")
+        await self.scraper.remember_content_id("xyz00999", None)
+        self.assertEqual(await self.scraper.lookup_content_id("abc00123"), (True, "https://missav.example/abc-123"))
+        self.assertEqual(await self.scraper.lookup_content_id("xyz00999"), (True, None))
+        # 見つからなかった品番は短期間だけ記録する
+        self.assertLess(self.scraper.content_id_map.peek("xyz00999").ttl, self.scraper.content_id_map.peek("abc00123").ttl)
+
+    def test_extract_content_id(self):
+        self.assertEqual(extract_content_id("https://www.dmm.co.jp/digital/videoa/-/detail/=/cid=ABC00123/"), "abc00123")
+        self.assertEqual(extract_content_id("https://www.dmm.co.jp/mono/dvd/-/detail/?id=h_123xyz"), "h_123xyz")
+        self.assertIsNone(extract_content_id("https://www.dmm.co.jp/digital/videoa/-/list/"))
+        self.assertIsNone(extract_content_id(""))
+
+
+class ContentIdLookupTest(unittest.IsolatedAsyncioTestCase):
+    async def test_remembered_content_id_skips_search(self):
+        missav_scraper = make_missav_scraper(AssertionError("search should not run"))
+        missav_scraper.lookup_content_id.return_value = (True, "https://missav.example/abc-123")
+        with mock.patch.object(bot, 'missav_scraper', missav_scraper):
+            self.assertEqual(await bot.search_missav_for_product(dict(PRODUCT)), "https://missav.example/abc-123")
+        missav_scraper.lookup_content_id.assert_awaited_once_with("abc00123")
+        missav_scraper.search_videos.assert_not_awaited()
+
+    async def test_found_url_is_remembered_by_content_id(self):
+        missav_scraper = make_missav_scraper(lambda title, force_refresh=False: [{'url': "https://missav.example/abc-123"}])
+        product = {'title': "【特典】テスト作品（限定）", 'url': "https://example.com/cid=abc00123/"}
+        with mock.patch.object(bot, 'missav_scraper', missav_scraper):
+            self.assertEqual(await bot.search_missav_for_product(product), "https://missav.example/abc-123")
+        missav_scraper.search_videos.assert_awaited_once_with("テスト作品", force_refresh=False)
+        missav_scraper.remember_content_id.assert_awaited_once_with("abc00123", "https://missav.example/abc-123")
+
+    async def test_force_refresh_ignores_remembered_content_id(self):
+        missav_scraper = make_missav_scraper(lambda title, force_refresh=False: [])
+        missav_scraper.lookup_content_id.return_value = (True, "https://missav.example/old")
+        with mock.patch.object(bot, 'missav_scraper', missav_scraper):
+            self.assertIsNone(await bot.search_missav_for_product(dict(PRODUCT), force_refresh=True))
+        missav_scraper.lookup_content_id.assert_not_awaited()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,112 @@
+"""
+Playwrightページプールのテスト（ブラウザは起動せず、開閉だけを記録するページを使う）
+"""
+
+import asyncio
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from page_pool import PagePool
+
+
+class FakePage:
+    def __init__(self, number: int):
+        self.number = number
+        self.closed = False
+        self.visited = []
+
+    def is_closed(self) -> bool:
+        return self.closed
+
+    async def goto(self, url: str):
+        self.visited.append(url)
+
+    async def close(self):
+        self.closed = True
+
+
+class PagePoolTest(unittest.IsolatedAsyncioTestCase):
+    def make_pool(self, **options) -> PagePool:
+        self.pages = []
+
+        async def factory():
+            page = FakePage(len(self.pages))
+            self.pages.append(page)
+            return page
+
+        pool = PagePool(factory, **options)
+        self.addAsyncCleanup(pool.close)
+        return pool
+
+    async def test_warm_up_and_reuse(self):
+        pool = self.make_pool(min_size=2, max_size=4, max_uses=10)
+        await pool.warm_up()
+        self.assertEqual(pool.get_stats()['idle'], 2)
+        used = []
+        for _ in range(4):
+            async with pool.acquire() as page:
+                used.append(page.number)
+        # 返却したページは待機列の末尾に戻り、事前作成したページを順に使い回す
+        self.assertEqual(used, [0, 1, 0, 1])
+        self.assertEqual(len(self.pages), 2)
+        self.assertEqual(self.pages[0].visited, ["about:blank"] * 2)
+
+    async def test_page_is_retired_after_max_uses_and_refilled(self):
+        pool = self.make_pool(min_size=1, max_size=2, max_uses=2)
+        await pool.warm_up()
+        for _ in range(2):
+            async with pool.acquire():
+                pass
+        self.assertTrue(self.pages[0].closed)
+        self.assertEqual(pool.retired_count, 1)
+        await pool._refill_task
+        self.assertEqual(len(self.pages), 2)
+        self.assertEqual(pool.get_stats()['idle'], 1)
+
+    async def test_failed_use_retires_page(self):
+        pool = self.make_pool(min_size=0, max_size=2, max_uses=10)
+        with self.assertRaises(ValueError):
+            async with pool.acquire():
+                raise ValueError("navigation failed")
+        self.assertTrue(self.pages[0].closed)
+        self.assertEqual(pool.get_stats()['size'], 0)
+        async with pool.acquire() as page:
+            self.assertEqual(page.number, 1)
+
+    async def test_closed_idle_page_is_skipped(self):
+        pool = self.make_pool(min_size=1, max_size=2, max_uses=10)
+        await pool.warm_up()
+        self.pages[0].closed = True
+        async with pool.acquire() as page:
+            self.assertEqual(page.number, 1)
+        self.assertEqual(pool.get_stats()['size'], 1)
+
+    async def test_acquire_waits_at_max_size(self):
+        pool = self.make_pool(min_size=0, max_size=1, max_uses=10)
+        order = []
+
+        async def use(name: str):
+            async with pool.acquire():
+                order.append(f"{name} start")
+                await asyncio.sleep(0.01)
+                order.append(f"{name} end")
+
+        await asyncio.gather(use("a"), use("b"))
+        self.assertEqual(order, ["a start", "a end", "b start", "b end"])
+        self.assertEqual(len(self.pages), 1)
+
+    async def test_close_rejects_new_acquires(self):
+        pool = self.make_pool(min_size=1, max_size=1, max_uses=10)
+        await pool.warm_up()
+        await pool.close()
+        self.assertTrue(self.pages[0].closed)
+        with self.assertRaises(RuntimeError):
+            async with pool.acquire():
+                pass
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,177 @@
+"""
+一覧ページの並列取得のテスト（ブラウザは使わず、1ページ分の取得処理を差し替える）
+"""
+
+import asyncio
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import metrics
+import playwright_scraper
+from playwright_scraper import PlaywrightFanzaScraper
+
+
+def make_products(page_number: int, count: int = 2):
+    return [
+        {'title': f"p{page_number}-{i}", 'rating': 4.5, 'url': f"https://example.com/cid=p{page_number}{i}/", 'content_id': f"p{page_number}{i}"}
+        for i in range(count)
+    ]
+
+
+class ScrapeAdditionalPagesTest(unittest.IsolatedAsyncioTestCase):
+    async def test_failed_page_keeps_other_pages(self):
+        scraper = PlaywrightFanzaScraper()
+
+        async def fake_listing_page(url: str):
+            page_number = int(url.rsplit('page=', 1)[1]) if 'page=' in url else 1
+            if page_number == 3:
+                raise TimeoutError("goto timeout")
+            return make_products(page_number), 20
+
+        errors_before = metrics.SCRAPE_ERRORS.value(source="fanza")
+        with mock.patch.object(playwright_scraper, 'MAX_LISTING_PAGES', 4), \
+                mock.patch.object(scraper, '_scrape_listing_page', side_effect=fake_listing_page):
+            products = await scraper._scrape_products("https://example.com/list/?sort=ranking")
+
+        titles = {product['title'] for product in products}
+        self.assertEqual(titles, {f"p{page}-{i}" for page in (1, 2, 4) for i in range(2)})
+        self.assertEqual(metrics.SCRAPE_ERRORS.value(source="fanza"), errors_before + 1)
+
+    async def scrape_out_of_order(self, delays, pages, max_items=50):
+        """ページごとに完了までの時間を変えて取得し、結果と開始・中断されたページを返す"""
+        scraper = PlaywrightFanzaScraper()
+        cancelled = []
+
+        async def fake_listing_page(url: str):
+            page_number = int(url.rsplit('page=', 1)[1]) if 'page=' in url else 1
+            try:
+                await asyncio.sleep(delays.get(page_number, 0))
+            except asyncio.CancelledError:
+                cancelled.append(page_number)
+                raise
+            return pages[page_number]
+
+        with mock.patch.object(playwright_scraper, 'MAX_LISTING_PAGES', 6), \
+                mock.patch.object(playwright_scraper, 'LISTING_PAGE_CONCURRENCY', 6), \
+                mock.patch.object(playwright_scraper, 'MAX_ITEMS', max_items), \
+                mock.patch.object(scraper, '_scrape_listing_page', side_effect=fake_listing_page):
+            products = await scraper._scrape_products("https://example.com/list/?sort=ranking")
+        return {product['title'] for product in products}, sorted(cancelled)
+
+    async def test_early_end_page_keeps_slower_lower_pages(self):
+        # 4ページ目（最終ページの次）が先に完了しても、2・3ページ目の完了を待つ
+        pages = {n: (make_products(n), 20) for n in range(1, 7)}
+        pages[4] = ([], 0)
+        titles, cancelled = await self.scrape_out_of_order({2: 0.05, 3: 0.05, 5: 0.2, 6: 0.2}, pages)
+        self.assertEqual(titles, {f"p{page}-{i}" for page in (1, 2, 3) for i in range(2)})
+        self.assertEqual(cancelled, [5, 6])
+
+    async def test_enough_items_from_later_pages_keeps_lower_pages(self):
+        # 5・6ページ目が先に完了して件数が揃っても、2・3ページ目の結果を捨てない
+        pages = {n: (make_products(n), 20) for n in range(1, 7)}
+        titles, cancelled = await self.scrape_out_of_order({2: 0.05, 3: 0.05, 4: 0.3}, pages, max_items=6)
+        self.assertEqual(titles, {f"p{page}-{i}" for page in (1, 2, 3) for i in range(2)})
+        self.assertEqual(cancelled, [4])
+
+
+class BulkExtractionTest(unittest.IsolatedAsyncioTestCase):
+    def make_raw(self, **overrides):
+        raw = {
+            'title': "作品タイトル",
+            'href': "/digital/videoa/-/detail/=/cid=ABC00123/",
+            'stars': 4,
+            'rating_texts': [],
+            'price_text': " 1,980円 ",
+            'image': "https://pics.dmm.co.jp/digital/video/abc00123/abc00123ps.jpg",
+            'image_matched': True,
+            'actresses': [
+                {'name': " 女優A ", 'href': "/digital/videoa/-/list/=/article=actress/id=1/"},
+                {'name': "詳細", 'href': "/detail/"},
+                {'name': "女優A", 'href': "/digital/videoa/-/list/=/article=actress/id=1/"}
+            ]
+        }
+        raw.update(overrides)
+        return raw
+
+    def test_build_product_info_from_raw_card(self):
+        product = PlaywrightFanzaScraper()._build_product_info(self.make_raw())
+        self.assertEqual(product, {
+            'title': "作品タイトル",
+            'rating': 4.0,
+            'price': "1,980円",
+            'url': "https://www.dmm.co.jp/digital/videoa/-/detail/=/cid=ABC00123/",
+            'content_id': "abc00123",
+            'image_url': "https://pics.dmm.co.jp/digital/video/abc00123/abc00123pl.jpg",
+            'actresses': [{'name': "女優A", 'url': "https://www.dmm.co.jp/digital/videoa/-/list/=/article=actress/id=1/"}]
+        })
+
+    def test_build_product_info_falls_back_to_rating_text(self):
+        scraper = PlaywrightFanzaScraper()
+        product = scraper._build_product_info(self.make_raw(stars=0, rating_texts=["評価なし", "★4.5"], price_text="", image_matched=False))
+        self.assertEqual(product['rating'], 4.5)
+        self.assertEqual(product['price'], "価格不明")
+        self.assertTrue(product['image_url'].endswith("ps.jpg"))
+
+    def test_card_without_title_is_skipped(self):
+        self.assertEqual(PlaywrightFanzaScraper()._build_product_info(self.make_raw(title="  ")), {})
+
+    async def test_bulk_extraction_uses_one_evaluate(self):
+        page = mock.Mock()
+        page.evaluate = mock.AsyncMock(return_value=[self.make_raw(), self.make_raw(title="別作品")])
+        products = await PlaywrightFanzaScraper()._extract_products_bulk(page)
+        page.evaluate.assert_awaited_once()
+        self.assertEqual([product['title'] for product in products], ["作品タイトル", "別作品"])
+
+    async def test_bulk_extraction_error_returns_empty_for_fallback(self):
+        page = mock.Mock()
+        page.evaluate = mock.AsyncMock(side_effect=RuntimeError("Execution context was destroyed"))
+        self.assertEqual(await PlaywrightFanzaScraper()._extract_products_bulk(page), [])
+
+
+class StaleWhileRevalidateTest(unittest.IsolatedAsyncioTestCase):
+    URL = "https://example.com/list/?sort=ranking"
+
+    async def asyncSetUp(self):
+        self.scraper = PlaywrightFanzaScraper()
+        self.scraper.cache.store = None
+        self.addCleanup(self.scraper.cache.close)
+        self.scrape = mock.AsyncMock(return_value=make_products(9))
+        patcher = mock.patch.object(self.scraper, 'scrape_products', self.scrape)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        _, self.cache_key = self.scraper._resolve_target(self.URL, None)
+
+    async def test_fresh_entry_is_returned_without_scraping(self):
+        self.scraper.cache.set(self.cache_key, make_products(1))
+        self.assertEqual(await self.scraper.get_high_rated_products(url=self.URL), make_products(1))
+        self.scrape.assert_not_awaited()
+
+    async def test_stale_entry_is_returned_and_revalidated_once(self):
+        self.scraper.cache.set(self.cache_key, make_products(1), ttl=0)
+        first = await self.scraper.get_high_rated_products(url=self.URL)
+        second = await self.scraper.get_high_rated_products(url=self.URL)
+        self.assertEqual(first, make_products(1))
+        self.assertEqual(second, make_products(1))
+
+        await asyncio.gather(*self.scraper._background_tasks)
+        self.scrape.assert_awaited_once()
+        self.assertEqual(await self.scraper.get_high_rated_products(url=self.URL), make_products(9))
+
+    async def test_entry_past_grace_period_is_scraped_in_line(self):
+        self.scraper.cache.set(self.cache_key, make_products(1), ttl=0)
+        self.scraper.cache.peek(self.cache_key).stored_at -= playwright_scraper.CACHE_STALE_GRACE + 1
+        self.assertEqual(await self.scraper.get_high_rated_products(url=self.URL), make_products(9))
+        self.assertEqual(self.scraper._background_tasks, set())
+
+    async def test_force_refresh_bypasses_stale_entry(self):
+        self.scraper.cache.set(self.cache_key, make_products(1), ttl=0)
+        self.assertEqual(await self.scraper.get_high_rated_products(url=self.URL, force_refresh=True), make_products(9))
+        self.assertEqual(self.scraper._background_tasks, set())
+
+
+if __name__ == "__main__":
+    unittest.main()
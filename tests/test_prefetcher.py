@@ -0,0 +1,110 @@
+"""
+利用頻度に基づく先読みスケジューラーのテスト（スクレイパーは使わず、キャッシュの残り時間と取得を差し替える）
+"""
+
+import asyncio
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import prefetcher
+from fanza_query import FanzaQuery
+from prefetcher import PrefetchScheduler
+
+
+class FakeScraper:
+    def __init__(self):
+        self.remaining = {}  # キャッシュキー -> 残り秒数（未登録はキャッシュなし）
+        self.refreshed = []
+
+    def get_cache_remaining(self, query: FanzaQuery):
+        return self.remaining.get(query.cache_key)
+
+    async def get_high_rated_products(self, query: FanzaQuery, force_refresh: bool = False):
+        self.refreshed.append((query.keyword, force_refresh))
+        return [{'title': f"{query.keyword}-{i}"} for i in range(3)]
+
+
+class PrefetchSchedulerTest(unittest.IsolatedAsyncioTestCase):
+    def make_scheduler(self, **options) -> PrefetchScheduler:
+        self.scraper = FakeScraper()
+        self.enriched = []
+
+        async def enrich(product):
+            self.enriched.append(product['title'])
+            return f"https://missav.example/{product['title']}"
+
+        options.setdefault('top_k', 2)
+        scheduler = PrefetchScheduler(self.scraper, enrich=enrich, lead_time=60, jitter=0, **options)
+        self.addAsyncCleanup(scheduler.stop)
+        return scheduler
+
+    async def run_check(self, scheduler: PrefetchScheduler):
+        scheduler._check()
+        await asyncio.gather(*scheduler._tasks)
+
+    def test_top_queries_rank_by_usage(self):
+        scheduler = self.make_scheduler()
+        for keyword, uses in (("a", 1), ("b", 3), ("c", 2)):
+            for _ in range(uses):
+                scheduler.record(FanzaQuery(keyword=keyword))
+        self.assertEqual([query.keyword for query in scheduler.top_queries()], ["b", "c"])
+
+    def test_tracked_queries_are_bounded(self):
+        scheduler = self.make_scheduler()
+        with mock.patch.object(prefetcher, 'PREFETCH_MAX_TRACKED', 2):
+            scheduler.record(FanzaQuery(keyword="a"))
+            scheduler.record(FanzaQuery(keyword="a"))
+            scheduler.record(FanzaQuery(keyword="b"))
+            scheduler.record(FanzaQuery(keyword="c"))
+        self.assertEqual(scheduler.get_stats()['tracked'], 2)
+        self.assertIn(FanzaQuery(keyword="a").cache_key, scheduler._usage)
+
+    async def test_refreshes_only_popular_queries_near_expiry(self):
+        scheduler = self.make_scheduler()
+        for keyword, uses in (("expiring", 3), ("fresh", 2), ("unpopular", 1)):
+            for _ in range(uses):
+                scheduler.record(FanzaQuery(keyword=keyword))
+        self.scraper.remaining[FanzaQuery(keyword="expiring").cache_key] = 30
+        self.scraper.remaining[FanzaQuery(keyword="fresh").cache_key] = 600
+
+        with mock.patch.object(prefetcher, 'PREFETCH_ENRICH_COUNT', 2):
+            await self.run_check(scheduler)
+        self.assertEqual(self.scraper.refreshed, [("expiring", True)])
+        self.assertEqual(self.enriched, ["expiring-0", "expiring-1"])
+        self.assertEqual(scheduler.get_stats()['refreshed'], 1)
+
+    async def test_uncached_query_is_retried_only_after_cache_duration(self):
+        scheduler = self.make_scheduler()
+        scheduler.record(FanzaQuery(keyword="empty"))
+        await self.run_check(scheduler)
+        await self.run_check(scheduler)
+        self.assertEqual(len(self.scraper.refreshed), 1)
+
+        with mock.patch.object(prefetcher, 'CACHE_DURATION', 0):
+            await self.run_check(scheduler)
+        self.assertEqual(len(self.scraper.refreshed), 2)
+
+    async def test_scheduled_query_is_not_duplicated(self):
+        scheduler = self.make_scheduler()
+        scheduler.record(FanzaQuery(keyword="a"))
+        scheduler._check()
+        scheduler._check()
+        self.assertEqual(len(scheduler._tasks), 1)
+        await asyncio.gather(*scheduler._tasks)
+        self.assertEqual(scheduler.get_stats()['scheduled'], 0)
+
+    async def test_failed_refresh_is_counted(self):
+        scheduler = self.make_scheduler()
+        scheduler.record(FanzaQuery(keyword="a"))
+        with mock.patch.object(self.scraper, 'get_high_rated_products', mock.AsyncMock(side_effect=TimeoutError("timeout"))):
+            await self.run_check(scheduler)
+        self.assertEqual(scheduler.get_stats()['failed'], 1)
+        self.assertEqual(scheduler.get_stats()['scheduled'], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
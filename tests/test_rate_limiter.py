@@ -0,0 +1,103 @@
+"""
+トークンバケット方式のレート制限のテスト（時刻は単調時計を差し替えて進める）
+"""
+
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import rate_limiter
+from rate_limiter import RateLimiter, TokenBucket
+
+
+class TokenBucketTest(unittest.TestCase):
+    def test_refill_is_capped_at_capacity(self):
+        bucket = TokenBucket(capacity=5, refill_rate=1, tokens=0, updated_at=0)
+        bucket.refill(3)
+        self.assertEqual(bucket.tokens, 3)
+        bucket.refill(100)
+        self.assertEqual(bucket.tokens, 5)
+
+    def test_retry_after(self):
+        bucket = TokenBucket(capacity=5, refill_rate=0.5, tokens=1, updated_at=0)
+        self.assertEqual(bucket.retry_after(1), 0.0)
+        self.assertEqual(bucket.retry_after(3), 4.0)
+        self.assertEqual(TokenBucket(5, 0, 0, 0).retry_after(1), float('inf'))
+
+
+class RateLimiterTest(unittest.TestCase):
+    def setUp(self):
+        self.now = 1000.0
+        patcher = mock.patch.object(rate_limiter.time, 'monotonic', lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def make_limiter(self, **overrides) -> RateLimiter:
+        options = dict(
+            user_capacity=3, user_refill=1, guild_capacity=10, guild_refill=1,
+            global_capacity=100, global_refill=10, idle_ttl=60, max_buckets=100
+        )
+        options.update(overrides)
+        return RateLimiter(**options)
+
+    def test_user_bucket_limits_and_refills(self):
+        limiter = self.make_limiter()
+        for _ in range(3):
+            self.assertEqual(limiter.acquire(1, 10, cost=1), (0.0, None))
+        self.assertEqual(limiter.acquire(1, 10, cost=1), (1.0, 'user'))
+        # 別ユーザーは制限されない
+        self.assertEqual(limiter.acquire(2, 10, cost=1), (0.0, None))
+        self.now += 1
+        self.assertEqual(limiter.acquire(1, 10, cost=1), (0.0, None))
+
+    def test_cost_consumes_more_tokens(self):
+        limiter = self.make_limiter()
+        self.assertEqual(limiter.acquire(1, None, cost=0.5), (0.0, None))
+        self.assertEqual(limiter.acquire(1, None, cost=2), (0.0, None))
+        retry_after, scope = limiter.acquire(1, None, cost=2)
+        self.assertEqual(scope, 'user')
+        self.assertAlmostEqual(retry_after, 1.5)
+
+    def test_cost_above_capacity_is_capped(self):
+        limiter = self.make_limiter()
+        self.assertEqual(limiter.acquire(1, None, cost=50), (0.0, None))
+        self.assertEqual(limiter.acquire(1, None, cost=1)[1], 'user')
+
+    def test_guild_bucket_is_shared_by_users(self):
+        limiter = self.make_limiter(guild_capacity=2)
+        self.assertEqual(limiter.acquire(1, 10, cost=1), (0.0, None))
+        self.assertEqual(limiter.acquire(2, 10, cost=1), (0.0, None))
+        self.assertEqual(limiter.acquire(3, 10, cost=1)[1], 'guild')
+        self.assertEqual(limiter.acquire(3, 20, cost=1), (0.0, None))
+
+    def test_limited_request_does_not_consume_other_buckets(self):
+        limiter = self.make_limiter(global_capacity=1, global_refill=0)
+        self.assertEqual(limiter.acquire(1, 10, cost=1), (0.0, None))
+        self.assertEqual(limiter.acquire(2, 10, cost=1), (float('inf'), 'global'))
+        self.assertEqual(limiter._users[2].tokens, 3)
+        self.assertEqual(limiter._guilds[10].tokens, 9)
+        self.assertEqual(limiter.get_stats()['limited'], {'user': 0, 'guild': 0, 'global': 1})
+
+    def test_max_buckets_evicts_least_recently_used(self):
+        limiter = self.make_limiter(max_buckets=2)
+        limiter.acquire(1, None, cost=1)
+        limiter.acquire(2, None, cost=1)
+        limiter.acquire(1, None, cost=1)
+        limiter.acquire(3, None, cost=1)
+        self.assertEqual(list(limiter._users), [1, 3])
+        self.assertEqual(limiter.evictions, 1)
+
+    def test_idle_full_buckets_are_swept(self):
+        limiter = self.make_limiter()
+        limiter.acquire(1, 10, cost=1)
+        self.now += 61
+        limiter.acquire(2, None, cost=1)
+        self.assertEqual(list(limiter._users), [2])
+        self.assertEqual(limiter.get_stats()['guild_buckets'], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
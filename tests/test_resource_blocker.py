@@ -0,0 +1,68 @@
+"""
+リソースブロックの判定とルーティングのテスト
+"""
+
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from resource_blocker import ResourceBlocker
+
+
+def make_route(resource_type: str, url: str) -> mock.Mock:
+    route = mock.Mock()
+    route.request.resource_type = resource_type
+    route.request.url = url
+    route.abort = mock.AsyncMock()
+    route.continue_ = mock.AsyncMock()
+    return route
+
+
+class ResourceBlockerTest(unittest.TestCase):
+    def setUp(self):
+        self.blocker = ResourceBlocker(resource_types=["image", "font"], url_patterns=["google-analytics.com", "/beacon"])
+
+    def test_blocks_by_resource_type(self):
+        self.assertEqual(self.blocker._match("image", "https://pics.dmm.co.jp/a.jpg"), "image")
+
+    def test_blocks_by_url_pattern(self):
+        self.assertEqual(self.blocker._match("script", "https://www.google-analytics.com/analytics.js"), "google-analytics.com")
+        self.assertEqual(self.blocker._match("xhr", "https://www.dmm.co.jp/beacon?id=1"), "/beacon")
+
+    def test_allows_documents_and_scripts(self):
+        self.assertIsNone(self.blocker._match("document", "https://www.dmm.co.jp/digital/videoa/-/list/"))
+        self.assertIsNone(self.blocker._match("script", "https://www.dmm.co.jp/app.js"))
+
+
+class ResourceBlockerRouteTest(unittest.IsolatedAsyncioTestCase):
+    async def test_handle_route_aborts_or_continues_and_counts(self):
+        blocker = ResourceBlocker(resource_types=["image"], url_patterns=[])
+        image = make_route("image", "https://example.com/a.jpg")
+        document = make_route("document", "https://example.com/")
+        await blocker._handle_route(image)
+        await blocker._handle_route(document)
+        image.abort.assert_awaited_once()
+        document.continue_.assert_awaited_once()
+        self.assertEqual(blocker.get_stats(), {'blocked': 1, 'allowed': 1, 'blocked_by_reason': {'image': 1}})
+
+    async def test_disabled_blocker_does_not_install_route(self):
+        context = mock.Mock()
+        context.route = mock.AsyncMock()
+        await ResourceBlocker(enabled=False).install(context)
+        context.route.assert_not_awaited()
+        await ResourceBlocker(enabled=True).install(context)
+        context.route.assert_awaited_once()
+
+    async def test_route_error_after_page_close_is_ignored(self):
+        blocker = ResourceBlocker(resource_types=["image"], url_patterns=[])
+        route = make_route("image", "https://example.com/a.jpg")
+        route.abort.side_effect = RuntimeError("Target page has been closed")
+        await blocker._handle_route(route)
+        self.assertEqual(blocker.blocked_count, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
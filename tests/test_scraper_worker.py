@@ -0,0 +1,147 @@
+"""
+スクレイピングのワーカーとクライアントの通信のテスト
+（ワーカーは同じプロセスのUnixソケットで動かし、スクレイパーの処理を差し替える）
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import admission
+import tracing
+from admission import AdmissionRejected
+from scraper_client import ScraperWorkerClient, WorkerError, WorkerUnavailable
+from scraper_worker import ScraperWorker, decode_message, encode_message
+
+
+class MessageTest(unittest.TestCase):
+    def test_round_trip_is_one_line(self):
+        message = {'id': 1, 'result': {'title': "作品\nタイトル"}}
+        line = encode_message(message)
+        self.assertEqual(line.count(b'\n'), 1)
+        self.assertEqual(decode_message(line), message)
+
+
+class WorkerClientTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        socket_path = os.path.join(directory.name, "worker.sock")
+
+        self.worker = ScraperWorker()
+        self.server = await asyncio.start_unix_server(self.worker.handle_connection, path=socket_path)
+        self.client = ScraperWorkerClient(name="test", socket_path=socket_path, spawn=False, request_timeout=5)
+
+    async def asyncTearDown(self):
+        await self.client.close()
+        self.server.close()
+        for connection in list(self.worker._connections):
+            connection.cancel()
+        await asyncio.gather(*self.worker._connections, return_exceptions=True)
+        await self.server.wait_closed()
+        await self.worker.close()
+
+    async def test_call_passes_guild_and_trace_to_worker(self):
+        seen = {}
+
+        async def search_videos(title, force_refresh=False):
+            seen.update(guild=admission.current_guild(), trace=tracing.current_trace_id(), title=title)
+            return [{'url': "https://missav.example/abc-123"}]
+
+        admission.set_guild(42)
+        trace = tracing.begin_trace("test", "trace-1")
+        with mock.patch.object(self.worker.missav_scraper, 'search_videos', side_effect=search_videos):
+            result = await self.client.call('missav.search_videos', {'title': "作品"})
+        trace.finish()
+
+        self.assertEqual(result['videos'], [{'url': "https://missav.example/abc-123"}])
+        self.assertEqual(seen, {'guild': 42, 'trace': "trace-1", 'title': "作品"})
+        self.assertEqual(self.worker.served, 1)
+
+    async def test_stream_batches_then_result(self):
+        async def stream(**kwargs):
+            yield [{'title': "a"}]
+            yield [{'title': "b"}]
+
+        with mock.patch.object(self.worker.scraper, 'stream_high_rated_products', side_effect=stream):
+            replies = [reply async for reply in self.client.exchange('fanza.stream_high_rated_products', {'url': "https://example.com/"})]
+        self.assertEqual([kind for kind, _ in replies], ['stream', 'stream', 'result'])
+        self.assertEqual(replies[1][1], [{'title': "b"}])
+        self.assertIn('cache', replies[2][1])
+
+    async def test_queue_position_is_forwarded_to_notifier(self):
+        positions = []
+
+        async def notify(position):
+            positions.append(position)
+
+        async def search_videos(title, force_refresh=False):
+            await admission.current_queue_notifier()(3)
+            return []
+
+        token = admission.set_queue_notifier(notify)
+        try:
+            with mock.patch.object(self.worker.missav_scraper, 'search_videos', side_effect=search_videos):
+                await self.client.call('missav.search_videos', {'title': "作品"})
+        finally:
+            admission.reset_queue_notifier(token)
+        self.assertEqual(positions, [3])
+
+    async def test_errors_are_raised_on_the_client(self):
+        with mock.patch.object(self.worker.missav_scraper, 'search_videos', side_effect=AdmissionRejected("queue_full")):
+            with self.assertRaises(AdmissionRejected) as context:
+                await self.client.call('missav.search_videos', {'title': "作品"})
+        self.assertEqual(context.exception.reason, "queue_full")
+
+        with mock.patch.object(self.worker.missav_scraper, 'search_videos', side_effect=TimeoutError("goto timeout")):
+            with self.assertRaises(WorkerError) as context:
+                await self.client.call('missav.search_videos', {'title': "作品"})
+        self.assertEqual(context.exception.error_type, "TimeoutError")
+
+        with self.assertRaises(WorkerError):
+            await self.client.call('unknown.method')
+        self.assertEqual(self.worker.failed, 3)
+
+    async def test_abandoned_request_is_cancelled_in_worker(self):
+        started = asyncio.Event()
+        cancelled = asyncio.Event()
+
+        async def search_videos(title, force_refresh=False):
+            started.set()
+            try:
+                await asyncio.sleep(60)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        with mock.patch.object(self.worker.missav_scraper, 'search_videos', side_effect=search_videos):
+            call = asyncio.ensure_future(self.client.call('missav.search_videos', {'title': "作品"}))
+            await asyncio.wait_for(started.wait(), 5)
+            call.cancel()
+            await asyncio.wait_for(cancelled.wait(), 5)
+        self.assertEqual(self.client.in_flight, 0)
+
+    async def test_disconnect_fails_pending_request(self):
+        started = asyncio.Event()
+
+        async def search_videos(title, force_refresh=False):
+            started.set()
+            await asyncio.sleep(60)
+
+        with mock.patch.object(self.worker.missav_scraper, 'search_videos', side_effect=search_videos):
+            call = asyncio.ensure_future(self.client.call('missav.search_videos', {'title': "作品"}))
+            await asyncio.wait_for(started.wait(), 5)
+            for connection in list(self.worker._connections):
+                connection.cancel()
+            with self.assertRaises(WorkerUnavailable):
+                await asyncio.wait_for(call, 5)
+        self.assertFalse(self.client.connected)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,116 @@
+"""
+シャード構成（シャードIDの指定・分割、複数プロセスでの起動と終了コード）のテスト
+"""
+
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import bot
+import sharding
+
+
+class PerProcessLimitsTest(unittest.TestCase):
+    def test_global_limits_are_divided(self):
+        with mock.patch.object(sharding, 'RATE_LIMIT_GLOBAL_CAPACITY', 120.0), \
+                mock.patch.object(sharding, 'RATE_LIMIT_GLOBAL_REFILL', 2.0), \
+                mock.patch.object(sharding, 'SCRAPE_MAX_CONCURRENT', 4):
+            limits = sharding.per_process_limits(2)
+        self.assertEqual(float(limits['RATE_LIMIT_GLOBAL_CAPACITY']), 60.0)
+        self.assertEqual(float(limits['RATE_LIMIT_GLOBAL_REFILL']), 1.0)
+        self.assertEqual(limits['SCRAPE_MAX_CONCURRENT'], "2")
+
+    def test_concurrency_is_at_least_one(self):
+        with mock.patch.object(sharding, 'SCRAPE_MAX_CONCURRENT', 2):
+            self.assertEqual(sharding.per_process_limits(3)['SCRAPE_MAX_CONCURRENT'], "1")
+
+
+class MainExitCodeTest(unittest.TestCase):
+    def run_main(self, error: BaseException):
+        with mock.patch.object(bot, 'DISCORD_TOKEN', "token"), \
+                mock.patch.object(bot, 'REAP_ORPHANED_BROWSERS', False), \
+                mock.patch.object(bot.sharding, 'should_run_shard_processes', return_value=False), \
+                mock.patch.object(bot.bot, 'run', side_effect=error):
+            bot.main()
+
+    def test_failed_run_exits_non_zero(self):
+        # シャードの監視プロセスが起動し直せるよう0以外で終了する
+        with self.assertRaises(SystemExit) as raised:
+            self.run_main(RuntimeError("login failed"))
+        self.assertEqual(raised.exception.code, 1)
+
+    def test_shutdown_request_exits_normally(self):
+        self.run_main(KeyboardInterrupt())
+
+
+class ShardIdsTest(unittest.TestCase):
+    def test_parse_ranges_and_single_ids(self):
+        self.assertEqual(sharding.parse_shard_ids("0-3, 8,2"), [0, 1, 2, 3, 8])
+        self.assertIsNone(sharding.parse_shard_ids(""))
+        self.assertIsNone(sharding.parse_shard_ids(" , "))
+
+    def test_format_round_trips(self):
+        self.assertEqual(sharding.format_shard_ids([8, 0, 1, 2, 3, 5]), "0-3,5,8")
+        self.assertEqual(sharding.parse_shard_ids(sharding.format_shard_ids([0, 1, 2, 3, 5, 8])), [0, 1, 2, 3, 5, 8])
+
+    def test_split_into_contiguous_groups(self):
+        self.assertEqual(sharding.split_shard_ids(list(range(7)), 3), [[0, 1, 2], [3, 4], [5, 6]])
+        # プロセス数がシャード数より多い場合はシャード数に合わせる
+        self.assertEqual(sharding.split_shard_ids([4, 5], 4), [[4], [5]])
+
+
+class BotOptionsTest(unittest.TestCase):
+    def options(self, enabled=True, count=0, ids=""):
+        with mock.patch.object(sharding, 'ENABLE_SHARDING', enabled), \
+                mock.patch.object(sharding, 'SHARD_COUNT', count), \
+                mock.patch.object(sharding, 'SHARD_IDS', ids):
+            return sharding.bot_options()
+
+    def test_disabled(self):
+        self.assertEqual(self.options(enabled=False, count=4), {})
+
+    def test_recommended_shard_count(self):
+        self.assertEqual(self.options(), {'shard_count': None})
+
+    def test_explicit_shard_ids(self):
+        self.assertEqual(self.options(count=8, ids="0-3"), {'shard_count': 8, 'shard_ids': [0, 1, 2, 3]})
+
+    def test_shard_ids_without_count_are_ignored(self):
+        self.assertEqual(self.options(ids="0-3"), {'shard_count': None})
+
+
+class RunShardProcessesTest(unittest.TestCase):
+    def test_spawns_one_process_per_group_and_stops_all(self):
+        spawned = []
+
+        def popen(args, env):
+            child = mock.Mock()
+            # 最初のプロセスが正常終了すると全体を終了する
+            child.poll.side_effect = [0 if not spawned else None, None]
+            spawned.append((env, child))
+            return child
+
+        with mock.patch.object(sharding, 'SHARD_COUNT', 4), \
+                mock.patch.object(sharding, 'SHARD_IDS', ""), \
+                mock.patch.object(sharding, 'SHARD_PROCESSES', 2), \
+                mock.patch.object(sharding, 'METRICS_PORT', 9100), \
+                mock.patch.object(sharding.subprocess, 'Popen', side_effect=popen), \
+                mock.patch.object(sharding.signal, 'signal'), \
+                mock.patch.object(sharding.time, 'sleep'):
+            self.assertEqual(sharding.run_shard_processes(), 0)
+
+        self.assertEqual([env['SHARD_IDS'] for env, _ in spawned], ["0-1", "2-3"])
+        self.assertEqual([env['METRICS_PORT'] for env, _ in spawned], ["9100", "9101"])
+        self.assertTrue(all(env['SHARD_PROCESSES'] == "1" for env, _ in spawned))
+        spawned[1][1].send_signal.assert_called_once_with(sharding.signal.SIGINT)
+
+    def test_requires_explicit_shard_count(self):
+        with mock.patch.object(sharding, 'SHARD_COUNT', 0):
+            self.assertEqual(sharding.run_shard_processes(), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
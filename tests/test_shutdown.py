@@ -0,0 +1,47 @@
+"""
+終了処理のテスト（bot.runと同じく、Botのイベントループが閉じる前にBotの終了処理で片付ける）
+"""
+
+import asyncio
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import bot
+
+
+class ShutdownTest(unittest.TestCase):
+    def test_bot_close_cleans_up_in_its_own_loop(self):
+        loops = {}
+
+        def record_loop(name):
+            async def close():
+                loops[name] = asyncio.get_running_loop()
+            return close
+
+        async def run_bot():
+            loops['bot'] = asyncio.get_running_loop()
+            bot.prefetcher.start()
+            if bot.browser_watchdog is not None:
+                bot.browser_watchdog.start()
+            await asyncio.sleep(0)
+            await bot.bot.close()
+
+        with mock.patch.object(bot.scraper, 'close', side_effect=record_loop('scraper')), \
+                mock.patch.object(bot.missav_scraper, 'close', side_effect=record_loop('missav')), \
+                mock.patch.object(bot, 'close_default_store') as close_store:
+            asyncio.run(run_bot())
+
+        self.assertIsNone(bot.prefetcher._loop_task)
+        if bot.browser_watchdog is not None:
+            self.assertIsNone(bot.browser_watchdog._task)
+        self.assertIs(loops['scraper'], loops['bot'])
+        self.assertIs(loops['missav'], loops['bot'])
+        close_store.assert_called_once()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+"""
+実行中リクエストの集約のテスト
+"""
+
+import asyncio
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from single_flight import SingleFlight
+
+
+class SingleFlightTest(unittest.IsolatedAsyncioTestCase):
+    async def test_concurrent_calls_share_one_execution(self):
+        flight = SingleFlight()
+        release = asyncio.Event()
+        calls = 0
+
+        async def fetch():
+            nonlocal calls
+            calls += 1
+            await release.wait()
+            return "result"
+
+        waiters = [asyncio.ensure_future(flight.do("key", fetch)) for _ in range(3)]
+        await asyncio.sleep(0)
+        self.assertTrue(flight.is_inflight("key"))
+        release.set()
+        self.assertEqual(await asyncio.gather(*waiters), ["result"] * 3)
+        self.assertEqual(calls, 1)
+        self.assertEqual(flight.get_stats(), {'inflight': 0, 'started': 1, 'coalesced': 2})
+
+    async def test_different_keys_run_separately(self):
+        flight = SingleFlight()
+
+        async def fetch(value):
+            await asyncio.sleep(0)
+            return value
+
+        results = await asyncio.gather(flight.do("a", lambda: fetch(1)), flight.do("b", lambda: fetch(2)))
+        self.assertEqual(results, [1, 2])
+        self.assertEqual(flight.started_count, 2)
+
+    async def test_exception_is_shared_and_key_is_released(self):
+        flight = SingleFlight()
+
+        async def fail():
+            await asyncio.sleep(0)
+            raise ValueError("boom")
+
+        results = await asyncio.gather(flight.do("key", fail), flight.do("key", fail), return_exceptions=True)
+        self.assertTrue(all(isinstance(result, ValueError) for result in results))
+        self.assertFalse(flight.is_inflight("key"))
+
+        async def succeed():
+            return "ok"
+
+        # 失敗後は新たに実行する
+        self.assertEqual(await flight.do("key", succeed), "ok")
+        self.assertEqual(flight.started_count, 2)
+
+    async def test_cancelled_waiter_does_not_cancel_others(self):
+        flight = SingleFlight()
+        release = asyncio.Event()
+
+        async def fetch():
+            await release.wait()
+            return "result"
+
+        first = asyncio.ensure_future(flight.do("key", fetch))
+        second = asyncio.ensure_future(flight.do("key", fetch))
+        await asyncio.sleep(0)
+        first.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        self.assertEqual(await second, "result")
+        self.assertTrue(first.cancelled())
+
+
+if __name__ == "__main__":
+    unittest.main()
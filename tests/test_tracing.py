@@ -0,0 +1,79 @@
+"""
+コマンド処理の区間計測（トレース）のテスト
+"""
+
+import io
+import logging
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import tracing
+from config import LOG_FORMAT
+
+
+class LogRecordFactoryTest(unittest.TestCase):
+    def test_handler_added_later_formats_trace_id(self):
+        tracing.install_log_record_factory()
+        # ルートロガーの設定後に追加されたハンドラー（discord.pyのsetup_loggingなど）
+        stream = io.StringIO()
+        handler = logging.StreamHandler(stream)
+        handler.setFormatter(logging.Formatter(LOG_FORMAT))
+        test_logger = logging.getLogger("tests.tracing")
+        test_logger.addHandler(handler)
+        test_logger.propagate = False
+        self.addCleanup(test_logger.removeHandler, handler)
+
+        test_logger.warning("outside")
+        trace = tracing.begin_trace("fanza_search", "trace-123")
+        try:
+            test_logger.warning("inside")
+        finally:
+            trace.finish()
+
+        lines = stream.getvalue().splitlines()
+        self.assertIn("[-] outside", lines[0])
+        self.assertIn("[trace-123] inside", lines[1])
+
+    def test_install_is_idempotent(self):
+        tracing.install_log_record_factory()
+        factory = logging.getLogRecordFactory()
+        tracing.install_log_record_factory()
+        self.assertIs(logging.getLogRecordFactory(), factory)
+
+
+class TraceTest(unittest.TestCase):
+    def test_spans_are_recorded_with_parent(self):
+        trace = tracing.begin_trace("fanza_search", "trace-1")
+        try:
+            with tracing.span("scrape_wait"):
+                with tracing.span("cache_lookup", hit=False):
+                    pass
+            with tracing.span("discord_send"):
+                pass
+        finally:
+            trace.finish()
+
+        spans = {span.name: span for span in trace.spans}
+        self.assertEqual(spans["cache_lookup"].parent, "scrape_wait")
+        self.assertIsNone(spans["scrape_wait"].parent)
+        self.assertEqual(spans["cache_lookup"].attrs, {'hit': False})
+        self.assertEqual(set(trace.stage_breakdown()), {"scrape_wait", "cache_lookup", "discord_send"})
+        self.assertIsNone(tracing.current_trace_id())
+
+    def test_span_outside_trace_is_noop(self):
+        with tracing.span("orphan"):
+            pass
+        self.assertIsNone(tracing.current_trace_id())
+
+    def test_spans_after_finish_are_dropped(self):
+        trace = tracing.begin_trace("fanza_search", "trace-2")
+        trace.finish()
+        trace.record(tracing.SpanRecord(name="late", parent=None, start=0.0, duration=0.1))
+        self.assertEqual(trace.spans, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,147 @@
+"""
+上限付きLRU+TTLキャッシュのテスト（時刻は単調時計を差し替えて進める）
+"""
+
+import os
+import sys
+import time
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ttl_cache
+from ttl_cache import TTLCache, estimate_size
+
+
+class FakeStore:
+    """名前空間とキーで行を保持するだけのストア"""
+
+    def __init__(self):
+        self.rows = {}
+
+    async def load(self, namespace, key):
+        return self.rows.get((namespace, key))
+
+    async def save(self, namespace, key, value, fetched_at, expires_at):
+        self.rows[(namespace, key)] = (value, fetched_at, expires_at)
+
+
+class TTLCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.now = 1000.0
+        patcher = mock.patch.object(ttl_cache.time, 'monotonic', lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_evicts_least_recently_used_entry(self):
+        cache = TTLCache(ttl=60, max_entries=2, max_bytes=10 ** 6)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        self.assertEqual(cache.get("a"), 1)
+        cache.set("c", 3)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), 1)
+        self.assertEqual(cache.get("c"), 3)
+        self.assertEqual(cache.evictions, 1)
+
+    def test_evicts_by_total_bytes(self):
+        value = "x" * 1000
+        cache = TTLCache(ttl=60, max_entries=10, max_bytes=estimate_size(value) * 2)
+        for key in ("a", "b", "c"):
+            cache.set(key, value)
+        self.assertEqual(len(cache), 2)
+        self.assertNotIn("a", cache)
+        self.assertLessEqual(cache.get_stats()['bytes'], cache.max_bytes)
+
+    def test_oversized_value_is_not_cached(self):
+        cache = TTLCache(ttl=60, max_entries=10, max_bytes=100)
+        cache.set("a", 1)
+        cache.set("a", "x" * 1000)
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(cache.get_stats()['bytes'], 0)
+
+    def test_entry_expires_after_ttl(self):
+        cache = TTLCache(ttl=60, max_entries=10, max_bytes=10 ** 6)
+        cache.set("a", 1)
+        self.now += 59
+        self.assertEqual(cache.get("a"), 1)
+        self.now += 1
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.get_stats()['expirations'], 1)
+        self.assertEqual(len(cache), 0)
+
+    def test_stale_entry_is_returned_only_when_allowed(self):
+        cache = TTLCache(ttl=60, max_entries=10, max_bytes=10 ** 6, stale_ttl=30)
+        cache.set("a", 1)
+        self.now += 70
+        self.assertIsNone(cache.get("a"))
+        entry = cache.get_entry("a", allow_stale=True)
+        self.assertEqual(entry.value, 1)
+        self.assertFalse(entry.is_fresh)
+        self.assertEqual(cache.stale_hits, 1)
+        self.now += 20
+        self.assertIsNone(cache.get_entry("a", allow_stale=True))
+
+    def test_per_entry_ttl(self):
+        cache = TTLCache(ttl=60, max_entries=10, max_bytes=10 ** 6)
+        cache.set("short", 1, ttl=5)
+        cache.set("long", 2)
+        self.now += 10
+        self.assertIsNone(cache.get("short"))
+        self.assertEqual(cache.get("long"), 2)
+
+    def test_peek_does_not_touch_order_or_stats(self):
+        cache = TTLCache(ttl=60, max_entries=2, max_bytes=10 ** 6)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        self.assertEqual(cache.peek("a").value, 1)
+        cache.set("c", 3)
+        self.assertIsNone(cache.peek("a"))
+        self.assertEqual(cache.hits + cache.misses, 0)
+
+    def test_purge_expired(self):
+        cache = TTLCache(ttl=60, max_entries=10, max_bytes=10 ** 6, stale_ttl=10)
+        cache.set("old", 1)
+        self.now += 50
+        cache.set("new", 2)
+        self.now += 20
+        self.assertEqual(cache.purge_expired(), 1)
+        self.assertIsNone(cache.peek("old"))
+        self.assertIsNotNone(cache.peek("new"))
+
+
+class TTLCacheStoreTest(unittest.IsolatedAsyncioTestCase):
+    async def test_save_writes_through_and_load_reads_back(self):
+        store = FakeStore()
+        writer = TTLCache(ttl=60, max_entries=10, max_bytes=10 ** 6, stale_ttl=30, name="listing", store=store)
+        await writer.save("a", {'title': "x"})
+        writer.close()
+        value, fetched_at, expires_at = store.rows[("listing", "a")]
+        self.assertAlmostEqual(expires_at - fetched_at, 90)
+
+        # 再起動後の空のキャッシュでもストアから読み込める
+        reader = TTLCache(ttl=60, max_entries=10, max_bytes=10 ** 6, stale_ttl=30, name="listing", store=store)
+        self.addCleanup(reader.close)
+        self.assertEqual(await reader.load("a"), {'title': "x"})
+        self.assertEqual(reader.store_hits, 1)
+        self.assertIn("a", reader)
+
+    async def test_load_entry_keeps_remaining_age(self):
+        store = FakeStore()
+        fetched_at = time.time() - 70
+        store.rows[("listing", "a")] = ("v", fetched_at, fetched_at + 90)
+        cache = TTLCache(ttl=60, max_entries=10, max_bytes=10 ** 6, stale_ttl=30, name="listing", store=store)
+        self.addCleanup(cache.close)
+        self.assertIsNone(await cache.load("a"))
+        entry = await cache.load_entry("a", allow_stale=True)
+        self.assertEqual(entry.value, "v")
+        self.assertFalse(entry.is_fresh)
+
+    async def test_missing_key_in_store(self):
+        cache = TTLCache(ttl=60, max_entries=10, max_bytes=10 ** 6, name="listing", store=FakeStore())
+        self.assertIsNone(await cache.load("missing"))
+
+
+if __name__ == "__main__":
+    unittest.main()
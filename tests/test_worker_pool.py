@@ -0,0 +1,93 @@
+"""
+複数のスクレイピングのワーカーの使い分けのテスト（ワーカーは起動せず、選択と担当の変化のみ確認する）
+"""
+
+import os
+import sys
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scraper_client import ScraperWorkerPool, _CacheMirror
+
+KEYS = [f"query-{i}" for i in range(500)]
+
+
+class ScraperWorkerPoolTest(unittest.IsolatedAsyncioTestCase):
+    def make_pool(self, count: int) -> ScraperWorkerPool:
+        pool = ScraperWorkerPool(count=count, spawn=True)
+        self.addAsyncCleanup(pool.close)
+        return pool
+
+    def mark_unavailable(self, pool: ScraperWorkerPool, name: str):
+        # 起動に失敗して再試行を待っている状態
+        pool.workers[name]._retry_at = time.monotonic() + 60
+
+    async def test_same_key_goes_to_same_worker(self):
+        pool = self.make_pool(3)
+        for key in KEYS[:50]:
+            self.assertIs(pool.route(key), pool.route(key))
+            self.assertEqual(pool.route(key).name, pool.owner(key))
+        self.assertEqual({pool.owner(key) for key in KEYS}, set(pool.workers))
+
+    async def test_unavailable_owner_fails_over_to_next_worker(self):
+        pool = self.make_pool(3)
+        key = KEYS[0]
+        owner = pool.owner(key)
+        self.mark_unavailable(pool, owner)
+        client, failover = pool.select(key)
+        self.assertTrue(failover)
+        self.assertEqual(client.name, list(pool.ring.iter_nodes(key))[1])
+        pool.route(key)
+        self.assertEqual(pool.failovers, 1)
+
+    async def test_all_unavailable_uses_owner(self):
+        pool = self.make_pool(2)
+        for name in pool.workers:
+            self.mark_unavailable(pool, name)
+        client, failover = pool.select(KEYS[0])
+        self.assertEqual((client.name, failover), (pool.owner(KEYS[0]), False))
+
+    async def test_resize_moves_only_keys_of_changed_workers(self):
+        pool = self.make_pool(2)
+        before = {key: pool.owner(key) for key in KEYS}
+        await pool.resize(3)
+        self.assertEqual(len(pool), 3)
+        self.assertTrue(all(pool.owner(key) in (before[key], "worker2") for key in KEYS))
+
+        await pool.resize(2)
+        self.assertEqual({key: pool.owner(key) for key in KEYS}, before)
+        self.assertNotIn("worker2", pool.workers)
+
+    async def test_resize_rejects_zero(self):
+        pool = self.make_pool(1)
+        with self.assertRaises(ValueError):
+            await pool.resize(0)
+
+
+class CacheMirrorTest(unittest.IsolatedAsyncioTestCase):
+    async def test_entry_is_dropped_when_another_worker_would_answer(self):
+        pool = ScraperWorkerPool(count=2, spawn=True)
+        self.addAsyncCleanup(pool.close)
+        mirror = _CacheMirror(pool)
+        key = KEYS[0]
+        owner = pool.route(key)
+        mirror.remember(key, {'fetched_at': "2026-01-01T00:00:00", 'remaining': 100}, owner)
+        self.assertAlmostEqual(mirror.remaining(key), 100, delta=1)
+
+        pool.workers[owner.name]._retry_at = time.monotonic() + 60
+        self.assertIsNone(mirror.timestamp(key))
+
+    async def test_uncached_reply_forgets_entry(self):
+        pool = ScraperWorkerPool(count=1, spawn=True)
+        self.addAsyncCleanup(pool.close)
+        mirror = _CacheMirror(pool)
+        client = pool.route("key")
+        mirror.remember("key", {'fetched_at': None, 'remaining': 100}, client)
+        mirror.remember("key", {'fetched_at': None, 'remaining': None}, client)
+        self.assertIsNone(mirror.remaining("key"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,160 @@
+"""
+コマンド処理の区間計測（トレース）
+インタラクションごとに相関IDを持つトレースを開始し、処理の各段階をスパンとして記録する
+しきい値を超えたコマンドは段階別の内訳を構造化ログとして出力する
+現在のトレースはcontextvarsで受け渡すため、同じコンテキストから作成したタスク内のスパンも記録される
+"""
+
+import contextvars
+import json
+import logging
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional
+from config import SLOW_COMMAND_THRESHOLD
+
+logger = logging.getLogger(__name__)
+
+MAX_SPANS_PER_TRACE = 200  # 1トレースで記録するスパン数の上限
+
+_current_trace: contextvars.ContextVar[Optional["Trace"]] = contextvars.ContextVar("current_trace", default=None)
+_current_span: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("current_span", default=None)
+
+
+@dataclass
+class SpanRecord:
+    """記録済みのスパン"""
+    name: str
+    parent: Optional[str]
+    start: float  # トレース開始からの経過秒数
+    duration: float
+    attrs: Dict[str, Any] = field(default_factory=dict)
+
+
+class Trace:
+    """1回のコマンド処理のトレース"""
+
+    def __init__(self, name: str, trace_id: str, attrs: Dict[str, Any]):
+        self.name = name
+        self.trace_id = trace_id
+        self.attrs = attrs
+        self.started = time.perf_counter()
+        self.spans: List[SpanRecord] = []
+        self.dropped_spans = 0
+        self.duration: Optional[float] = None
+        self._token: Optional[contextvars.Token] = None
+
+    def record(self, span: SpanRecord):
+        # 終了後に完了したバックグラウンド処理のスパンは含めない
+        if self.duration is not None:
+            return
+        if len(self.spans) >= MAX_SPANS_PER_TRACE:
+            self.dropped_spans += 1
+            return
+        self.spans.append(span)
+
+    def stage_breakdown(self) -> Dict[str, Dict[str, float]]:
+        """スパン名ごとの回数・合計時間"""
+        stages: Dict[str, Dict[str, float]] = {}
+        for span in self.spans:
+            stage = stages.setdefault(span.name, {'count': 0, 'total': 0.0})
+            stage['count'] += 1
+            stage['total'] += span.duration
+        return stages
+
+    def finish(self):
+        """トレースを終了し、しきい値を超えていれば遅延ログを出力"""
+        if self.duration is not None:
+            return
+        self.duration = time.perf_counter() - self.started
+        if self.duration >= SLOW_COMMAND_THRESHOLD:
+            logger.warning(f"Slow command: {json.dumps(self.to_dict(), ensure_ascii=False)}")
+        if self._token is not None:
+            try:
+                _current_trace.reset(self._token)
+            except ValueError:
+                # 開始時と異なるコンテキストで終了した場合
+                _current_trace.set(None)
+            self._token = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        """構造化ログ用の辞書"""
+        return {
+            'trace_id': self.trace_id,
+            'command': self.name,
+            'duration': round(self.duration or 0.0, 3),
+            'attrs': self.attrs,
+            'stages': {
+                name: {'count': stage['count'], 'total': round(stage['total'], 3)}
+                for name, stage in sorted(self.stage_breakdown().items(), key=lambda item: item[1]['total'], reverse=True)
+            },
+            'spans': [
+                {
+                    'name': span.name,
+                    'parent': span.parent,
+                    'start': round(span.start, 3),
+                    'duration': round(span.duration, 3),
+                    **({'attrs': span.attrs} if span.attrs else {})
+                }
+                for span in self.spans
+            ],
+            'dropped_spans': self.dropped_spans
+        }
+
+
+def begin_trace(name: str, trace_id: str, **attrs) -> Trace:
+    """トレースを開始して現在のコンテキストに設定（終了時はTrace.finish()を呼ぶ）"""
+    trace = Trace(name, trace_id, attrs)
+    trace._token = _current_trace.set(trace)
+    return trace
+
+
+def current_trace_id() -> Optional[str]:
+    """現在のトレースの相関ID"""
+    trace = _current_trace.get()
+    return trace.trace_id if trace else None
+
+
+@contextmanager
+def span(name: str, **attrs) -> Iterator[None]:
+    """処理区間を現在のトレースに記録（トレース外では何もしない）"""
+    trace = _current_trace.get()
+    if trace is None:
+        yield
+        return
+
+    parent = _current_span.get()
+    token = _current_span.set(name)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        ended = time.perf_counter()
+        _current_span.reset(token)
+        trace.record(SpanRecord(
+            name=name,
+            parent=parent,
+            start=started - trace.started,
+            duration=ended - started,
+            attrs=attrs
+        ))
+
+
+def install_log_record_factory():
+    """全てのログレコードに現在のトレースの相関ID（trace_id、トレース外は"-"）を付与
+
+    ハンドラーではなくレコードの生成時に付与するため、後から追加されたハンドラー（discord.pyのsetup_loggingなど）でも
+    LOG_FORMATの%(trace_id)sを使える
+    """
+    previous = logging.getLogRecordFactory()
+    if getattr(previous, 'adds_trace_id', False):
+        return
+
+    def factory(*args, **kwargs) -> logging.LogRecord:
+        record = previous(*args, **kwargs)
+        record.trace_id = current_trace_id() or "-"
+        return record
+
+    factory.adds_trace_id = True
+    logging.setLogRecordFactory(factory)
@@ -0,0 +1,253 @@
+"""
+上限付きLRU+TTLキャッシュ
+エントリ数とおおよそのメモリ使用量に上限を設け、古いものから追い出す
+有効期限は単調時計で管理し、期限切れのエントリは定期的に削除する
+永続化ストアを指定した場合は書き込みを保存し、メモリにないキーはストアから読み込む
+"""
+
+import asyncio
+import logging
+import sys
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, Optional
+from cache_store import SQLiteCacheStore
+from config import CACHE_SWEEP_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+
+def estimate_size(value: Any) -> int:
+    """値のおおよそのメモリ使用量（バイト）を再帰的に見積もる"""
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(estimate_size(k) + estimate_size(v) for k, v in value.items())
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(estimate_size(item) for item in value)
+    return size
+
+
+@dataclass
+class CacheEntry:
+    """キャッシュエントリ"""
+    value: Any
+    stored_at: float  # 保存時刻（単調時計）
+    fetched_at: datetime  # 表示用の取得時刻
+    size: int
+    ttl: float
+    stale_ttl: float = 0
+
+    @property
+    def age(self) -> float:
+        """保存からの経過秒数"""
+        return time.monotonic() - self.stored_at
+
+    @property
+    def is_fresh(self) -> bool:
+        """有効期限内かどうか"""
+        return self.age < self.ttl
+
+    @property
+    def is_expired(self) -> bool:
+        """猶予期間も過ぎて削除対象かどうか"""
+        return self.age >= self.ttl + self.stale_ttl
+
+
+class TTLCache:
+    """エントリ数・バイト数の上限とTTLを持つLRUキャッシュ"""
+
+    def __init__(self, ttl: float, max_entries: int, max_bytes: int, stale_ttl: float = 0, name: str = "cache", store: Optional[SQLiteCacheStore] = None):
+        """
+        Args:
+            ttl: 有効期限（秒）
+            max_entries: 最大エントリ数
+            max_bytes: おおよその最大メモリ使用量（バイト）
+            stale_ttl: 期限切れ後も取得できる猶予期間（秒）
+            name: ログ・統計用の名前（ストアの名前空間にも使用）
+            store: 永続化ストア（省略時はメモリのみ）
+        """
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.name = name
+        self.store = store
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._bytes = 0
+        self._sweeper_task: Optional[asyncio.Task] = None
+        # 統計
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.store_hits = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: str) -> bool:
+        entry = self._entries.get(key)
+        return entry is not None and entry.is_fresh
+
+    def get_entry(self, key: str, allow_stale: bool = False) -> Optional[CacheEntry]:
+        """エントリを取得（allow_staleがTrueなら猶予期間内の期限切れエントリも返す）"""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        if entry.is_expired:
+            self._remove(key)
+            self.expirations += 1
+            self.misses += 1
+            return None
+        if not entry.is_fresh and not allow_stale:
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        if entry.is_fresh:
+            self.hits += 1
+        else:
+            self.stale_hits += 1
+        return entry
+
+    def get(self, key: str) -> Optional[Any]:
+        """有効期限内の値を取得"""
+        entry = self.get_entry(key)
+        return entry.value if entry else None
+
+    def peek(self, key: str) -> Optional[CacheEntry]:
+        """統計やLRU順序を更新せずにエントリを参照"""
+        entry = self._entries.get(key)
+        if entry is None or entry.is_expired:
+            return None
+        return entry
+
+    def set(self, key: str, value: Any, fetched_at: Optional[datetime] = None, ttl: Optional[float] = None):
+        """値を保存（上限を超えた場合は最も古く使われたエントリから追い出す）"""
+        size = estimate_size(value)
+        if key in self._entries:
+            self._remove(key)
+        if size > self.max_bytes:
+            logger.warning(f"[{self.name}] Entry too large to cache ({size} bytes > {self.max_bytes} bytes)")
+            return
+
+        self._insert(key, CacheEntry(
+            value=value,
+            stored_at=time.monotonic(),
+            fetched_at=fetched_at or datetime.now(),
+            size=size,
+            ttl=self.ttl if ttl is None else ttl,
+            stale_ttl=self.stale_ttl
+        ))
+
+    def _insert(self, key: str, entry: CacheEntry):
+        self._entries[key] = entry
+        self._bytes += entry.size
+
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            oldest_key = next(iter(self._entries))
+            self._remove(oldest_key)
+            self.evictions += 1
+
+        self._ensure_sweeper()
+
+    def delete(self, key: str):
+        """エントリを削除"""
+        if key in self._entries:
+            self._remove(key)
+
+    async def load_entry(self, key: str, allow_stale: bool = False) -> Optional[CacheEntry]:
+        """メモリになければ永続化ストアから読み込んでエントリを取得"""
+        entry = self.get_entry(key, allow_stale=allow_stale)
+        if entry is not None or self.store is None:
+            return entry
+
+        row = await self.store.load(self.name, key)
+        if row is None:
+            return None
+        value, fetched_epoch, expires_epoch = row
+        # 壁時計での経過時間を単調時計の保存時刻に換算
+        age = max(time.time() - fetched_epoch, 0.0)
+        entry = CacheEntry(
+            value=value,
+            stored_at=time.monotonic() - age,
+            fetched_at=datetime.fromtimestamp(fetched_epoch),
+            size=estimate_size(value),
+            ttl=expires_epoch - fetched_epoch - self.stale_ttl,
+            stale_ttl=self.stale_ttl
+        )
+        if entry.is_expired or (not entry.is_fresh and not allow_stale) or entry.size > self.max_bytes:
+            return None
+        if key in self._entries:
+            self._remove(key)
+        self._insert(key, entry)
+        self.store_hits += 1
+        return entry
+
+    async def load(self, key: str) -> Optional[Any]:
+        """メモリまたは永続化ストアから有効期限内の値を取得"""
+        entry = await self.load_entry(key)
+        return entry.value if entry else None
+
+    async def save(self, key: str, value: Any, ttl: Optional[float] = None):
+        """値を保存し、永続化ストアにも書き込む"""
+        fetched_at = datetime.now()
+        self.set(key, value, fetched_at=fetched_at, ttl=ttl)
+        if self.store is not None:
+            fetched_epoch = fetched_at.timestamp()
+            expires_at = fetched_epoch + (self.ttl if ttl is None else ttl) + self.stale_ttl
+            await self.store.save(self.name, key, value, fetched_epoch, expires_at)
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+
+    def purge_expired(self) -> int:
+        """期限切れ（猶予期間経過後）のエントリを削除して件数を返す"""
+        expired_keys = [key for key, entry in self._entries.items() if entry.is_expired]
+        for key in expired_keys:
+            self._remove(key)
+        self.expirations += len(expired_keys)
+        return len(expired_keys)
+
+    def _ensure_sweeper(self):
+        """定期削除タスクを起動（イベントループ上で初めて保存されたときに開始）"""
+        if self._sweeper_task is not None and not self._sweeper_task.done():
+            return
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self._sweeper_task = asyncio.create_task(self._sweep_loop())
+
+    async def _sweep_loop(self):
+        while True:
+            await asyncio.sleep(CACHE_SWEEP_INTERVAL)
+            removed = self.purge_expired()
+            if removed:
+                logger.debug(f"[{self.name}] Swept {removed} expired entries")
+
+    def close(self):
+        """定期削除タスクを停止"""
+        if self._sweeper_task and not self._sweeper_task.done():
+            self._sweeper_task.cancel()
+        self._sweeper_task = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """キャッシュの統計を取得"""
+        return {
+            'entries': len(self._entries),
+            'bytes': self._bytes,
+            'max_entries': self.max_entries,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'stale_hits': self.stale_hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'store_hits': self.store_hits
+        }